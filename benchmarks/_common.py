@@ -0,0 +1,224 @@
+"""Общие утилиты in-process бенчмарков.
+
+Бенчмарки запускаются из корня репозитория (``python -m benchmarks.<name>``)
+и работают с временной базой данных, не затрагивая ``src/db_file``.
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import urlencode
+
+import orjson
+
+ROOT = Path(__file__).resolve().parent.parent
+SRC = ROOT / "src"
+
+
+def prepare_environment() -> Path:
+    """Создаёт временный рабочий каталог с базой данных и подключает
+    ``src`` к sys.path. Вызывается до импорта модулей приложения.
+
+    Returns:
+        Path. Путь к рабочему каталогу.
+    """
+    workdir = Path(tempfile.mkdtemp(prefix="complaint_bench_"))
+    (workdir / "db_file").mkdir()
+    os.chdir(workdir)
+    os.environ.setdefault(
+        "DATABASE_URL",
+        f"sqlite+aiosqlite:///{workdir / 'db_file' / 'complaints.db'}"
+    )
+    # Бенчмарки создают жалобы с немногих адресов, лимит частоты
+    # запросов исказил бы результаты
+    os.environ.setdefault("RATE_LIMITS", "")
+    # Схема создаётся через create_all, без ревизий alembic
+    os.environ.setdefault("MIGRATE_ON_STARTUP", "false")
+    if str(SRC) not in sys.path:
+        sys.path.insert(0, str(SRC))
+    return workdir
+
+
+async def create_schema() -> None:
+    """Создаёт таблицы во временной базе данных."""
+    from database import async_engine
+    from models.models import Base
+
+    async_engine.sync_engine.echo = False
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def seed_complaints(rows: int, seed: int = 42) -> None:
+    """Наполняет базу данных случайными жалобами.
+
+    Args:
+        rows (int): количество жалоб.
+        seed (int, optional, default=42): seed генератора.
+    """
+    from database import async_engine
+    from models.models import ComplaintDB
+    from models.schemas import (ComplaintCategory,
+                                ComplaintSentiment,
+                                ComplaintStatus)
+    from sqlalchemy import insert
+
+    rnd = random.Random(seed)
+    now = datetime.now()
+    batch = []
+    async with async_engine.begin() as conn:
+        for i in range(rows):
+            batch.append({
+                "text": f"Жалоба номер {i}: не работает оплата картой",
+                "status": rnd.choice(list(ComplaintStatus)),
+                "timestamp": now - timedelta(minutes=i),
+                "sentiment": rnd.choice(list(ComplaintSentiment)),
+                "category": rnd.choice(list(ComplaintCategory)),
+                "ip_address": f"10.{rnd.randint(0, 255)}."
+                              f"{rnd.randint(0, 255)}.{rnd.randint(1, 254)}",
+                "geo_country": "Россия",
+                "geo_city": "Санкт-Петербург",
+            })
+            if len(batch) == 1000:
+                await conn.execute(insert(ComplaintDB), batch)
+                batch = []
+        if batch:
+            await conn.execute(insert(ComplaintDB), batch)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Возвращает q-й перцентиль (0..100) списка значений."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def measure(call: Callable[[int], Awaitable[Any]],
+                  requests: int,
+                  concurrency: int = 1) -> Dict[str, float]:
+    """Выполняет запросы заданным числом параллельных воркеров и
+    считает пропускную способность и задержки.
+
+    Args:
+        call (Callable[[int], Awaitable[Any]]): корутина одного запроса,
+        принимает порядковый номер.
+        requests (int): количество запросов.
+        concurrency (int, optional, default=1): число параллельных
+        воркеров.
+
+    Returns:
+        Dict[str, float]. rps, количество ошибок, mean/p50/p95/p99
+        в миллисекундах.
+    """
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            t0 = time.perf_counter()
+            try:
+                await call(i)
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "rps": round(requests / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+    }
+
+
+class InProcessClient:
+    """Минимальный ASGI-клиент для бенчмарков.
+
+    В отличие от httpx.ASGITransport возвращает ответ сразу после
+    отправки тела, а фоновые задачи приложения продолжают выполняться
+    и могут быть дождаться через drain().
+    """
+    def __init__(self, app):
+        self.app = app
+        self.pending: set[asyncio.Task] = set()
+
+    async def request(self,
+                      method: str,
+                      path: str,
+                      params: Optional[Dict[str, Any]] = None,
+                      json: Any = None,
+                      headers: Optional[Dict[str, str]] = None,
+                      client_ip: str = "127.0.0.1") -> tuple[int, bytes]:
+        body = orjson.dumps(json) if json is not None else b""
+        raw_headers = [(b"host", b"bench"),
+                       (b"content-type", b"application/json"),
+                       (b"content-length", str(len(body)).encode())]
+        for name, value in (headers or {}).items():
+            raw_headers.append((name.lower().encode(), value.encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": urlencode(params or {}, doseq=True).encode(),
+            "headers": raw_headers,
+            "client": (client_ip, 50000),
+            "server": ("bench", 80),
+        }
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+        status = []
+        chunks = []
+        received = False
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": body,
+                        "more_body": False}
+            await asyncio.shield(done)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body") and not done.done():
+                    done.set_result(None)
+
+        task = asyncio.create_task(self.app(scope, receive, send))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+        await asyncio.wait({done, task},
+                           return_when=asyncio.FIRST_COMPLETED)
+        if not done.done():
+            task.result()
+            raise RuntimeError("Application finished without a response")
+        return status[0], b"".join(chunks)
+
+    async def drain(self) -> None:
+        """Дожидается завершения фоновых задач приложения."""
+        while self.pending:
+            await asyncio.gather(*self.pending, return_exceptions=True)
@@ -0,0 +1,88 @@
+"""Время, которое вызовы логгера занимают в потоке event loop:
+прежняя схема (RotatingFileHandler и StreamHandler прямо на логгере)
+против QueueHandler/QueueListener.
+
+Количество записей на запрос соответствует созданию жалобы: попытки
+и ответы трёх классификаций, геолокация и события.
+
+Запуск: ``python -m benchmarks.logging_overhead [--requests 2000]``
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from logging.handlers import RotatingFileHandler
+
+from benchmarks._common import prepare_environment
+
+
+def emit_request(logger: logging.Logger, records: int) -> None:
+    for i in range(records):
+        level = logging.DEBUG if i % 2 else logging.INFO
+        logger.log(level, f"Attempt {i}/5",
+                   extra={"request_id": "bench", "action": "spam_detect",
+                          "status": 200, "response_size": 512})
+
+
+def measure(logger: logging.Logger, requests: int,
+            records: int) -> dict:
+    started = time.perf_counter()
+    for _ in range(requests):
+        emit_request(logger, records)
+    elapsed = time.perf_counter() - started
+    return {
+        "loop_time_per_request_us": round(elapsed / requests * 1e6, 2),
+        "loop_time_per_record_us": round(
+            elapsed / requests / records * 1e6, 2
+        ),
+    }
+
+
+def legacy_logger(devnull) -> logging.Logger:
+    logger = logging.getLogger("bench.legacy")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    file_handler = RotatingFileHandler("legacy.log",
+                                       maxBytes=10 * 1024 * 1024,
+                                       backupCount=5)
+    file_handler.setFormatter(formatter)
+    console_handler = logging.StreamHandler(devnull)
+    console_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+    logger.addHandler(console_handler)
+    return logger
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--records-per-request", type=int, default=24)
+    args = parser.parse_args()
+    prepare_environment()
+
+    import logging_config
+
+    devnull = open(os.devnull, "w")
+    results = {"legacy": measure(legacy_logger(devnull), args.requests,
+                                 args.records_per_request)}
+
+    stderr, sys.stderr = sys.stderr, devnull
+    logging_config.setup_logging()
+    sys.stderr = stderr
+    results["queue"] = measure(logging.getLogger("app.bench"),
+                               args.requests, args.records_per_request)
+    results["speedup"] = round(
+        results["legacy"]["loop_time_per_request_us"] /
+        results["queue"]["loop_time_per_request_us"], 2
+    )
+    logging.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
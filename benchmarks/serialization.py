@@ -0,0 +1,104 @@
+"""Сравнение быстрого пути сериализации GET /complaint/ с прежним
+(ORM-объекты + валидация ComplaintResponse + стандартный JSON encoder).
+
+Запуск: ``python -m benchmarks.serialization [--rows 5000] [--requests 500]``
+"""
+import argparse
+import asyncio
+import json
+
+from benchmarks._common import (create_schema,
+                                measure,
+                                prepare_environment,
+                                seed_complaints)
+
+
+def build_legacy_app():
+    """Собирает приложение с прежней реализацией списка и получения
+    жалобы для сравнения."""
+    from typing import List
+
+    from database import async_session_maker
+
+    from fastapi import FastAPI, HTTPException
+
+    from models.models import ComplaintDB
+    from models.schemas import ComplaintResponse
+
+    from sqlalchemy import select
+
+    app = FastAPI()
+
+    @app.get("/api/v1/complaint/", response_model=List[ComplaintResponse])
+    async def list_complaints(offset: int = 0, limit: int = 50):
+        async with async_session_maker() as session:
+            query = select(ComplaintDB).offset(offset).limit(limit).order_by(
+                ComplaintDB.timestamp.desc()
+            )
+            result = await session.execute(query)
+            return result.scalars().all()
+
+    @app.get("/api/v1/complaint/{complaint_id}/",
+             response_model=ComplaintResponse)
+    async def get_complaint(complaint_id: int):
+        async with async_session_maker() as session:
+            query = select(ComplaintDB).where(ComplaintDB.id == complaint_id)
+            result = await session.execute(query)
+            complaint = result.scalar_one_or_none()
+            if not complaint:
+                raise HTTPException(status_code=404)
+        return complaint
+
+    return app
+
+
+async def run(rows: int, requests: int) -> dict:
+    import httpx
+
+    from app import app
+
+    await create_schema()
+    await seed_complaints(rows)
+    results = {}
+    apps = {"legacy": build_legacy_app(), "fast": app}
+    for name, asgi_app in apps.items():
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport,
+                                     base_url="http://bench") as client:
+            async def list_page(i: int):
+                response = await client.get(
+                    "/api/v1/complaint/",
+                    params={"limit": 100, "offset": (i * 100) % rows}
+                )
+                response.raise_for_status()
+
+            async def get_one(i: int):
+                response = await client.get(
+                    f"/api/v1/complaint/{i % rows + 1}/"
+                )
+                response.raise_for_status()
+
+            await measure(list_page, 20)
+            results[name] = {
+                "list_100": await measure(list_page, requests),
+                "get": await measure(get_one, requests),
+            }
+    for scenario in ("list_100", "get"):
+        results[f"{scenario}_speedup"] = round(
+            results["fast"][scenario]["rps"] /
+            results["legacy"][scenario]["rps"], 2
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+    prepare_environment()
+    print(json.dumps(asyncio.run(run(args.rows, args.requests)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Проверка SLO по результатам нагрузочного теста.
+
+Задержки по эндпоинтам берутся из статистики locust, доля ответов
+внешних сервисов, заменённых значениями по умолчанию, — из разницы
+двух снимков ``GET /metrics`` (до и после теста).
+"""
+import re
+from dataclasses import asdict, dataclass, fields, replace
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+_SAMPLE = re.compile(r'^([a-zA-Z_:][\w:]*)(?:\{(.*)\})?\s+(\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+@dataclass
+class SloThresholds:
+    """Пороги SLO одного эндпоинта. None — порог не проверяется.
+
+    Attributes:
+        p50_ms (float): медиана задержки.
+        p95_ms (float): 95-й перцентиль задержки.
+        p99_ms (float): 99-й перцентиль задержки.
+        error_rate (float): доля неуспешных ответов (0..1).
+    """
+    p50_ms: Optional[float] = None
+    p95_ms: Optional[float] = None
+    p99_ms: Optional[float] = None
+    error_rate: Optional[float] = None
+
+
+def parse_prometheus(text: str) -> Dict[MetricKey, float]:
+    """Разбирает текстовый формат Prometheus.
+
+    Args:
+        text (str): ответ ``GET /metrics``.
+
+    Returns:
+        Dict[MetricKey, float]. Значения по названию и меткам.
+    """
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = _SAMPLE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        key = (name, tuple(sorted(_LABEL.findall(labels or ""))))
+        samples[key] = float(value)
+    return samples
+
+
+def fallback_shares(before: Dict[MetricKey, float],
+                    after: Dict[MetricKey, float]) -> Dict[str, Any]:
+    """Доля вызовов внешних сервисов, вернувших значение по умолчанию,
+    за время между двумя снимками метрик.
+
+    Доля считается от вызовов (upstream_calls_total), а не от попыток:
+    повторы и дублированные попытки одного вызова учитываются один раз,
+    а ответ 200 с негодным содержимым, после которого возвращено
+    значение по умолчанию, — как fallback.
+
+    Args:
+        before (Dict[MetricKey, float]): снимок до теста.
+        after (Dict[MetricKey, float]): снимок после теста.
+
+    Returns:
+        Dict[str, Any]. Для каждого "service.action" — количество
+        вызовов, fallback и их доля.
+    """
+    def delta(key: MetricKey) -> float:
+        return after.get(key, 0.0) - before.get(key, 0.0)
+
+    calls: Dict[str, Dict[str, float]] = {}
+    for key in after:
+        name, labels = key
+        label_map = dict(labels)
+        target = f"{label_map.get('service')}.{label_map.get('action')}"
+        if name == "upstream_fallbacks_total":
+            calls.setdefault(target, {"calls": 0.0, "fallbacks": 0.0})
+            calls[target]["fallbacks"] += delta(key)
+        elif name == "upstream_calls_total":
+            calls.setdefault(target, {"calls": 0.0, "fallbacks": 0.0})
+            calls[target]["calls"] += delta(key)
+
+    result = {}
+    for target, counts in sorted(calls.items()):
+        total = counts["calls"]
+        if not total:
+            continue
+        result[target] = {
+            "calls": int(total),
+            "fallbacks": int(counts["fallbacks"]),
+            "share": round(counts["fallbacks"] / total, 4),
+        }
+    return result
+
+
+def parse_overrides(overrides: str,
+                    default: SloThresholds) -> Dict[str, SloThresholds]:
+    """Разбирает пороги отдельных эндпоинтов из строки вида
+    "create.p95_ms=1500,list.p99_ms=800".
+
+    Args:
+        overrides (str): строка с порогами.
+        default (SloThresholds): общие пороги.
+
+    Raises:
+        ValueError: неизвестное название порога.
+
+    Returns:
+        Dict[str, SloThresholds]. Пороги по названию эндпоинта.
+    """
+    names = {f.name for f in fields(SloThresholds)}
+    result: Dict[str, SloThresholds] = {}
+    for item in overrides.split(","):
+        if "=" not in item:
+            continue
+        target, value = item.split("=", 1)
+        endpoint, _, threshold = target.strip().rpartition(".")
+        if threshold not in names:
+            raise ValueError(f"Unknown SLO threshold: {threshold}")
+        current = result.get(endpoint, default)
+        result[endpoint] = replace(current, **{threshold: float(value)})
+    return result
+
+
+def check_slo(endpoints: Iterable[Dict[str, Any]],
+              fallbacks: Dict[str, Any],
+              default: SloThresholds,
+              overrides: Optional[Dict[str, SloThresholds]] = None,
+              fallback_share: Optional[float] = None) -> Dict[str, Any]:
+    """Сравнивает результаты теста с порогами SLO.
+
+    Args:
+        endpoints (Iterable[Dict[str, Any]]): статистика эндпоинтов
+        с ключами name, requests, failures, p50_ms, p95_ms, p99_ms.
+        fallbacks (Dict[str, Any]): результат fallback_shares.
+        default (SloThresholds): общие пороги.
+        overrides (Dict[str, SloThresholds], optional): пороги
+        отдельных эндпоинтов.
+        fallback_share (float, optional): допустимая доля fallback
+        для каждого внешнего вызова.
+
+    Returns:
+        Dict[str, Any]. Отчёт с полями endpoints, fallbacks,
+        thresholds, violations и passed.
+    """
+    overrides = overrides or {}
+    violations = []
+    report_endpoints = []
+    for stats in endpoints:
+        thresholds = overrides.get(stats["name"], default)
+        requests = stats["requests"]
+        stats = dict(stats, error_rate=round(
+            stats["failures"] / requests, 4
+        ) if requests else 0.0)
+        report_endpoints.append(stats)
+        for key, limit in asdict(thresholds).items():
+            if limit is not None and requests and stats[key] > limit:
+                violations.append({"endpoint": stats["name"],
+                                   "metric": key,
+                                   "value": stats[key],
+                                   "threshold": limit})
+    if fallback_share is not None:
+        for target, counts in fallbacks.items():
+            if counts["share"] > fallback_share:
+                violations.append({"endpoint": target,
+                                   "metric": "fallback_share",
+                                   "value": counts["share"],
+                                   "threshold": fallback_share})
+    return {
+        "endpoints": report_endpoints,
+        "fallbacks": fallbacks,
+        "thresholds": {
+            "default": asdict(default),
+            "overrides": {name: asdict(value)
+                          for name, value in overrides.items()},
+            "fallback_share": fallback_share,
+        },
+        "violations": violations,
+        "passed": not violations,
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Текстовое представление отчёта для консоли.
+
+    Args:
+        report (Dict[str, Any]): результат check_slo.
+
+    Returns:
+        str.
+    """
+    lines = [f"{'endpoint':<24}{'requests':>10}{'errors':>9}"
+             f"{'p50':>8}{'p95':>8}{'p99':>8}"]
+    for stats in report["endpoints"]:
+        lines.append(f"{stats['name']:<24}{stats['requests']:>10}"
+                     f"{stats['error_rate']:>9.2%}{stats['p50_ms']:>8.0f}"
+                     f"{stats['p95_ms']:>8.0f}{stats['p99_ms']:>8.0f}")
+    for target, counts in report["fallbacks"].items():
+        lines.append(f"fallback {target}: {counts['fallbacks']}"
+                     f"/{counts['calls']} ({counts['share']:.2%})")
+    for violation in report["violations"]:
+        lines.append(f"SLO violated: {violation['endpoint']} "
+                     f"{violation['metric']}={violation['value']} "
+                     f"> {violation['threshold']}")
+    lines.append("SLO passed" if report["passed"] else "SLO failed")
+    return "\n".join(lines)
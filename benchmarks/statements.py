@@ -0,0 +1,145 @@
+"""Количество SQL-выражений и время на запрос для путей записи
+POST /complaint/ и PATCH /complaint/{id}/ в сравнении с прежней
+реализацией (SELECT + UPDATE + COMMIT + refresh).
+
+Проверка на спам и фоновая обработка заменяются заглушками, чтобы
+измерялась только работа с базой данных.
+
+Запуск: ``python -m benchmarks.statements [--requests 300]``
+"""
+import argparse
+import asyncio
+import json
+
+from benchmarks._common import (create_schema,
+                                measure,
+                                prepare_environment,
+                                seed_complaints)
+
+
+def build_legacy_app():
+    """Собирает приложение с прежними реализациями создания и
+    редактирования жалобы."""
+    from database import async_session_maker
+
+    from fastapi import FastAPI, HTTPException, Request
+
+    from models.models import ComplaintDB
+    from models.schemas import (ComplaintCreate,
+                                ComplaintResponse,
+                                ComplaintUpdate)
+
+    from sqlalchemy import select, update
+
+    app = FastAPI()
+
+    @app.post("/api/v1/complaint/", response_model=ComplaintResponse,
+              status_code=201)
+    async def create_complaint(complaint: ComplaintCreate,
+                               request: Request):
+        db_complaint = ComplaintDB(text=complaint.text,
+                                   category=complaint.category,
+                                   ip_address=request.client.host)
+        async with async_session_maker() as session:
+            session.add(db_complaint)
+            await session.commit()
+            await session.refresh(db_complaint)
+        return db_complaint
+
+    @app.patch("/api/v1/complaint/{complaint_id}/",
+               response_model=ComplaintResponse)
+    async def patch_complaint(complaint_id: int, complaint: ComplaintUpdate):
+        async with async_session_maker() as session:
+            query = select(ComplaintDB).where(ComplaintDB.id == complaint_id)
+            result = await session.execute(query)
+            complaint_db = result.scalar_one_or_none()
+            if not complaint_db:
+                raise HTTPException(status_code=404)
+            query_u = update(ComplaintDB).where(
+                ComplaintDB.id == complaint_id
+            ).values(status=complaint.status)
+            await session.execute(query_u)
+            await session.commit()
+            await session.refresh(complaint_db)
+        return complaint_db
+
+    return app
+
+
+async def run(rows: int, requests: int) -> dict:
+    import httpx
+
+    import routers.complaint
+    import tools.complaint
+    from app import app
+    from database import async_engine
+    from sqlalchemy import event
+
+    async def not_spam(self):
+        return "не спам"
+
+    async def no_post_create(complaint):
+        return None
+
+    routers.complaint.YandexCloudClassifier.y_cloud_classify_text = not_spam
+    tools.complaint.post_create = no_post_create
+
+    counters = {"statements": 0, "commits": 0}
+
+    def on_execute(*args):
+        counters["statements"] += 1
+
+    def on_commit(*args):
+        counters["commits"] += 1
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute",
+                 on_execute)
+    event.listen(async_engine.sync_engine, "commit", on_commit)
+
+    await create_schema()
+    await seed_complaints(rows)
+    results = {}
+    for name, asgi_app in (("legacy", build_legacy_app()),
+                           ("returning", app)):
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport,
+                                     base_url="http://bench") as client:
+            async def create(i: int):
+                response = await client.post(
+                    "/api/v1/complaint/",
+                    json={"text": f"Бенчмарк жалоба номер {i}"}
+                )
+                assert response.status_code == 201, response.text
+
+            async def patch(i: int):
+                response = await client.patch(
+                    f"/api/v1/complaint/{i % rows + 1}/",
+                    json={"status": "closed" if i % 2 else "open"}
+                )
+                assert response.status_code == 200, response.text
+
+            results[name] = {}
+            for scenario, call in (("create", create), ("patch", patch)):
+                counters.update(statements=0, commits=0)
+                stats = await measure(call, requests)
+                stats["statements_per_request"] = round(
+                    counters["statements"] / requests, 2
+                )
+                stats["commits_per_request"] = round(
+                    counters["commits"] / requests, 2
+                )
+                results[name][scenario] = stats
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+    prepare_environment()
+    print(json.dumps(asyncio.run(run(args.rows, args.requests)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
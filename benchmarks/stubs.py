@@ -0,0 +1,299 @@
+"""Локальные заглушки внешних сервисов: Yandex Cloud IAM,
+fewShotTextClassification, completion (структурированный ответ для
+CLASSIFIER_MODE=combined) и DaData iplocate.
+
+Для каждого сервиса настраиваются распределение задержки, доля ошибок
+500 и доля ответов 429. Настройки можно менять на лету через
+``POST /_stub/config`` (готовые сбои — ``FAULTS``), возвращать исходные
+через ``POST /_stub/reset`` и смотреть счётчики через ``GET /_stub/stats``.
+
+Запуск отдельным процессом:
+``python -m benchmarks.stubs --port 8081 --latency-ms 200 --error-rate 0.05``
+
+Приложение подключается к заглушкам переменными окружения, которые
+возвращает ``upstream_env(base_url)``.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+from dataclasses import asdict, dataclass, field, fields
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+SERVICES = ("iam", "classify", "completion", "iplocate")
+
+FAULTS: Dict[str, Dict[str, Any]] = {
+    "outage": {"outage": True},
+    "slow": {"latency_ms": 3000.0, "latency_sigma": 0.3},
+    "rate-limit": {"rate_limit_rate": 0.8},
+    "stalls": {"stall_rate": 0.02, "stall_ms": 5000.0},
+}
+
+CITIES = [("Россия", "Москва"), ("Россия", "Санкт-Петербург"),
+          ("Россия", "Казань"), ("Беларусь", "Минск"),
+          ("Казахстан", "Алматы")]
+
+
+@dataclass
+class UpstreamConfig:
+    """Поведение одной заглушки.
+
+    Attributes:
+        latency_ms (float): медиана задержки ответа.
+        latency_sigma (float): sigma логнормального распределения
+        задержки (0 — фиксированная задержка).
+        error_rate (float): доля ответов 500.
+        rate_limit_rate (float): доля ответов 429.
+        outage (bool): сервис недоступен (все ответы 503).
+        invalid_output_rate (float): доля ответов completion, в которых
+        значение одной из меток недопустимо.
+        output_text (str): текст ответа completion вместо JSON с метками,
+        если задан (для проверки разбора ответа модели).
+        stall_rate (float): доля ответов, зависающих на stall_ms.
+        stall_ms (float): задержка зависшего ответа.
+    """
+    latency_ms: float = 50.0
+    latency_sigma: float = 0.5
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    outage: bool = False
+    invalid_output_rate: float = 0.0
+    output_text: str = ""
+    stall_rate: float = 0.0
+    stall_ms: float = 5000.0
+
+    def delay(self, rnd: random.Random) -> float:
+        if self.stall_rate and rnd.random() < self.stall_rate:
+            return self.stall_ms / 1000
+        if self.latency_sigma <= 0:
+            return self.latency_ms / 1000
+        return rnd.lognormvariate(0, self.latency_sigma) * \
+            self.latency_ms / 1000
+
+    def update(self, values: Dict[str, Any]) -> None:
+        for f in fields(self):
+            if f.name in values:
+                setattr(self, f.name, type(getattr(self, f.name))(
+                    values[f.name]
+                ))
+
+
+@dataclass
+class StubState:
+    """Настройки и счётчики всех заглушек."""
+    configs: Dict[str, UpstreamConfig] = field(
+        default_factory=lambda: {name: UpstreamConfig()
+                                 for name in SERVICES}
+    )
+    counters: Dict[str, Dict[str, int]] = field(
+        default_factory=lambda: {name: {} for name in SERVICES}
+    )
+    rnd: random.Random = field(default_factory=lambda: random.Random(7))
+
+    def count(self, service: str, outcome: str) -> None:
+        counters = self.counters[service]
+        counters[outcome] = counters.get(outcome, 0) + 1
+
+
+def _pick_label(text: str, labels: list) -> str:
+    """Детерминированно выбирает метку по тексту, «спам» — только
+    для текстов со словом «реклама»."""
+    if "спам" in labels:
+        return "спам" if "реклама" in text.lower() else "не спам"
+    digest = int(hashlib.md5(text.encode()).hexdigest(), 16)
+    return labels[digest % len(labels)]
+
+
+def build_app(state: Optional[StubState] = None) -> web.Application:
+    """Собирает aiohttp-приложение с заглушками.
+
+    Args:
+        state (StubState, optional): общее состояние заглушек.
+
+    Returns:
+        web.Application.
+    """
+    state = state or StubState()
+    baseline = {name: asdict(config)
+                for name, config in state.configs.items()}
+
+    async def simulate(service: str) -> Optional[web.Response]:
+        config = state.configs[service]
+        await asyncio.sleep(config.delay(state.rnd))
+        if config.outage:
+            state.count(service, "503")
+            return web.json_response({"message": "Service unavailable"},
+                                     status=503)
+        roll = state.rnd.random()
+        if roll < config.rate_limit_rate:
+            state.count(service, "429")
+            return web.json_response({"message": "Too many requests"},
+                                     status=429)
+        if roll < config.rate_limit_rate + config.error_rate:
+            state.count(service, "500")
+            return web.json_response({"message": "Internal error"},
+                                     status=500)
+        state.count(service, "200")
+        return None
+
+    async def iam(request: web.Request) -> web.Response:
+        error = await simulate("iam")
+        if error is not None:
+            return error
+        expires = datetime.now(timezone.utc) + timedelta(hours=12)
+        return web.json_response({
+            "iamToken": "stub-iam-token",
+            "expiresAt": expires.strftime("%Y-%m-%dT%H:%M:%S.%f000Z"),
+        })
+
+    async def classify(request: web.Request) -> web.Response:
+        data = await request.json()
+        error = await simulate("classify")
+        if error is not None:
+            return error
+        labels = data["labels"]
+        label = _pick_label(data["text"], labels)
+        return web.json_response({"predictions": [
+            {"label": item, "confidence": 0.9 if item == label else
+             0.1 / max(1, len(labels) - 1)}
+            for item in labels
+        ]})
+
+    async def completion(request: web.Request) -> web.Response:
+        data = await request.json()
+        error = await simulate("completion")
+        if error is not None:
+            return error
+        text = next(message["text"] for message in data["messages"]
+                    if message["role"] == "user")
+        properties = data["jsonSchema"]["schema"]["properties"]
+        labels = {name: _pick_label(text, schema["enum"])
+                  for name, schema in properties.items()}
+        config = state.configs["completion"]
+        if labels and state.rnd.random() < config.invalid_output_rate:
+            labels[state.rnd.choice(sorted(labels))] = "не знаю"
+        output = config.output_text or json.dumps(labels, ensure_ascii=False)
+        return web.json_response({"result": {
+            "alternatives": [{
+                "message": {"role": "assistant", "text": output},
+                "status": "ALTERNATIVE_STATUS_FINAL",
+            }],
+            "modelVersion": "stub",
+        }})
+
+    async def iplocate(request: web.Request) -> web.Response:
+        data = await request.json()
+        error = await simulate("iplocate")
+        if error is not None:
+            return error
+        digest = int(hashlib.md5(data["ip"].encode()).hexdigest(), 16)
+        country, city = CITIES[digest % len(CITIES)]
+        return web.json_response({"location": {
+            "value": city,
+            "data": {"country": country, "city": city},
+        }})
+
+    async def get_config(request: web.Request) -> web.Response:
+        return web.json_response({
+            "configs": {name: asdict(config)
+                        for name, config in state.configs.items()},
+        })
+
+    async def set_config(request: web.Request) -> web.Response:
+        data = await request.json()
+        services = data.pop("services", None) or list(SERVICES)
+        for service in services:
+            state.configs[service].update(data)
+        return await get_config(request)
+
+    async def reset(request: web.Request) -> web.Response:
+        for service, values in baseline.items():
+            state.configs[service].update(values)
+        return await get_config(request)
+
+    async def stats(request: web.Request) -> web.Response:
+        return web.json_response(state.counters)
+
+    app = web.Application()
+    app["state"] = state
+    app.router.add_post("/iam/v1/tokens", iam)
+    app.router.add_post("/foundationModels/v1/fewShotTextClassification",
+                        classify)
+    app.router.add_post("/foundationModels/v1/completion", completion)
+    app.router.add_post("/iplocate/address", iplocate)
+    app.router.add_get("/_stub/config", get_config)
+    app.router.add_post("/_stub/config", set_config)
+    app.router.add_post("/_stub/reset", reset)
+    app.router.add_get("/_stub/stats", stats)
+    return app
+
+
+def upstream_env(base_url: str) -> Dict[str, str]:
+    """Переменные окружения, направляющие приложение на заглушки.
+
+    Args:
+        base_url (str): адрес сервера заглушек, например
+        http://127.0.0.1:8081.
+
+    Returns:
+        Dict[str, str].
+    """
+    return {
+        "YA_CLOUD_OAUTH_TOKEN": "stub-oauth-token",
+        "YA_CLOUD_CATALOG_ID": "stub-catalog",
+        "DADATA_API_KEY": "stub-dadata-key",
+        "YA_CLOUD_IAM_URL": f"{base_url}/iam/v1/tokens",
+        "YA_CLOUD_CLASSIFY_URL": f"{base_url}/foundationModels/v1/"
+                                 f"fewShotTextClassification",
+        "YA_CLOUD_COMPLETION_URL": f"{base_url}/foundationModels/v1/"
+                                   f"completion",
+        "DADATA_IPLOCATE_URL": f"{base_url}/iplocate/address",
+    }
+
+
+async def start_stub_server(state: StubState,
+                            host: str = "127.0.0.1",
+                            port: int = 0) -> tuple[web.AppRunner, str]:
+    """Запускает заглушки в текущем event loop.
+
+    Returns:
+        tuple[web.AppRunner, str]. Runner для остановки и базовый адрес.
+    """
+    runner = web.AppRunner(build_app(state), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{port}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--fault", choices=sorted(FAULTS),
+                        help="Сбой, включённый с момента запуска")
+    args = parser.parse_args()
+    state = StubState()
+    for config in state.configs.values():
+        config.update({"latency_ms": args.latency_ms,
+                       "latency_sigma": args.latency_sigma,
+                       "error_rate": args.error_rate,
+                       "rate_limit_rate": args.rate_limit_rate})
+    app = build_app(state)
+    if args.fault:
+        for config in state.configs.values():
+            config.update(FAULTS[args.fault])
+    web.run_app(app, host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Герметичный набор бенчмарков: ASGI-приложение в том же процессе,
+локальные заглушки Yandex Cloud и DaData, заранее наполненная база.
+
+Сценарии: create (с фоновой обработкой), list (с фильтрами и
+пагинацией), get, patch. Результат — JSON, пригодный для сравнения
+между коммитами:
+
+``python -m benchmarks.suite --rows 50000 --output before.json``
+``python -m benchmarks.suite --rows 50000 --compare before.json``
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict
+
+from benchmarks._common import (InProcessClient,
+                                ROOT,
+                                create_schema,
+                                measure,
+                                prepare_environment,
+                                seed_complaints)
+from benchmarks.stubs import StubState, start_stub_server, upstream_env
+
+SCENARIOS = ("create", "list", "get", "patch")
+COMPARED = ("rps", "p50_ms", "p95_ms", "p99_ms")
+
+TEXTS = [
+    "Списаны деньги, но услуга не активирована.",
+    "Приложение вылетает при открытии профиля.",
+    "Не пришёл чек после оплаты подписки.",
+    "Форма обратной связи не отправляется.",
+]
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def build_scenarios(client: InProcessClient,
+                    rows: int,
+                    rnd: random.Random) -> Dict[str, Callable]:
+    now = datetime.now()
+
+    async def expect(status: int, allowed: tuple) -> None:
+        if status not in allowed:
+            raise RuntimeError(f"Unexpected status {status}")
+
+    async def create(i: int):
+        status, _ = await client.request(
+            "POST", "/api/v1/complaint/",
+            json={"text": f"{rnd.choice(TEXTS)} Заявка {i}"},
+            client_ip=f"10.0.{i % 256}.{rnd.randint(1, 254)}",
+        )
+        await expect(status, (201,))
+
+    async def list_filtered(i: int):
+        params: Dict[str, Any] = {"limit": 100,
+                                  "offset": rnd.randrange(0, 2000, 100)}
+        variant = i % 4
+        if variant == 1:
+            params["category"] = rnd.choice(["техническая", "оплата",
+                                             "другое"])
+        elif variant == 2:
+            params["status"] = rnd.choice(["open", "closed"])
+            params["sentiment"] = rnd.choice(["positive", "negative",
+                                              "neutral"])
+        elif variant == 3:
+            start = now - timedelta(minutes=rnd.randrange(rows))
+            params["start_date"] = start.isoformat(timespec="seconds")
+            params["end_date"] = (start + timedelta(days=1)).isoformat(
+                timespec="seconds"
+            )
+        status, _ = await client.request("GET", "/api/v1/complaint/",
+                                         params=params)
+        await expect(status, (200,))
+
+    async def get(i: int):
+        status, _ = await client.request(
+            "GET", f"/api/v1/complaint/{rnd.randint(1, rows)}/"
+        )
+        await expect(status, (200,))
+
+    async def patch(i: int):
+        status, _ = await client.request(
+            "PATCH", f"/api/v1/complaint/{rnd.randint(1, rows)}/",
+            json={"status": rnd.choice(["open", "closed"])},
+        )
+        await expect(status, (200,))
+
+    return {"create": create, "list": list_filtered,
+            "get": get, "patch": patch}
+
+
+def compare(current: Dict[str, Any],
+            baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Относительное изменение метрик сценариев в процентах."""
+    result = {}
+    for name, stats in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        result[name] = {
+            f"{key}_change_pct": round(
+                (stats[key] - base[key]) / base[key] * 100, 1
+            )
+            for key in COMPARED if base.get(key)
+        }
+    return result
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    state = StubState()
+    for config in state.configs.values():
+        config.update({"latency_ms": args.upstream_latency_ms,
+                       "latency_sigma": args.upstream_latency_sigma,
+                       "error_rate": args.upstream_error_rate,
+                       "rate_limit_rate": args.upstream_429_rate})
+    runner, base_url = await start_stub_server(state)
+    os.environ.update(upstream_env(base_url))
+    os.environ.setdefault("HTTP_CONNECTION_RETRY_DELAY",
+                          str(args.retry_delay))
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from app import app
+
+    await create_schema()
+    started = time.perf_counter()
+    await seed_complaints(args.rows)
+    seed_seconds = time.perf_counter() - started
+
+    rnd = random.Random(args.seed)
+    client = InProcessClient(app)
+    scenarios = build_scenarios(client, args.rows, rnd)
+    results: Dict[str, Any] = {}
+    async with app.router.lifespan_context(app):
+        for name in args.scenarios:
+            results[name] = await measure(scenarios[name], args.requests,
+                                          args.concurrency)
+            if name == "create":
+                started = time.perf_counter()
+                await client.drain()
+                results[name]["enrichment_drain_s"] = round(
+                    time.perf_counter() - started, 3
+                )
+        await client.drain()
+    await runner.cleanup()
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "rows": args.rows,
+            "seed_seconds": round(seed_seconds, 2),
+            "upstream": {
+                "latency_ms": args.upstream_latency_ms,
+                "latency_sigma": args.upstream_latency_sigma,
+                "error_rate": args.upstream_error_rate,
+                "rate_limit_rate": args.upstream_429_rate,
+            },
+        },
+        "scenarios": results,
+        "upstream_calls": state.counters,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS,
+                        default=list(SCENARIOS))
+    parser.add_argument("--upstream-latency-ms", type=float, default=50)
+    parser.add_argument("--upstream-latency-sigma", type=float,
+                        default=0.5)
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--upstream-429-rate", type=float, default=0.0)
+    parser.add_argument("--retry-delay", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Файл для сохранения результата")
+    parser.add_argument("--compare", help="Файл с предыдущим результатом")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+
+    prepare_environment()
+    report = asyncio.run(run(args))
+    if baseline:
+        with open(baseline) as f:
+            report["comparison"] = compare(report, json.load(f))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, "w") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Масштабирование по числу воркеров uvicorn.
+
+Запускает приложение как отдельный процесс ``uvicorn --workers N``
+для каждого N из ``--workers`` поверх одной наполненной базы и заглушек
+внешних сервисов и нагружает его по HTTP из нескольких процессов.
+Для каждого N печатает пропускную способность, задержки и ускорение
+относительно первого N, а также число обращений к заглушкам — при
+общем кэше IAM-токен запрашивается один раз на все воркеры.
+
+``python -m benchmarks.workers --workers 1 2 4 --duration 20``
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Any, Dict, List
+
+import aiohttp
+
+from benchmarks._common import (SRC,
+                                create_schema,
+                                percentile,
+                                prepare_environment,
+                                seed_complaints)
+from benchmarks.stubs import upstream_env
+
+SCENARIOS = ("get", "list", "create")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} is not ready after {timeout} s")
+
+
+async def _load(base_url: str, scenario: str, rows: int,
+                concurrency: int, duration: float,
+                offset: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(index: int):
+        nonlocal errors
+        i = index
+        while time.perf_counter() < deadline:
+            i += concurrency
+            if scenario == "get":
+                request = session.get(
+                    f"{base_url}/api/v1/complaint/{i % rows + 1}/"
+                )
+            elif scenario == "list":
+                request = session.get(
+                    f"{base_url}/api/v1/complaint/",
+                    params={"limit": 100, "offset": (i * 100) % rows}
+                )
+            else:
+                request = session.post(
+                    f"{base_url}/api/v1/complaint/",
+                    json={"text": f"Не работает оплата, заявка "
+                                  f"{offset}-{i}"}
+                )
+            started = time.perf_counter()
+            try:
+                async with request as response:
+                    await response.read()
+                    if response.status >= 400:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return {"latencies": latencies, "errors": errors}
+
+
+def _load_process(args: tuple) -> Dict[str, Any]:
+    return asyncio.run(_load(*args))
+
+
+def run_load(base_url: str, scenario: str, rows: int, processes: int,
+             concurrency: int, duration: float) -> Dict[str, Any]:
+    """Нагружает приложение из нескольких процессов одновременно."""
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(_load_process, [
+            (base_url, scenario, rows, concurrency, duration, n)
+            for n in range(processes)
+        ])
+    latencies = [value for result in results
+                 for value in result["latencies"]]
+    return {
+        "requests": len(latencies),
+        "errors": sum(result["errors"] for result in results),
+        "rps": round(len(latencies) / duration, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+def stub_stats(stub_url: str) -> Dict[str, Any]:
+    with urllib.request.urlopen(f"{stub_url}/_stub/stats") as response:
+        return json.load(response)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS,
+                        default=list(SCENARIOS))
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--load-processes", type=int,
+                        default=max(2, (os.cpu_count() or 1) // 2))
+    parser.add_argument("--concurrency", type=int, default=20,
+                        help="Параллельных запросов на процесс нагрузки")
+    parser.add_argument("--upstream-latency-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    workdir = prepare_environment()
+    asyncio.run(create_schema())
+    asyncio.run(seed_complaints(args.rows))
+
+    stub_port = free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    stubs = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stubs", "--port", str(stub_port),
+         "--latency-ms", str(args.upstream_latency_ms)],
+        cwd=SRC.parent, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    env = dict(os.environ, **upstream_env(stub_url),
+               PYTHONPATH=str(SRC), LOG_LEVEL="WARNING",
+               HTTP_CONNECTION_RETRY_DELAY="0.05")
+    report: Dict[str, Any] = {"meta": {"cpu_count": os.cpu_count(),
+                                       "rows": args.rows,
+                                       "duration_s": args.duration},
+                              "runs": {}}
+    try:
+        wait_ready(f"{stub_url}/_stub/config")
+        for workers in args.workers:
+            port = free_port()
+            before = stub_stats(stub_url)
+            app = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app:app",
+                 "--port", str(port), "--workers", str(workers),
+                 "--no-access-log", "--log-level", "warning"],
+                cwd=workdir, env=env
+            )
+            base_url = f"http://127.0.0.1:{port}"
+            try:
+                wait_ready(f"{base_url}/api/v1/complaint/?limit=1")
+                run = {}
+                for scenario in args.scenarios:
+                    run[scenario] = run_load(
+                        base_url, scenario, args.rows, args.load_processes,
+                        args.concurrency, args.duration
+                    )
+                after = stub_stats(stub_url)
+                run["upstream_calls"] = {
+                    service: {status: count - before[service].get(status, 0)
+                              for status, count in counts.items()}
+                    for service, counts in after.items()
+                }
+                report["runs"][workers] = run
+            finally:
+                app.terminate()
+                app.wait(timeout=30)
+    finally:
+        stubs.terminate()
+        stubs.wait(timeout=10)
+
+    base = report["runs"][args.workers[0]]
+    report["speedup"] = {
+        workers: {scenario: round(run[scenario]["rps"]
+                                  / base[scenario]["rps"], 2)
+                  for scenario in args.scenarios if base[scenario]["rps"]}
+        for workers, run in report["runs"].items()
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
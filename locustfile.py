@@ -1,6 +1,39 @@
+"""Нагрузочный тест API жалоб.
+
+Профили нагрузки (``--load-profile``):
+    steady — постоянное число пользователей, создание, чтение
+    и обновление жалоб;
+    burst — чередование фоновой нагрузки и всплесков;
+    repeat-heavy — повторяющиеся тексты и запросы одних и тех же жалоб;
+    deep-pagination — чтение списка с большими смещениями.
+
+При указании ``--stub-url`` на время теста включается сбой заглушек
+внешних сервисов (``--fault``). После теста печатается отчёт SLO:
+p50/p95/p99 по эндпоинтам и доля вызовов внешних сервисов, вернувших
+значения по умолчанию. При нарушении порогов locust завершается с кодом 1.
+
+``locust --headless -u 50 -r 10 -t 5m --load-profile burst``
+"""
+import json
+import logging
 import random
 
-from locust import HttpUser, task, between
+from benchmarks.slo import (SloThresholds,
+                            check_slo,
+                            fallback_shares,
+                            format_report,
+                            parse_overrides,
+                            parse_prometheus)
+from benchmarks.stubs import FAULTS
+
+import gevent
+
+from locust import HttpUser, LoadTestShape, between, events, task
+from locust.runners import WorkerRunner
+
+import requests
+
+logger = logging.getLogger("locustfile")
 
 complaints = [
     "Не пришёл чек после оплаты.",
@@ -34,49 +67,253 @@ complaints = [
     "Приложение тормозит, как будто 1999 год.",
     "Отличная работа! Теперь вообще ничего не работает."
 ]
-base_api_url = "http://localhost:8000/api/v1"
+repeated_complaints = complaints[:3]
+base_api_url = "/api/v1"
+default_host = "http://localhost:8000"
+
+PROFILES = ("steady", "burst", "repeat-heavy", "deep-pagination")
+
+_metrics_before = {}
+_report = {}
+
+
+@events.init_command_line_parser.add_listener
+def add_arguments(parser):
+    group = parser.add_argument_group("Complaints load test")
+    group.add_argument("--load-profile", choices=PROFILES, default="steady",
+                       env_var="LOAD_PROFILE", help="Профиль нагрузки")
+    group.add_argument("--burst-period", type=float, default=60,
+                       help="Период всплесков, с")
+    group.add_argument("--burst-length", type=float, default=15,
+                       help="Длительность всплеска, с")
+    group.add_argument("--burst-base-share", type=float, default=0.2,
+                       help="Доля пользователей вне всплеска")
+    group.add_argument("--max-offset", type=int, default=10000,
+                       help="Наибольшее смещение для deep-pagination")
+    group.add_argument("--stub-url", default="", env_var="LOAD_STUB_URL",
+                       help="Адрес заглушек benchmarks.stubs")
+    group.add_argument("--fault", choices=("none", *sorted(FAULTS)),
+                       default="none", help="Сбой заглушек во время теста")
+    group.add_argument("--fault-start", type=float, default=30,
+                       help="Начало сбоя от старта теста, с")
+    group.add_argument("--fault-duration", type=float, default=60,
+                       help="Длительность сбоя, с")
+    group.add_argument("--slo-p50-ms", type=float, default=None)
+    group.add_argument("--slo-p95-ms", type=float, default=1000)
+    group.add_argument("--slo-p99-ms", type=float, default=3000)
+    group.add_argument("--slo-error-rate", type=float, default=0.01)
+    group.add_argument("--slo-fallback-share", type=float, default=0.05)
+    group.add_argument("--slo-overrides", default="",
+                       help='Пороги эндпоинтов: "create.p95_ms=1500,..."')
+    group.add_argument("--slo-report", default="",
+                       help="Файл для сохранения отчёта SLO в JSON")
+
+
+def fetch_metrics(host):
+    try:
+        response = requests.get(f"{host}/metrics", timeout=5)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logger.warning(f"Unable to fetch metrics: {e}")
+        return {}
+    return parse_prometheus(response.text)
+
+
+def inject_fault(options):
+    """Включает сбой заглушек на заданное время и возвращает исходные
+    настройки."""
+    gevent.sleep(options.fault_start)
+    logger.info(f"Fault {options.fault} started")
+    requests.post(f"{options.stub_url}/_stub/config",
+                  json=FAULTS[options.fault], timeout=5)
+    gevent.sleep(options.fault_duration)
+    requests.post(f"{options.stub_url}/_stub/reset", timeout=5)
+    logger.info(f"Fault {options.fault} finished")
+
+
+@events.test_start.add_listener
+def on_test_start(environment, **kwargs):
+    if isinstance(environment.runner, WorkerRunner):
+        return
+    options = environment.parsed_options
+    _metrics_before.clear()
+    _metrics_before.update(fetch_metrics(environment.host or default_host))
+    if options.stub_url and options.fault != "none":
+        environment.runner.greenlet.spawn(inject_fault, options)
+
+
+@events.test_stop.add_listener
+def on_test_stop(environment, **kwargs):
+    if isinstance(environment.runner, WorkerRunner):
+        return
+    options = environment.parsed_options
+    if options.stub_url:
+        requests.post(f"{options.stub_url}/_stub/reset", timeout=5)
+    after = fetch_metrics(environment.host or default_host)
+    endpoints = [
+        {"name": entry.name,
+         "requests": entry.num_requests,
+         "failures": entry.num_failures,
+         "p50_ms": entry.get_response_time_percentile(0.5),
+         "p95_ms": entry.get_response_time_percentile(0.95),
+         "p99_ms": entry.get_response_time_percentile(0.99)}
+        for entry in sorted(environment.stats.entries.values(),
+                            key=lambda entry: entry.name)
+    ]
+    default = SloThresholds(p50_ms=options.slo_p50_ms,
+                            p95_ms=options.slo_p95_ms,
+                            p99_ms=options.slo_p99_ms,
+                            error_rate=options.slo_error_rate)
+    _report.clear()
+    _report.update(check_slo(
+        endpoints,
+        fallback_shares(_metrics_before, after) if after else {},
+        default,
+        parse_overrides(options.slo_overrides, default),
+        options.slo_fallback_share,
+    ))
+    _report["profile"] = options.load_profile
+    _report["fault"] = options.fault
+    print(format_report(_report))
+    if options.slo_report:
+        with open(options.slo_report, "w") as f:
+            json.dump(_report, f, indent=2, ensure_ascii=False)
+
+
+@events.quitting.add_listener
+def on_quitting(environment, **kwargs):
+    if _report and not _report["passed"]:
+        environment.process_exit_code = 1
+
 
 class CreateComplaints(HttpUser):
     """Creating random complaints."""
+    host = default_host
     wait_time = between(7.0, 10.0)
 
-    def on_start(self):
-        """ on_start is called when a Locust start before any task is scheduled """
-        pass
-
-    def on_stop(self):
-        """ on_stop is called when the TaskSet is stopping """
-        pass
-
     @task(1)
     def new_complaint(self):
         self.client.post(f"{base_api_url}/complaint/",
-                         json={"text": random.choice(complaints)})
+                         json={"text": random.choice(complaints)},
+                         name="create")
 
 
 class UpdateComplaints(HttpUser):
-    """Get all complaints and update status for 3 of all"""
+    """Get all complaints, read one of them and update status for 3 of all
+    in one request"""
+    host = default_host
     wait_time = between(3.0, 10.0)
 
-    def on_start(self):
-        """ on_start is called when a Locust start before any task is scheduled """
-        pass
-
-    def on_stop(self):
-        """ on_stop is called when the TaskSet is stopping """
-        pass
+    def list_complaints(self):
+        response = self.client.get(f"{base_api_url}/complaint/",
+                                   name="list")
+        if not response.ok:
+            return []
+        return response.json()
 
     @task(1)
     def update(self):
-        response = self.client.get(f"{base_api_url}/complaint/")
-        data = response.json()
+        data = self.list_complaints()
         upd_data = [
             {"status": "closed" if item['status'] == "open" else "open",
              "id": item['id']}
             for item in data
         ]
-        for _ in range(3):
-            upd_data_item = random.choice(upd_data)
-            self.client.patch(f"{base_api_url}/complaint/{upd_data_item['id']}/",
-                              json={"status": upd_data_item['status']})
+        if not upd_data:
+            return
+        self.client.patch(f"{base_api_url}/complaint/",
+                          json={"items": random.sample(upd_data,
+                                                       min(3, len(upd_data)))},
+                          name="patch bulk")
+
+    @task(2)
+    def read(self):
+        data = self.list_complaints()
+        if data:
+            self.client.get(
+                f"{base_api_url}/complaint/{random.choice(data)['id']}/",
+                name="get"
+            )
+
+
+class RepeatComplaints(HttpUser):
+    """Same texts submitted again and again, same complaints read over and
+    over: exercises caches of classification and geolocation."""
+    host = default_host
+    wait_time = between(0.5, 2.0)
+
+    def on_start(self):
+        response = self.client.get(f"{base_api_url}/complaint/",
+                                   params={"limit": 10}, name="list")
+        self.hot_ids = [item["id"] for item in response.json()] \
+            if response.ok else []
+
+    @task(1)
+    def repeat_complaint(self):
+        self.client.post(f"{base_api_url}/complaint/",
+                         json={"text": random.choice(repeated_complaints)},
+                         name="create")
+
+    @task(3)
+    def read_hot(self):
+        if self.hot_ids:
+            self.client.get(
+                f"{base_api_url}/complaint/{random.choice(self.hot_ids)}/",
+                name="get"
+            )
+
+
+class DeepPagination(HttpUser):
+    """Walks the complaint list page by page up to large offsets."""
+    host = default_host
+    wait_time = between(0.5, 1.5)
+    page_size = 100
+
+    def on_start(self):
+        max_offset = self.environment.parsed_options.max_offset
+        self.offset = random.randrange(0, max_offset + 1, self.page_size)
+
+    @task(1)
+    def next_page(self):
+        with self.client.get(f"{base_api_url}/complaint/",
+                             params={"limit": self.page_size,
+                                     "offset": self.offset},
+                             name="list deep",
+                             catch_response=True) as response:
+            if not response.ok:
+                response.failure(f"status {response.status_code}")
+                return
+            page = response.json()
+        if len(page) < self.page_size or \
+                self.offset >= self.environment.parsed_options.max_offset:
+            self.offset = 0
+        else:
+            self.offset += self.page_size
+
+
+class ProfileShape(LoadTestShape):
+    """Число пользователей и их классы по выбранному профилю. Общее
+    число пользователей, скорость запуска и длительность задаются
+    обычными параметрами -u, -r и -t."""
+    use_common_options = True
+
+    user_classes = {
+        "steady": [CreateComplaints, UpdateComplaints],
+        "burst": [CreateComplaints, UpdateComplaints],
+        "repeat-heavy": [RepeatComplaints],
+        "deep-pagination": [DeepPagination],
+    }
 
+    def tick(self):
+        options = self.runner.environment.parsed_options
+        if options.run_time and self.get_run_time() > options.run_time:
+            return None
+        users = options.num_users or 1
+        spawn_rate = options.spawn_rate or 1
+        if options.load_profile == "burst":
+            in_burst = self.get_run_time() % options.burst_period < \
+                options.burst_length
+            if not in_burst:
+                users = max(1, round(users * options.burst_base_share))
+            spawn_rate = max(spawn_rate, users)
+        return users, spawn_rate, self.user_classes[options.load_profile]
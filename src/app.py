@@ -1,10 +1,99 @@
+import logging
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
 from logging_config import setup_logging
 
+from routers.admin import router as admin_router
+from routers.complaint import prime_queries
 from routers.complaint import router as complaint_router
+from routers.service import router as service_router
+
+from settings import (CLASSIFIER_MODE,
+                      DADATA_IPLOCATE_URL,
+                      LOOP_MONITOR_ENABLED,
+                      MIGRATE_ON_STARTUP,
+                      YA_CLOUD_CLASSIFY_URL,
+                      YA_CLOUD_COMPLETION_URL)
+
+from tools.archive import archiver
+from tools.http import close_session, open_connection
+from tools.idempotency import IdempotencyMiddleware
+from tools.leader import leader
+from tools.local_model import local_labeler
+from tools.metrics import MetricsMiddleware
+from tools.migrations import upgrade_if_behind
+from tools.profiling import loop_monitor
+from tools.reenrich import reenrich_job
+from tools.shared_cache import shared_cache
+from tools.tracing import TracingMiddleware, trace_buffer
+from tools.warmup import warm_up
+from tools.webhooks import webhooks
+from tools.yandex_cloud import yc_credentials
+
+logger = logging.getLogger("app.startup")
+
+
+async def purge_shared_cache() -> None:
+    await shared_cache.purge_expired()
+
+
+async def open_upstream_connections() -> None:
+    classify_url = (YA_CLOUD_COMPLETION_URL if CLASSIFIER_MODE == "combined"
+                    else YA_CLOUD_CLASSIFY_URL)
+    for url in (classify_url, DADATA_IPLOCATE_URL):
+        await open_connection(url)
+
+
+async def preload_shared_cache() -> None:
+    shared_cache.preload()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    if MIGRATE_ON_STARTUP:
+        await upgrade_if_behind()
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    leader.start()
+    warm_up.start()
+    webhooks.start()
+    logger.info(f"Startup finished in "
+                f"{(time.perf_counter() - started) * 1000:.1f} ms, "
+                f"warm-up continues in background")
+    yield
+    await warm_up.stop()
+    await reenrich_job.stop()
+    await webhooks.stop()
+    await leader.stop()
+    await loop_monitor.stop()
+    await close_session()
+    shared_cache.close()
+    trace_buffer.close()
+
 
 setup_logging()
-app = FastAPI()
+if yc_credentials.configured:
+    leader.add_job("yc_token_refresh", yc_credentials.refresh_if_expiring)
+    warm_up.add_stage("yc_token", yc_credentials.get_tokens)
+leader.add_job("shared_cache_purge", purge_shared_cache)
+leader.add_job("archive", archiver.job)
+if webhooks.configured:
+    leader.add_job("webhook_redelivery", webhooks.redeliver)
+warm_up.add_stage("upstream_connections", open_upstream_connections)
+warm_up.add_stage("database", prime_queries)
+warm_up.add_stage("shared_cache", preload_shared_cache)
+warm_up.add_stage("local_model", local_labeler.load)
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(IdempotencyMiddleware,
+                   routes={("POST", "/api/v1/complaint/"): "complaint_create"})
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
 
 app.include_router(complaint_router)
+app.include_router(service_router)
+app.include_router(admin_router)
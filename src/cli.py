@@ -0,0 +1,155 @@
+"""Служебные команды сервиса жалоб.
+
+Запуск из каталога src: ``python cli.py <команда> [параметры]``.
+
+``python cli.py archive --older-than-days 90`` — перенести закрытые
+жалобы в архив за один проход.
+
+``python cli.py reenrich --field sentiment --field geo --dry-run`` —
+посчитать, а без ``--dry-run`` — повторно обработать жалобы, у которых
+после сбоев внешних сервисов остались значения по умолчанию.
+
+``python cli.py train-model`` — обучить локальную модель тональности
+и категории на метках Yandex Cloud из базы данных.
+"""
+import argparse
+import asyncio
+import json
+import logging
+from datetime import datetime
+
+from logging_config import setup_logging
+
+from settings import (ARCHIVE_AFTER_DAYS,
+                      ARCHIVE_BATCH_PAUSE,
+                      ARCHIVE_BATCH_SIZE,
+                      LOCAL_MODEL_PATH,
+                      LOCAL_MODEL_THRESHOLD,
+                      REENRICH_RATE)
+
+from tools.archive import Archiver
+from tools.http import close_session
+from tools.local_model import local_labeler, train
+from tools.reenrich import DEFAULT_VALUES, ReEnricher, parse_fields
+
+logger = logging.getLogger("app.cli")
+
+
+async def archive(args: argparse.Namespace) -> None:
+    archiver = Archiver(after_days=args.older_than_days,
+                        batch_size=args.batch_size,
+                        pause=args.pause)
+    moved = await archiver.run(after_id=args.after_id)
+    logger.info(f"Archived {moved} complaints")
+
+
+async def reenrich(args: argparse.Namespace) -> None:
+    enricher = ReEnricher(
+        fields=parse_fields(args.field or list(DEFAULT_VALUES)),
+        start_date=args.start_date,
+        end_date=args.end_date,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        checkpoint_path=args.checkpoint,
+        rate=args.rate
+    )
+    if args.dry_run:
+        after_id = enricher.load_checkpoint()["last_id"] \
+            if args.resume else 0
+        report = {"dry_run": True, "after_id": after_id,
+                  "matching": await enricher.count(after_id)}
+    else:
+        await local_labeler.load()
+        try:
+            report = await enricher.run(resume=args.resume)
+        finally:
+            await close_session()
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+async def train_model(args: argparse.Namespace) -> None:
+    report = await train(path=args.output,
+                         holdout=args.holdout,
+                         epochs=args.epochs,
+                         min_df=args.min_df,
+                         max_features=args.max_features,
+                         limit=args.limit,
+                         threshold=args.threshold)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    archive_parser = commands.add_parser(
+        "archive", help="Перенести закрытые жалобы в архив"
+    )
+    archive_parser.add_argument("--older-than-days", type=int,
+                                default=ARCHIVE_AFTER_DAYS)
+    archive_parser.add_argument("--batch-size", type=int,
+                                default=ARCHIVE_BATCH_SIZE)
+    archive_parser.add_argument("--pause", type=float,
+                                default=ARCHIVE_BATCH_PAUSE,
+                                help="Пауза между пачками, с")
+    archive_parser.add_argument("--after-id", type=int, default=0,
+                                help="Продолжить перенос с ID больше "
+                                     "указанного")
+    archive_parser.set_defaults(handler=archive)
+
+    reenrich_parser = commands.add_parser(
+        "reenrich", help="Повторно обработать жалобы со значениями "
+                         "по умолчанию"
+    )
+    reenrich_parser.add_argument(
+        "--field", action="append",
+        help="Поле и значение, требующее обработки: sentiment, category, "
+             "geo или, например, category=другое. Можно указать "
+             "несколько раз, по умолчанию — все поля"
+    )
+    reenrich_parser.add_argument("--start-date", type=datetime.fromisoformat,
+                                 help="Начальная дата создания жалоб")
+    reenrich_parser.add_argument("--end-date", type=datetime.fromisoformat,
+                                 help="Конечная дата создания жалоб")
+    reenrich_parser.add_argument("--batch-size", type=int, default=200)
+    reenrich_parser.add_argument("--concurrency", type=int, default=10,
+                                 help="Жалоб, обрабатываемых одновременно")
+    reenrich_parser.add_argument("--rate", type=float, default=REENRICH_RATE,
+                                 help="Жалоб в секунду, 0 — без ограничения")
+    reenrich_parser.add_argument("--checkpoint",
+                                 default="db_file/reenrich.checkpoint.json",
+                                 help="Файл с прогрессом обработки")
+    reenrich_parser.add_argument("--resume", action="store_true",
+                                 help="Продолжить с сохранённого прогресса")
+    reenrich_parser.add_argument("--dry-run", action="store_true",
+                                 help="Только посчитать жалобы")
+    reenrich_parser.set_defaults(handler=reenrich)
+
+    train_parser = commands.add_parser(
+        "train-model", help="Обучить локальную модель тональности "
+                            "и категории"
+    )
+    train_parser.add_argument("--output", default=LOCAL_MODEL_PATH,
+                              help="Файл модели")
+    train_parser.add_argument("--holdout", type=float, default=0.1,
+                              help="Доля жалоб для оценки качества")
+    train_parser.add_argument("--epochs", type=int, default=8)
+    train_parser.add_argument("--min-df", type=int, default=2,
+                              help="Наименьшее число жалоб с признаком")
+    train_parser.add_argument("--max-features", type=int, default=50000,
+                              help="Наибольший размер словаря")
+    train_parser.add_argument("--limit", type=int,
+                              help="Наибольшее число последних жалоб "
+                                   "из рабочей таблицы и из архива")
+    train_parser.add_argument("--threshold", type=float,
+                              default=LOCAL_MODEL_THRESHOLD,
+                              help="Порог уверенности для оценки покрытия")
+    train_parser.set_defaults(handler=train_model)
+
+    args = parser.parse_args()
+    setup_logging()
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
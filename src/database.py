@@ -1,11 +1,30 @@
+from settings import DATABASE_BUSY_TIMEOUT, DATABASE_ECHO, DATABASE_URL
+
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import (AsyncSession,
                                     async_sessionmaker,
                                     create_async_engine)
 
+from tools.metrics import instrument_engine
+
 async_engine = create_async_engine(
-    url='sqlite+aiosqlite:///db_file/complaints.db',
-    echo=True
+    url=DATABASE_URL,
+    echo=DATABASE_ECHO
 )
+instrument_engine(async_engine.sync_engine)
 async_session_maker = async_sessionmaker(bind=async_engine,
                                          class_=AsyncSession,
                                          expire_on_commit=False)
+
+
+if async_engine.dialect.name == "sqlite":
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        """Включает WAL и ожидание блокировки, чтобы несколько воркеров
+        могли читать во время записи и не получали "database is locked"
+        при одновременной записи."""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={DATABASE_BUSY_TIMEOUT}")
+        cursor.close()
@@ -1,24 +1,144 @@
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Dict
+
+import orjson
+
+from settings import (LOG_DEBUG_SAMPLE_RATE,
+                      LOG_FORMAT,
+                      LOG_LEVEL,
+                      LOG_LEVELS,
+                      LOG_QUEUE_SIZE)
+
+from tools.metrics import LOG_RECORDS_DROPPED
+from tools.tracing import current_trace_id
+
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {
+    "message", "asctime", "trace_id"
+}
+_exception_formatter = logging.Formatter()
+
+
+class TraceIdFilter(logging.Filter):
+    """Добавляет в запись лога ID текущей трассировки."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = current_trace_id() or "-"
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Пропускает только долю DEBUG-записей, остальные отбрасывает
+    до постановки в очередь.
+
+    Attributes:
+        rate (float): доля пропускаемых DEBUG-записей (0..1).
+    """
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        if random.random() < self.rate:
+            return True
+        LOG_RECORDS_DROPPED.inc("sampled")
+        return False
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler с ограниченной очередью: при переполнении запись
+    отбрасывается и учитывается в метриках, event loop не блокируется.
+
+    В отличие от стандартного prepare() запись не форматируется
+    и не копируется: логгер "app" не имеет других обработчиков.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(
+                record.exc_info
+            )
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc("queue_full")
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись лога в JSON, сохраняя поля из extra."""
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "timestamp": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "trace_id": getattr(record, "trace_id", "-"),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc_info"] = record.exc_text
+        return orjson.dumps(data, default=str).decode()
+
+
+def parse_levels(levels: str) -> Dict[str, str]:
+    """Разбирает уровни логирования модулей из строки вида
+    "app.dadata=WARNING,sqlalchemy.engine=INFO".
+
+    Args:
+        levels (str): строка с уровнями.
+
+    Returns:
+        Dict[str, str]. Название логгера и уровень.
+    """
+    result = {}
+    for item in levels.split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        result[name.strip()] = level.strip().upper()
+    return result
 
 
 def setup_logging() -> None:
     """
-    Инициирует логгер
+    Инициирует логгер.
+
+    Записи ставятся в ограниченную очередь (QueueHandler), а запись
+    в файл с ротацией и вывод в консоль выполняются в отдельном потоке
+    QueueListener, поэтому не блокируют event loop.
 
     Returns:
         None
     """
+    logger = logging.getLogger("app")
+    if any(isinstance(h, BoundedQueueHandler) for h in logger.handlers):
+        return
+    logger.setLevel(LOG_LEVEL)
+
     log_dir = Path("logs")
     log_dir.mkdir(exist_ok=True)
 
-    logger = logging.getLogger("app")
-    logger.setLevel(logging.DEBUG)
-
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
+    if LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            "%(asctime)s - %(name)s - %(levelname)s - "
+            "[%(trace_id)s] %(message)s"
+        )
 
     file_handler = RotatingFileHandler(
         log_dir / "app.log",
@@ -29,8 +149,19 @@ def setup_logging() -> None:
 
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = BoundedQueueHandler(log_queue)
+    queue_handler.addFilter(DebugSamplingFilter(LOG_DEBUG_SAMPLE_RATE))
+    queue_handler.addFilter(TraceIdFilter())
+    logger.addHandler(queue_handler)
+
+    listener = QueueListener(log_queue, file_handler, console_handler,
+                             respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
 
     logging.getLogger("aiohttp").setLevel(logging.WARNING)
     logging.getLogger("sqlalchemy").setLevel(logging.ERROR)
+    for name, level in parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
@@ -0,0 +1,85 @@
+"""Packed ip address
+
+Revision ID: 0fab4feadf6f
+Revises: dc9a529fadc0
+Create Date: 2026-10-19 14:05:47.318204
+
+"""
+import ipaddress
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0fab4feadf6f'
+down_revision: Union[str, Sequence[str], None] = 'dc9a529fadc0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+
+def pack(value):
+    """Pack a text address into 4 or 16 bytes, None if it is invalid."""
+    try:
+        address = ipaddress.ip_address(value.strip())
+    except (AttributeError, ValueError):
+        return None, None
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return address.packed, address.version
+
+
+def convert(source: str, target: str, transform) -> None:
+    """Copy values between columns in batches of BATCH_SIZE rows."""
+    connection = op.get_bind()
+    complaints = sa.table('complaints',
+                          sa.column('id', sa.Integer()),
+                          sa.column(source),
+                          sa.column(target),
+                          sa.column('ip_version', sa.SmallInteger()))
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(complaints.c.id, complaints.c[source])
+            .where(complaints.c.id > last_id,
+                   complaints.c[source].is_not(None))
+            .order_by(complaints.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        connection.execute(
+            complaints.update()
+            .where(complaints.c.id == sa.bindparam('row_id'))
+            .values({target: sa.bindparam('value'),
+                     'ip_version': sa.bindparam('version')}),
+            [dict(zip(('value', 'version'), transform(value)), row_id=id_)
+             for id_, value in rows]
+        )
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('complaints', sa.Column('ip_packed', sa.LargeBinary(length=16), nullable=True))
+    op.add_column('complaints', sa.Column('ip_version', sa.SmallInteger(), nullable=True))
+    convert('ip_address', 'ip_packed', pack)
+    with op.batch_alter_table('complaints') as batch_op:
+        batch_op.drop_column('ip_address')
+        batch_op.alter_column('ip_packed', new_column_name='ip_address')
+    op.create_index('ix_complaints_ip', 'complaints', ['ip_version', 'ip_address'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_complaints_ip', table_name='complaints')
+    op.add_column('complaints', sa.Column('ip_text', sa.String(length=15), nullable=True))
+    convert('ip_address', 'ip_text',
+            lambda value: (str(ipaddress.ip_address(value)), None))
+    with op.batch_alter_table('complaints') as batch_op:
+        batch_op.drop_column('ip_address')
+        batch_op.drop_column('ip_version')
+        batch_op.alter_column('ip_text', new_column_name='ip_address')
@@ -0,0 +1,54 @@
+"""complaints autoincrement
+
+Revision ID: 741e330cd43d
+Revises: 9a1b2b137e46
+Create Date: 2026-10-19 10:56:43.043026
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '741e330cd43d'
+down_revision: Union[str, Sequence[str], None] = '9a1b2b137e46'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    connection = op.get_bind()
+    if connection.dialect.name != 'sqlite':
+        return
+    # Without AUTOINCREMENT SQLite reuses the id of a deleted max-id row,
+    # which may already be in complaints_archive.
+    with op.batch_alter_table('complaints', recreate='always',
+                              table_kwargs={'sqlite_autoincrement': True}):
+        pass
+    archived = connection.execute(
+        sa.text('SELECT MAX(id) FROM complaints_archive')
+    ).scalar()
+    if archived is None:
+        return
+    updated = connection.execute(
+        sa.text("UPDATE sqlite_sequence SET seq = MAX(seq, :seq) "
+                "WHERE name = 'complaints'"),
+        {'seq': archived}
+    )
+    if not updated.rowcount:
+        connection.execute(
+            sa.text("INSERT INTO sqlite_sequence (name, seq) "
+                    "VALUES ('complaints', :seq)"),
+            {'seq': archived}
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('complaints', recreate='always'):
+        pass
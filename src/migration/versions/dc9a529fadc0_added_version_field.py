@@ -0,0 +1,28 @@
+"""Added version field
+
+Revision ID: dc9a529fadc0
+Revises: 001c84acb3a4
+Create Date: 2026-10-19 10:12:31.402918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'dc9a529fadc0'
+down_revision: Union[str, Sequence[str], None] = '001c84acb3a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('complaints', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('complaints', 'version')
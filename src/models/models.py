@@ -2,24 +2,128 @@ from models.schemas import (ComplaintCategory,
                             ComplaintSentiment,
                             ComplaintStatus)
 
-from sqlalchemy import Column, DateTime, Enum, Integer, String
+from sqlalchemy import (Column,
+                        DateTime,
+                        Enum,
+                        Index,
+                        Integer,
+                        LargeBinary,
+                        SmallInteger,
+                        String,
+                        TypeDecorator)
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.sql import func
 
+from tools.ip import ip_version, pack_ip, unpack_ip
+from tools.shared_cache import cache_key
+
 
 Base = declarative_base()
 
 
-class ComplaintDB(Base):
-    __tablename__ = "complaints"
+class IPAddressType(TypeDecorator):
+    """IP-адрес, хранящийся в упакованном виде: 4 байта для IPv4,
+    16 байт для IPv6. В Python значение — строка."""
+    impl = LargeBinary(16)
+    cache_ok = True
 
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, bytes):
+            return value
+        return pack_ip(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return unpack_ip(value)
+
+
+def default_ip_version(context) -> int | None:
+    return ip_version(context.get_current_parameters().get("ip_address"))
+
+
+def text_hash(text: str | None) -> str | None:
+    """Хэш текста жалобы — входных данных определения тональности
+    и категории."""
+    return cache_key(text) if text is not None else None
+
+
+def ip_hash(ip_address: str | None) -> str | None:
+    """Хэш IP-адреса жалобы — входных данных геолокации."""
+    return cache_key(ip_address) if ip_address is not None else None
+
+
+def default_text_hash(context) -> str | None:
+    return text_hash(context.get_current_parameters().get("text"))
+
+
+class ComplaintColumns:
+    """Поля жалобы, общие для рабочей таблицы и архива."""
     text = Column(String(1000), nullable=False)
     status = Column(Enum(ComplaintStatus), default=ComplaintStatus.OPEN)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     sentiment = Column(Enum(ComplaintSentiment),
                        default=ComplaintSentiment.UNKNOWN)
     category = Column(Enum(ComplaintCategory), default=ComplaintCategory.OTHER)
-    ip_address = Column(String(15), nullable=True)
+    ip_address = Column(IPAddressType, nullable=True)
+    ip_version = Column(SmallInteger, nullable=True,
+                        default=default_ip_version)
     geo_country = Column(String(50), nullable=True)
     geo_city = Column(String(50), nullable=True)
+    version = Column(Integer, nullable=False, default=1,
+                     server_default="1")
+    # Хэш текста и хэши входных данных, по которым получены результаты
+    # обработки (см. tools.complaint.dirty_stages).
+    text_hash = Column(String(64), nullable=True, default=default_text_hash)
+    labels_hash = Column(String(64), nullable=True)
+    # Кем определены тональность и категория: "remote" — Yandex Cloud,
+    # "local" — локальная модель (tools.local_model), "fallback" —
+    # Yandex Cloud вернул значение по умолчанию хотя бы для одной метки
+    labels_model = Column(String(10), nullable=True)
+    geo_hash = Column(String(64), nullable=True)
+
+
+class ComplaintDB(ComplaintColumns, Base):
+    __tablename__ = "complaints"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+
+    # AUTOINCREMENT: ID перенесённой в архив жалобы не выдаётся повторно
+    __table_args__ = (
+        Index("ix_complaints_ip", "ip_version", "ip_address"),
+        {"sqlite_autoincrement": True},
+    )
+
+
+class ComplaintArchiveDB(ComplaintColumns, Base):
+    """Закрытые жалобы, перенесённые из рабочей таблицы
+    (см. tools.archive). ID сохраняется."""
+    __tablename__ = "complaints_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_complaints_archive_timestamp", "timestamp"),
+        Index("ix_complaints_archive_ip", "ip_version", "ip_address"),
+    )
+
+
+class WebhookBatchDB(Base):
+    """Пачка событий, ещё не доставленная подписчику вебхуков
+    (см. tools.webhooks). Удаляется после доставки."""
+    __tablename__ = "webhook_outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    subscriber = Column(String(50), nullable=False)
+    batch_id = Column(String(32), nullable=False)
+    body = Column(LargeBinary, nullable=False)
+    events = Column(Integer, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    last_error = Column(String(200), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_webhook_outbox_next_attempt_at", "next_attempt_at"),
+    )
@@ -1,8 +1,10 @@
 from datetime import datetime
 from enum import Enum as PyEnum
-from typing import Optional
+from typing import List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from tools.ip import ip_range
 
 
 class ComplaintStatus(str, PyEnum):
@@ -44,6 +46,12 @@ class ComplaintUpdate(BaseModel):
     """Описание жалобы для обновления."""
     text: Optional[str] = Field(None, min_length=10, max_length=1000)
     status: Optional[ComplaintStatus] = Field(None)
+    version: Optional[int] = Field(
+        None,
+        ge=1,
+        description="Ожидаемая версия жалобы. Если указана, изменения "
+                    "применяются только при совпадении с текущей версией"
+    )
 
     class Config:
         json_schema_extra = {
@@ -65,7 +73,7 @@ class ComplaintResponse(BaseModel):
     ip_address: str | None
     geo_country: str | None
     geo_city: str | None
-
+    version: int
 
     class Config:
         from_attributes = True
@@ -79,6 +87,111 @@ class ComplaintResponse(BaseModel):
                 "category": "техническая",
                 "ip_address": "178.252.97.31",
                 "geo_country": "Россия",
-                "geo_city": "Санкт-Петербург"
+                "geo_city": "Санкт-Петербург",
+                "version": 1
             }
         }
+
+
+class ComplaintFilter(BaseModel):
+    """Условия отбора жалоб."""
+    category: Optional[ComplaintCategory] = Field(None)
+    status: Optional[ComplaintStatus] = Field(None)
+    sentiment: Optional[ComplaintSentiment] = Field(None)
+    start_date: Optional[datetime] = Field(None)
+    end_date: Optional[datetime] = Field(None)
+    ip: Optional[str] = Field(
+        None,
+        description="IP-адрес, подсеть (178.252.97.0/24) или диапазон "
+                    "адресов (178.252.97.10-178.252.97.99)"
+    )
+
+    @field_validator("ip")
+    @classmethod
+    def check_ip(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None:
+            ip_range(value)
+        return value
+
+
+class ComplaintStatusItem(BaseModel):
+    """Новый статус для жалобы с указанным ID."""
+    id: int
+    status: ComplaintStatus
+
+
+class ComplaintBulkUpdate(BaseModel):
+    """Описание массового изменения статуса жалоб.
+
+    Принимает либо список пар {id, status}, либо фильтр и новый статус
+    для всех подходящих жалоб.
+    """
+    items: Optional[List[ComplaintStatusItem]] = Field(
+        None, min_length=1, max_length=1000
+    )
+    filter: Optional[ComplaintFilter] = Field(None)
+    status: Optional[ComplaintStatus] = Field(
+        None, description="Новый статус для жалоб, подходящих под фильтр"
+    )
+
+    @model_validator(mode="after")
+    def check_mode(self) -> "ComplaintBulkUpdate":
+        if (self.items is None) == (self.filter is None):
+            raise ValueError("Укажите либо items, либо filter")
+        if self.filter is not None:
+            if self.status is None:
+                raise ValueError("Для filter необходимо указать status")
+            if not self.filter.model_dump(exclude_none=True):
+                raise ValueError("filter должен содержать хотя бы "
+                                 "одно условие")
+        if self.items is not None and self.status is not None:
+            raise ValueError("status используется только вместе с filter")
+        return self
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "items": [
+                    {"id": 27, "status": "closed"},
+                    {"id": 28, "status": "open"},
+                ]
+            }
+        }
+
+
+class ComplaintBulkResult(BaseModel):
+    """Результат изменения одной жалобы."""
+    id: int
+    result: str = Field(description="updated или not_found")
+    status: Optional[ComplaintStatus] = Field(None)
+
+
+class ComplaintBulkResponse(BaseModel):
+    """Описание результата массового изменения статуса жалоб."""
+    updated: int
+    results: List[ComplaintBulkResult]
+
+
+class ComplaintTrend(BaseModel):
+    """Частота жалоб с одним значением категории, тональности или
+    города."""
+    value: str
+    count: int = Field(description="Жалоб за окно")
+    rate_per_min: float = Field(description="Жалоб в минуту за окно")
+    baseline_per_min: Optional[float] = Field(
+        None, description="Обычная частота, жалоб в минуту (EWMA)"
+    )
+    ratio: Optional[float] = Field(
+        None, description="Отношение частоты к обычной"
+    )
+    spike: bool = Field(description="Частота аномально высокая")
+
+
+class ComplaintTrendsResponse(BaseModel):
+    """Описание текущей частоты жалоб."""
+    window_s: float
+    warm: bool = Field(description="Обычная частота уже накоплена "
+                                   "за окно и всплески определяются")
+    category: List[ComplaintTrend]
+    sentiment: List[ComplaintTrend]
+    city: List[ComplaintTrend]
@@ -0,0 +1,229 @@
+import hmac
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import (APIRouter,
+                     Depends,
+                     HTTPException,
+                     Header,
+                     Query,
+                     Response)
+
+from settings import ADMIN_TOKEN, REENRICH_RATE
+
+from tools.local_model import local_labeler
+from tools.profiling import (ProfilerBusyError,
+                             loop_monitor,
+                             run_cprofile,
+                             run_sampling_profile)
+from tools.reenrich import (DEFAULT_VALUES,
+                            ReEnricher,
+                            parse_fields,
+                            reenrich_job)
+from tools.tracing import trace_buffer
+from tools.webhooks import webhooks
+from tools.yandex_cloud import yc_credentials
+
+
+async def verify_admin_token(
+        x_admin_token: Optional[str] = Header(None)
+) -> None:
+    """Проверяет заголовок X-Admin-Token. Без ADMIN_TOKEN
+    административные методы недоступны.
+
+    Raises:
+        HTTPException: 403, если ADMIN_TOKEN не задан или токен
+        не совпадает.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403,
+                            detail="Административные методы отключены: "
+                                   "не задан ADMIN_TOKEN")
+    if x_admin_token is None or not hmac.compare_digest(
+            x_admin_token.encode(), ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Доступ запрещён")
+
+
+router = APIRouter(prefix="/api/v1/admin",
+                   tags=["Admin"],
+                   dependencies=[Depends(verify_admin_token)])
+
+
+@router.get(
+    "/traces/",
+    summary="Медленные трассировки",
+    description="Отдаёт самые долгие из последних трассировок запросов "
+                "вместе с фоновой обработкой жалоб",
+)
+async def list_traces(
+        min_duration_ms: float = Query(
+            0, ge=0, description="Минимальная длительность трассировки, мс"
+        ),
+        limit: int = Query(20, ge=1, le=200, description="Лимит записей")
+):
+    return trace_buffer.slowest(min_duration_ms=min_duration_ms,
+                                limit=limit)
+
+
+@router.get(
+    "/traces/{trace_id}/",
+    summary="Трассировка",
+    description="Отдаёт все участки трассировки по ID",
+)
+async def get_trace(trace_id: str):
+    trace = trace_buffer.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404,
+                            detail="Трассировка не найдена")
+    return trace
+
+
+@router.get(
+    "/loop/",
+    summary="Задержка event loop",
+    description="Отдаёт текущую и максимальную задержку event loop и "
+                "последние зависания со стеком блокирующего кода",
+)
+async def loop_stats():
+    return loop_monitor.stats()
+
+
+@router.get(
+    "/yandex-cloud/credentials/",
+    summary="Учётные данные Yandex Cloud",
+    description="Отдаёт по каждым учётным данным пула каталог, число "
+                "выполняемых и всех запросов, ответов 429, оставшееся "
+                "время остывания и срок действия IAM-токена",
+)
+async def yc_credentials_stats():
+    return yc_credentials.stats()
+
+
+@router.get(
+    "/local-model/",
+    summary="Локальная модель тональности и категории",
+    description="Отдаёт сведения о загруженной локальной модели, порог "
+                "уверенности и долю совпадений её меток с Yandex Cloud "
+                "для проверочных и неуверенных предсказаний",
+)
+async def local_model_stats():
+    return local_labeler.stats()
+
+
+@router.get(
+    "/webhooks/",
+    summary="Вебхуки",
+    description="Отдаёт по каждому подписчику число накопленных "
+                "событий, выполняемых доставок и недоставленных пачек "
+                "в webhook_outbox",
+)
+async def webhook_stats():
+    return await webhooks.stats()
+
+
+@router.post(
+    "/reenrich/",
+    summary="Повторная обработка жалоб",
+    description="Запускает в фоне этого воркера повторную обработку "
+                "жалоб, у которых остались значения по умолчанию. "
+                "Жалобы обрабатываются в очереди backfill вместе "
+                "с новыми жалобами и не вытесняют их",
+    status_code=202,
+    responses={409: {"description": "Обработка уже выполняется"},
+               422: {"description": "Неизвестное поле"}},
+)
+async def start_reenrich(
+        field: Optional[List[str]] = Query(
+            None, description="Поле и значение, требующее обработки: "
+                              "sentiment, category, geo или, например, "
+                              "category=другое; по умолчанию — все поля"
+        ),
+        start_date: Optional[datetime] = Query(
+            None, description="Начальная дата создания жалоб"
+        ),
+        end_date: Optional[datetime] = Query(
+            None, description="Конечная дата создания жалоб"
+        ),
+        batch_size: int = Query(200, ge=1, le=1000,
+                                description="Размер пачки"),
+        concurrency: int = Query(10, ge=1, le=100,
+                                 description="Жалоб, обрабатываемых "
+                                             "одновременно"),
+        rate: float = Query(REENRICH_RATE, ge=0,
+                            description="Жалоб в секунду, 0 — без "
+                                        "ограничения")
+):
+    try:
+        fields = parse_fields(field or list(DEFAULT_VALUES))
+    except ValueError:
+        raise HTTPException(status_code=422,
+                            detail=f"Поле должно быть одним из: "
+                                   f"{', '.join(DEFAULT_VALUES)}")
+    enricher = ReEnricher(fields=fields,
+                          start_date=start_date,
+                          end_date=end_date,
+                          batch_size=batch_size,
+                          concurrency=concurrency,
+                          rate=rate)
+    if not reenrich_job.start(enricher):
+        raise HTTPException(status_code=409,
+                            detail="Повторная обработка уже выполняется")
+    return reenrich_job.stats()
+
+
+@router.get(
+    "/reenrich/",
+    summary="Ход повторной обработки",
+    description="Отдаёт условия, прогресс и отчёт текущей или последней "
+                "повторной обработки в этом воркере",
+)
+async def reenrich_stats():
+    return reenrich_job.stats()
+
+
+@router.post(
+    "/profile/cprofile/",
+    summary="Профилирование cProfile",
+    description="Профилирует обработку текущего трафика в течение "
+                "заданного времени и отдаёт отчёт pstats",
+    response_class=Response,
+    responses={409: {"description": "Профилирование уже выполняется"}},
+)
+async def profile_cprofile(
+        seconds: float = Query(10, gt=0, le=60,
+                               description="Длительность, секунды"),
+        sort: str = Query("cumulative",
+                          pattern="^(cumulative|tottime|calls|ncalls)$",
+                          description="Ключ сортировки pstats"),
+        limit: int = Query(50, ge=1, le=500,
+                           description="Количество строк отчёта")
+):
+    try:
+        report = await run_cprofile(seconds, sort, limit)
+    except ProfilerBusyError:
+        raise HTTPException(status_code=409,
+                            detail="Профилирование уже выполняется")
+    return Response(content=report, media_type="text/plain")
+
+
+@router.post(
+    "/profile/sample/",
+    summary="Семплирующее профилирование",
+    description="Снимает стеки event loop в течение заданного времени и "
+                "отдаёт их в формате collapsed stacks для flame graph",
+    response_class=Response,
+    responses={409: {"description": "Профилирование уже выполняется"}},
+)
+async def profile_sample(
+        seconds: float = Query(10, gt=0, le=60,
+                               description="Длительность, секунды"),
+        interval_ms: float = Query(5, ge=1, le=1000,
+                                   description="Интервал семплирования, мс")
+):
+    try:
+        report = await run_sampling_profile(seconds, interval_ms / 1000)
+    except ProfilerBusyError:
+        raise HTTPException(status_code=409,
+                            detail="Профилирование уже выполняется")
+    return Response(content=report, media_type="text/plain")
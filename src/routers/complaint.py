@@ -1,71 +1,235 @@
+import asyncio
 from datetime import datetime
 from typing import List, Optional
 
-from database import async_session_maker
+from database import async_engine, async_session_maker
 
 from fastapi import (APIRouter,
                      BackgroundTasks,
+                     Depends,
                      HTTPException,
                      Query,
                      Request,
                      status)
 
-from models.models import ComplaintDB
-from models.schemas import (ComplaintCategory,
+from models.models import ComplaintArchiveDB, ComplaintDB, text_hash
+from models.schemas import (ComplaintBulkResponse,
+                            ComplaintBulkResult,
+                            ComplaintBulkUpdate,
+                            ComplaintCategory,
                             ComplaintCreate,
                             ComplaintResponse,
                             ComplaintSentiment,
                             ComplaintStatus,
+                            ComplaintTrendsResponse,
                             ComplaintUpdate)
 
-from settings import AI_SPAM_PROMT
+from settings import AI_SPAM_PROMT, CLASSIFIER_MODE
 
-from sqlalchemy import and_, select, update
+from sqlalchemy import (Select,
+                        and_,
+                        func,
+                        insert,
+                        select,
+                        union_all,
+                        update)
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from tools.complaint import post_create
+from tools import events
+from tools.admission import admit, create_admission, enrichment_admission
+from tools.complaint import (ClassifiedLabels,
+                             complaint_labels_classifier,
+                             dirty_stages,
+                             schedule_post_create)
+from tools.idempotency import MAX_KEY_LENGTH
+from tools.ip import ip_range, normalize_ip
+from tools.metrics import ARCHIVE_READS
+from tools.rate_limit import rate_limit
+from tools.serialization import (ARCHIVE_RESPONSE_COLUMNS,
+                                 ORJSONResponse,
+                                 RESPONSE_COLUMNS,
+                                 rows_to_dicts,
+                                 to_response_dict)
+from tools.tracing import span
+from tools.trends import trend_detector
 from tools.yandex_cloud import YandexCloudClassifier
 
 
 router = APIRouter(prefix="/api/v1", tags=["Complaints"])
 
 
+def build_filters(category: Optional[ComplaintCategory] = None,
+                  status: Optional[ComplaintStatus] = None,
+                  sentiment: Optional[ComplaintSentiment] = None,
+                  start_date: Optional[datetime] = None,
+                  end_date: Optional[datetime] = None,
+                  ip: Optional[str] = None,
+                  model: type = ComplaintDB) -> list:
+    """Формирует условия отбора жалоб.
+
+    Args:
+        ip (str, optional): адрес, подсеть или диапазон адресов,
+        см. tools.ip.ip_range().
+        model (type, optional, default=ComplaintDB): таблица жалоб,
+        ComplaintDB или ComplaintArchiveDB.
+
+    Raises:
+        ValueError: если ip не разобран.
+
+    Returns:
+        list. Условия для передачи в where().
+    """
+    filters = []
+    if category:
+        filters.append(model.category == category.value)
+    if status:
+        filters.append(model.status == status)
+    if sentiment:
+        filters.append(model.sentiment == sentiment)
+    if start_date:
+        filters.append(model.timestamp >= start_date)
+    if end_date:
+        filters.append(model.timestamp <= end_date)
+    if ip:
+        version, first, last = ip_range(ip)
+        filters.append(model.ip_version == version)
+        filters.append(model.ip_address.between(first, last))
+    return filters
+
+
+def select_complaints(filters: list, offset: int, limit: int,
+                      archive_filters: Optional[list] = None) -> Select:
+    """Запрос страницы жалоб в формате ответа API.
+
+    Args:
+        filters (list): условия из build_filters().
+        offset (int): смещение.
+        limit (int): лимит записей.
+        archive_filters (list, optional): условия из build_filters()
+        для архива. Если заданы, жалобы выбираются из рабочей таблицы
+        и архива вместе.
+
+    Returns:
+        Select.
+    """
+    query = select(*RESPONSE_COLUMNS)
+    if filters:
+        query = query.where(and_(*filters))
+    if archive_filters is None:
+        return query.offset(offset).limit(limit).order_by(
+            ComplaintDB.timestamp.desc()
+        )
+    archive_query = select(*ARCHIVE_RESPONSE_COLUMNS)
+    if archive_filters:
+        archive_query = archive_query.where(and_(*archive_filters))
+    union = union_all(query, archive_query).subquery()
+    return select(*union.c).offset(offset).limit(limit).order_by(
+        union.c.timestamp.desc()
+    )
+
+
+def select_complaint(complaint_id: int,
+                     archived: bool = False) -> Select:
+    """Запрос жалобы по ID в формате ответа API.
+
+    Args:
+        complaint_id (int): ID жалобы.
+        archived (bool, optional, default=False): искать в архиве.
+
+    Returns:
+        Select.
+    """
+    if archived:
+        return select(*ARCHIVE_RESPONSE_COLUMNS).where(
+            ComplaintArchiveDB.id == complaint_id
+        )
+    return select(*RESPONSE_COLUMNS).where(ComplaintDB.id == complaint_id)
+
+
+async def prime_queries() -> None:
+    """Выполняет основные запросы на чтение при запуске: SQLAlchemy
+    компилирует и кэширует выражения, а SQLite загружает в память
+    страницы таблицы и индексов. Соединения пула открываются заранее.
+
+    Returns:
+        None.
+    """
+    async def prime_connection() -> None:
+        async with async_session_maker() as session:
+            await session.execute(select(func.count(ComplaintDB.id)))
+
+    await asyncio.gather(*(prime_connection()
+                           for _ in range(async_engine.pool.size())))
+    async with async_session_maker() as session:
+        await session.execute(select_complaints([], 0, 50))
+        await session.execute(select_complaint(1))
+
+
 @router.post(
     "/complaint/",
     response_model=ComplaintResponse,
     status_code=status.HTTP_201_CREATED,
     summary="Создать новую жалобу",
     description="Регистрирует в системе новую жалобу и "
-                "обрабатывает в дальнейшем",
+                "обрабатывает в дальнейшем. Повтор запроса с тем же "
+                "заголовком Idempotency-Key возвращает сохранённый ответ "
+                "без создания новой жалобы",
     responses={
         400: {"description": "Некорректные данные"},
+        409: {"description": "Запрос с этим Idempotency-Key ещё "
+                             "выполняется"},
+        429: {"description": "Слишком много запросов с IP-адреса"},
+        503: {"description": "Сервис перегружен"},
     },
+    dependencies=[Depends(rate_limit("complaint_create")),
+                  Depends(admit(create_admission, enrichment_admission))],
+    # Заголовок обрабатывает IdempotencyMiddleware до маршрута
+    openapi_extra={"parameters": [{
+        "name": "Idempotency-Key",
+        "in": "header",
+        "required": False,
+        "description": "Ключ повторов запроса",
+        "schema": {"type": "string", "minLength": 1,
+                   "maxLength": MAX_KEY_LENGTH},
+    }]},
 )
 async def create_complaint(
         complaint: ComplaintCreate,
         background_tasks: BackgroundTasks,
         request: Request
 ):
-    spam_classifier = YandexCloudClassifier(
-        input_text=complaint.text,
-        task_description=AI_SPAM_PROMT,
-        choices=["спам", "не спам"],
-        default_value="не спам",
-        action="spam_detect"
-    )
-    spam_result = await spam_classifier.y_cloud_classify_text()
+    classified = None
+    if CLASSIFIER_MODE == "combined":
+        classifier = complaint_labels_classifier(complaint.text)
+        labels = await classifier.y_cloud_classify_text()
+        spam_result = labels["spam"]
+        classified = ClassifiedLabels(labels, classifier.fallback_labels)
+    else:
+        spam_classifier = YandexCloudClassifier(
+            input_text=complaint.text,
+            task_description=AI_SPAM_PROMT,
+            choices=["спам", "не спам"],
+            default_value="не спам",
+            action="spam_detect"
+        )
+        spam_result = await spam_classifier.y_cloud_classify_text()
     if spam_result == "спам":
         raise HTTPException(status_code=400, detail="В запросе обнаружен спам")
-    ip_address = request.client.host
-    db_complaint = ComplaintDB(
+    ip_address = normalize_ip(request.client.host if request.client
+                              else None)
+    query = insert(ComplaintDB).values(
         text=complaint.text,
         category=complaint.category,
         ip_address=ip_address,
-    )
-    async with async_session_maker() as session:
-        session.add(db_complaint)
-        await session.commit()
-        await session.refresh(db_complaint)
-    background_tasks.add_task(post_create, db_complaint)
+    ).returning(ComplaintDB)
+    with span("db.insert"):
+        async with async_session_maker() as session:
+            result = await session.execute(query)
+            db_complaint = result.scalar_one()
+            await session.commit()
+    events.emit("complaint.created", to_response_dict(db_complaint))
+    schedule_post_create(background_tasks, db_complaint,
+                         classified=classified)
     return db_complaint
 
 
@@ -76,6 +240,9 @@ async def create_complaint(
     summary="Получить жалобы",
     description="Отдаёт все жалобы клиентов, "
                 "подходящие под условия фильтрации",
+    responses={
+        400: {"description": "Некорректный IP-адрес, подсеть или диапазон"},
+    },
 )
 async def list_complaints(
         category: Optional[ComplaintCategory] = Query(
@@ -105,30 +272,58 @@ async def list_complaints(
                         "формат: YYYY-MM-DDTHH:MM:SS",
             examples=["2025-01-20T00:00:00"],
         ),
+        ip: Optional[str] = Query(
+            None,
+            description="Фильтр по IP-адресу, подсети или диапазону "
+                        "адресов",
+            examples=["178.252.97.31", "178.252.97.0/24",
+                      "178.252.97.10-178.252.97.99", "2a02:6b8::/32"],
+        ),
+        include_archived: bool = Query(
+            False,
+            description="Искать также среди закрытых жалоб, "
+                        "перенесённых в архив"
+        ),
         offset: int = Query(0, ge=0, description="Смещение (пагинация)"),
         limit: int = Query(50, ge=1, le=100, description="Лимит записей")
 ):
+    try:
+        filters = build_filters(category, status, sentiment,
+                                start_date, end_date, ip)
+        archive_filters = build_filters(
+            category, status, sentiment, start_date, end_date, ip,
+            model=ComplaintArchiveDB
+        ) if include_archived else None
+    except ValueError:
+        raise HTTPException(status_code=400,
+                            detail="Некорректный IP-адрес, подсеть "
+                                   "или диапазон")
+    if include_archived:
+        ARCHIVE_READS.inc("list")
     async with async_session_maker() as session:
-        query = select(ComplaintDB)
-        filters = []
-        if category:
-            filters.append(ComplaintDB.category == category.value)
-        if status:
-            filters.append(ComplaintDB.status == status)
-        if sentiment:
-            filters.append(ComplaintDB.sentiment == sentiment)
-        if start_date:
-            filters.append(ComplaintDB.timestamp >= start_date)
-        if end_date:
-            filters.append(ComplaintDB.timestamp <= end_date)
-        if filters:
-            query = query.where(and_(*filters))
-        query = query.offset(offset).limit(limit).order_by(
-            ComplaintDB.timestamp.desc()
-        )
-        result = await session.execute(query)
-        complaints = result.scalars().all()
-    return complaints
+        result = await session.execute(select_complaints(
+            filters, offset, limit, archive_filters
+        ))
+        rows = result.all()
+    return ORJSONResponse(rows_to_dicts(rows))
+
+
+@router.get(
+    "/complaint/trends/",
+    response_model=ComplaintTrendsResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Частота жалоб",
+    description="Отдаёт частоту обработанных жалоб за последние "
+                "TRENDS_WINDOW секунд по категориям, тональностям и "
+                "городам, обычную частоту и признак всплеска. Данные "
+                "хранятся в памяти воркера, обращения к базе данных нет",
+)
+async def complaint_trends(
+        limit: int = Query(20, ge=1, le=1000,
+                           description="Наибольшее число значений "
+                                       "в каждом измерении")
+):
+    return ORJSONResponse(trend_detector.snapshot(limit=limit))
 
 
 @router.get(
@@ -136,16 +331,46 @@ async def list_complaints(
     response_model=ComplaintResponse,
     status_code=status.HTTP_200_OK,
     summary="Получить жалобу",
-    description="Отдаёт жалобу клиента по ID",
+    description="Отдаёт жалобу клиента по ID, в том числе перенесённую "
+                "в архив",
 )
 async def get_complaint(complaint_id: int):
     async with async_session_maker() as session:
-        query = select(ComplaintDB).where(ComplaintDB.id == complaint_id)
-        result = await session.execute(query)
-        complaint = result.scalar_one_or_none()
-        if not complaint:
-            raise HTTPException(status_code=404, detail="Жалоба не найдена")
-    return complaint
+        result = await session.execute(select_complaint(complaint_id))
+        row = result.one_or_none()
+        if not row:
+            result = await session.execute(select_complaint(complaint_id,
+                                                            archived=True))
+            row = result.one_or_none()
+            if not row:
+                raise HTTPException(status_code=404,
+                                    detail="Жалоба не найдена")
+            ARCHIVE_READS.inc("get")
+    return ORJSONResponse(rows_to_dicts([row])[0])
+
+
+async def raise_if_archived(session: AsyncSession,
+                            complaint_id: int) -> None:
+    """Отклоняет изменение жалобы, перенесённой в архив.
+
+    Args:
+        session (AsyncSession): сессия базы данных.
+        complaint_id (int): ID жалобы.
+
+    Raises:
+        HTTPException: 409, если жалоба в архиве.
+
+    Returns:
+        None.
+    """
+    query = select(ComplaintArchiveDB.id).where(
+        ComplaintArchiveDB.id == complaint_id
+    )
+    if (await session.execute(query)).scalar() is not None:
+        raise HTTPException(
+            status_code=409,
+            detail="Жалоба перенесена в архив и не может быть изменена"
+        )
 
 
 @router.patch("/complaint/{complaint_id}/",
@@ -154,31 +379,127 @@ async def get_complaint(complaint_id: int):
               summary="Редактировать",
               description="Редактирует жалобу клиента и определяет заново "
                           "тональность и её категорию в случае изменения "
-                          "текста",
+                          "текста. Местоположение заново не определяется",
               responses={
                   400: {"description": "Некорректные данные"},
+                  404: {"description": "Жалоба не найдена"},
+                  409: {"description": "Версия жалобы не совпадает "
+                                       "или жалоба в архиве"},
               },)
 async def patch_complaint(complaint_id: int,
                           complaint: ComplaintUpdate,
                           background_tasks: BackgroundTasks):
+    update_fields = dict()
+    if complaint.status:
+        update_fields['status'] = complaint.status
+    if complaint.text:
+        update_fields['text'] = complaint.text
     async with async_session_maker() as session:
-        query = select(ComplaintDB).where(ComplaintDB.id == complaint_id)
-        result = await session.execute(query)
+        if not update_fields:
+            query = select(ComplaintDB).where(ComplaintDB.id == complaint_id)
+            result = await session.execute(query)
+            complaint_db = result.scalar_one_or_none()
+            if not complaint_db:
+                await raise_if_archived(session, complaint_id)
+                raise HTTPException(status_code=404,
+                                    detail="Жалоба не найдена")
+            if complaint.version is not None and \
+                    complaint_db.version != complaint.version:
+                raise HTTPException(
+                    status_code=409,
+                    detail="Жалоба была изменена, версия не совпадает"
+                )
+            return complaint_db
+        filters = [ComplaintDB.id == complaint_id]
+        if complaint.version is not None:
+            filters.append(ComplaintDB.version == complaint.version)
+        hashes = {"text_hash": text_hash(complaint.text)} \
+            if complaint.text else {}
+        query_u = update(ComplaintDB).where(
+            *filters
+        ).values(
+            version=ComplaintDB.version + 1,
+            **update_fields,
+            **hashes
+        ).returning(ComplaintDB).execution_options(
+            synchronize_session=False
+        )
+        result = await session.execute(query_u)
         complaint_db = result.scalar_one_or_none()
         if not complaint_db:
+            if complaint.version is not None:
+                query = select(ComplaintDB.version).where(
+                    ComplaintDB.id == complaint_id
+                )
+                if (await session.execute(query)).scalar() is not None:
+                    raise HTTPException(
+                        status_code=409,
+                        detail="Жалоба была изменена, версия не совпадает"
+                    )
+            await raise_if_archived(session, complaint_id)
             raise HTTPException(status_code=404, detail="Жалоба не найдена")
-        update_fields = dict()
-        if complaint.status:
-            update_fields['status'] = complaint.status
-        if complaint.text:
-            update_fields['text'] = complaint.text
-        if update_fields:
-            query_u = update(ComplaintDB).where(
-                ComplaintDB.id == complaint_id
-            ).values(**update_fields)
-            await session.execute(query_u)
-            await session.commit()
-            await session.refresh(complaint_db)
+        await session.commit()
+    events.emit("complaint.updated", {"id": complaint_db.id,
+                                      "version": complaint_db.version,
+                                      **update_fields})
     if complaint.text:
-        background_tasks.add_task(post_create, complaint_db)
+        stages = dirty_stages(complaint_db, update_fields)
+        if stages:
+            schedule_post_create(background_tasks, complaint_db,
+                                 lane="edited", stages=stages)
     return complaint_db
+
+
+@router.patch("/complaint/",
+              response_model=ComplaintBulkResponse,
+              status_code=status.HTTP_200_OK,
+              summary="Массово изменить статус",
+              description="Изменяет статус жалоб по списку пар {id, status} "
+                          "или по фильтру. Все изменения выполняются в "
+                          "одной транзакции, по одному запросу на каждый "
+                          "статус",
+              responses={
+                  422: {"description": "Некорректные данные"},
+              },)
+async def bulk_update_status(data: ComplaintBulkUpdate):
+    targets: dict[ComplaintStatus, list[int]] = dict()
+    requested: dict[int, ComplaintStatus] = dict()
+    if data.items is not None:
+        for item in data.items:
+            requested[item.id] = item.status
+        for complaint_id, new_status in requested.items():
+            targets.setdefault(new_status, []).append(complaint_id)
+    updated: dict[int, tuple[ComplaintStatus, int]] = dict()
+    async with async_session_maker() as session:
+        if data.filter is not None:
+            statements = [(data.status, build_filters(
+                **data.filter.model_dump()
+            ))]
+        else:
+            statements = [(new_status, [ComplaintDB.id.in_(ids)])
+                          for new_status, ids in targets.items()]
+        for new_status, filters in statements:
+            query = update(ComplaintDB).where(
+                *filters
+            ).values(
+                status=new_status,
+                version=ComplaintDB.version + 1
+            ).returning(
+                ComplaintDB.id, ComplaintDB.version
+            ).execution_options(synchronize_session=False)
+            result = await session.execute(query)
+            for complaint_id, version in result.all():
+                updated[complaint_id] = (new_status, version)
+        await session.commit()
+    results = []
+    for complaint_id, (new_status, version) in updated.items():
+        events.emit("complaint.updated", {"id": complaint_id,
+                                          "version": version,
+                                          "status": new_status})
+        results.append(ComplaintBulkResult(id=complaint_id,
+                                           result="updated",
+                                           status=new_status))
+    results.extend(ComplaintBulkResult(id=complaint_id, result="not_found")
+                   for complaint_id in requested
+                   if complaint_id not in updated)
+    return ComplaintBulkResponse(updated=len(updated), results=results)
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Response
+from fastapi.responses import JSONResponse
+
+from tools.metrics import registry
+from tools.warmup import warm_up
+
+
+router = APIRouter(tags=["Service"])
+
+
+@router.get(
+    "/metrics",
+    summary="Метрики",
+    description="Отдаёт метрики сервиса в текстовом формате Prometheus",
+    response_class=Response,
+)
+async def metrics():
+    return Response(content=registry.render(),
+                    media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get(
+    "/health/live",
+    summary="Liveness probe",
+    description="Отвечает, пока процесс обрабатывает запросы",
+)
+async def health_live():
+    return {"status": "alive"}
+
+
+@router.get(
+    "/health/ready",
+    summary="Readiness probe",
+    description="Отвечает 200 после завершения прогрева при запуске, "
+                "до этого — 503",
+    responses={503: {"description": "Прогрев не завершён"}},
+)
+async def health_ready():
+    return JSONResponse(content=warm_up.status(),
+                        status_code=200 if warm_up.ready else 503)
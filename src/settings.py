@@ -3,6 +3,8 @@ import os
 YA_CLOUD_IAM_TOKEN = os.environ.get('YA_CLOUD_IAM_TOKEN')
 YA_CLOUD_OAUTH_TOKEN = os.environ.get('YA_CLOUD_OAUTH_TOKEN')
 YA_CLOUD_CATALOG_ID = os.environ.get('YA_CLOUD_CATALOG_ID')
+YA_CLOUD_CREDENTIALS = os.environ.get('YA_CLOUD_CREDENTIALS', '')
+YC_CREDENTIAL_COOLDOWN = float(os.environ.get('YC_CREDENTIAL_COOLDOWN', 30))
 AI_COMPLAINT_CATEGORY_PROMT = os.environ.get(
     'AI_COMPLAINT_CATEGORY_PROMT', 'Определи категорию жалобы'
 )
@@ -13,13 +15,151 @@ AI_SPAM_PROMT = os.environ.get(
     'AI_SPAM_PROMT', 'Это сервис для приёма жалоб. '
                      'Определи наличие спама в тексте'
 )
+AI_COMPLAINT_LABELS_PROMT = os.environ.get(
+    'AI_COMPLAINT_LABELS_PROMT',
+    'Это сервис для приёма жалоб. Определи, является ли текст спамом, '
+    'а также тональность и категорию жалобы. Ответь JSON-объектом '
+    'с полями spam, sentiment и category, выбрав значения из '
+    'допустимых вариантов'
+)
+CLASSIFIER_MODE = os.environ.get('CLASSIFIER_MODE', 'separate').lower()
+LOCAL_MODEL_PATH = os.environ.get(
+    'LOCAL_MODEL_PATH', 'db_file/local_model.json'
+)
+LOCAL_MODEL_THRESHOLD = float(os.environ.get('LOCAL_MODEL_THRESHOLD', 0.9))
+LOCAL_MODEL_AUDIT_RATE = float(os.environ.get('LOCAL_MODEL_AUDIT_RATE', 0.05))
+
+YA_CLOUD_IAM_URL = os.environ.get(
+    'YA_CLOUD_IAM_URL', 'https://iam.api.cloud.yandex.net/iam/v1/tokens'
+)
+YA_CLOUD_CLASSIFY_URL = os.environ.get(
+    'YA_CLOUD_CLASSIFY_URL',
+    'https://llm.api.cloud.yandex.net/foundationModels/v1/'
+    'fewShotTextClassification'
+)
+YA_CLOUD_COMPLETION_URL = os.environ.get(
+    'YA_CLOUD_COMPLETION_URL',
+    'https://llm.api.cloud.yandex.net/foundationModels/v1/completion'
+)
+DADATA_IPLOCATE_URL = os.environ.get(
+    'DADATA_IPLOCATE_URL',
+    'https://suggestions.dadata.ru/suggestions/api/4_1/rs/iplocate/address'
+)
 
 HTTP_CONNECTION_TIMEOUT = float(os.environ.get('HTTP_CONNECTION_TIMEOUT', 5))
 HTTP_CONNECTION_RETRY_DELAY = float(os.environ.get(
     'HTTP_CONNECTION_RETRY_DELAY', 5
 ))
 HTTP_CONNECTION_RETRIES = int(os.environ.get('HTTP_CONNECTION_RETRIES', 5))
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 100))
+HTTP_KEEPALIVE_TIMEOUT = float(os.environ.get('HTTP_KEEPALIVE_TIMEOUT', 60))
+HEDGE_ENABLED = os.environ.get('HEDGE_ENABLED', 'false').lower() == 'true'
+HEDGE_QUANTILE = float(os.environ.get('HEDGE_QUANTILE', 0.95))
+HEDGE_BUDGET = float(os.environ.get('HEDGE_BUDGET', 0.05))
+HEDGE_MIN_DELAY = float(os.environ.get('HEDGE_MIN_DELAY', 0.05))
+HEDGE_WINDOW = int(os.environ.get('HEDGE_WINDOW', 200))
 
 DADATA_API_KEY = os.environ.get('DADATA_API_KEY')
 
-DATABASE_URL = "sqlite+aiosqlite:///db_file/complaints.db"
+TRACE_BUFFER_SIZE = int(os.environ.get('TRACE_BUFFER_SIZE', 1000))
+TRACE_MAX_SPANS = int(os.environ.get('TRACE_MAX_SPANS', 200))
+TRACE_EXPORT_FILE = os.environ.get('TRACE_EXPORT_FILE')
+TRACE_EXPORT_QUEUE_SIZE = int(os.environ.get('TRACE_EXPORT_QUEUE_SIZE',
+                                             10000))
+
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+LOOP_MONITOR_ENABLED = os.environ.get(
+    'LOOP_MONITOR_ENABLED', 'true'
+).lower() == 'true'
+LOOP_MONITOR_INTERVAL = float(os.environ.get('LOOP_MONITOR_INTERVAL', 0.1))
+LOOP_SLOW_CALLBACK_THRESHOLD = float(os.environ.get(
+    'LOOP_SLOW_CALLBACK_THRESHOLD', 0.1
+))
+LOOP_SLOW_EVENTS_KEPT = int(os.environ.get('LOOP_SLOW_EVENTS_KEPT', 50))
+
+DATABASE_URL = os.environ.get(
+    'DATABASE_URL', "sqlite+aiosqlite:///db_file/complaints.db"
+)
+DATABASE_ECHO = os.environ.get('DATABASE_ECHO', 'false').lower() == 'true'
+DATABASE_BUSY_TIMEOUT = int(os.environ.get('DATABASE_BUSY_TIMEOUT', 5000))
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG').upper()
+LOG_LEVELS = os.environ.get('LOG_LEVELS', '')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', 1))
+
+SHARED_CACHE_PATH = os.environ.get(
+    'SHARED_CACHE_PATH', 'db_file/shared_cache.db'
+)
+SHARED_CACHE_LOCAL_SIZE = int(os.environ.get('SHARED_CACHE_LOCAL_SIZE', 1024))
+SHARED_CACHE_BUSY_TIMEOUT = float(os.environ.get(
+    'SHARED_CACHE_BUSY_TIMEOUT', 0.01
+))
+CLASSIFICATION_CACHE_TTL = float(os.environ.get(
+    'CLASSIFICATION_CACHE_TTL', 24 * 60 * 60
+))
+GEO_CACHE_TTL = float(os.environ.get('GEO_CACHE_TTL', 7 * 24 * 60 * 60))
+LEADER_LOCK_PATH = os.environ.get('LEADER_LOCK_PATH', 'db_file/leader.lock')
+LEADER_CHECK_INTERVAL = float(os.environ.get('LEADER_CHECK_INTERVAL', 30))
+YC_TOKEN_EXPIRY_MARGIN = float(os.environ.get('YC_TOKEN_EXPIRY_MARGIN', 60))
+YC_TOKEN_REFRESH_AHEAD = float(os.environ.get(
+    'YC_TOKEN_REFRESH_AHEAD', 60 * 60
+))
+
+RATE_LIMITS = os.environ.get('RATE_LIMITS', 'complaint_create=10/60')
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000))
+
+IDEMPOTENCY_TTL = float(os.environ.get('IDEMPOTENCY_TTL', 24 * 60 * 60))
+IDEMPOTENCY_LOCK_TTL = float(os.environ.get('IDEMPOTENCY_LOCK_TTL', 60))
+
+WEBHOOK_SUBSCRIBERS = os.environ.get('WEBHOOK_SUBSCRIBERS', '')
+WEBHOOK_CONCURRENCY = os.environ.get('WEBHOOK_CONCURRENCY', '')
+WEBHOOK_EVENTS = os.environ.get(
+    'WEBHOOK_EVENTS', 'complaint.created,complaint.enriched'
+)
+WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE', 100))
+WEBHOOK_BATCH_WINDOW = float(os.environ.get('WEBHOOK_BATCH_WINDOW', 2))
+WEBHOOK_TIMEOUT = float(os.environ.get('WEBHOOK_TIMEOUT', 10))
+WEBHOOK_RETRY_DELAY = float(os.environ.get('WEBHOOK_RETRY_DELAY', 5))
+WEBHOOK_MAX_RETRY_DELAY = float(os.environ.get(
+    'WEBHOOK_MAX_RETRY_DELAY', 10 * 60
+))
+
+TRENDS_WINDOW = float(os.environ.get('TRENDS_WINDOW', 5 * 60))
+TRENDS_BUCKET = float(os.environ.get('TRENDS_BUCKET', 10))
+TRENDS_BASELINE_HALF_LIFE = float(os.environ.get(
+    'TRENDS_BASELINE_HALF_LIFE', 60 * 60
+))
+TRENDS_SPIKE_FACTOR = float(os.environ.get('TRENDS_SPIKE_FACTOR', 3))
+TRENDS_MIN_COUNT = int(os.environ.get('TRENDS_MIN_COUNT', 10))
+TRENDS_MAX_KEYS = int(os.environ.get('TRENDS_MAX_KEYS', 1000))
+
+CREATE_MAX_INFLIGHT = int(os.environ.get('CREATE_MAX_INFLIGHT', 100))
+CREATE_MAX_QUEUE_WAIT = float(os.environ.get('CREATE_MAX_QUEUE_WAIT', 2))
+ENRICHMENT_MAX_INFLIGHT = int(os.environ.get('ENRICHMENT_MAX_INFLIGHT', 20))
+ENRICHMENT_MAX_QUEUE_WAIT = float(os.environ.get(
+    'ENRICHMENT_MAX_QUEUE_WAIT', 30
+))
+ENRICHMENT_LANE_WEIGHTS = os.environ.get(
+    'ENRICHMENT_LANE_WEIGHTS', 'new=6,edited=3,backfill=1'
+)
+ENRICHMENT_PROMOTE_AFTER = float(os.environ.get(
+    'ENRICHMENT_PROMOTE_AFTER', 60
+))
+
+MIGRATE_ON_STARTUP = os.environ.get(
+    'MIGRATE_ON_STARTUP', 'true'
+).lower() == 'true'
+MIGRATIONS_LOCK_PATH = os.environ.get(
+    'MIGRATIONS_LOCK_PATH', 'db_file/migrations.lock'
+)
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 90))
+ARCHIVE_INTERVAL = float(os.environ.get('ARCHIVE_INTERVAL', 60 * 60))
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+ARCHIVE_BATCH_PAUSE = float(os.environ.get('ARCHIVE_BATCH_PAUSE', 0.1))
+ARCHIVE_MAX_BATCHES = int(os.environ.get('ARCHIVE_MAX_BATCHES', 20))
+
+REENRICH_RATE = float(os.environ.get('REENRICH_RATE', 5))
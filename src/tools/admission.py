@@ -0,0 +1,361 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from settings import (CREATE_MAX_INFLIGHT,
+                      CREATE_MAX_QUEUE_WAIT,
+                      ENRICHMENT_LANE_WEIGHTS,
+                      ENRICHMENT_MAX_INFLIGHT,
+                      ENRICHMENT_MAX_QUEUE_WAIT,
+                      ENRICHMENT_PROMOTE_AFTER)
+
+from tools.metrics import (ADMISSION_INFLIGHT,
+                           ADMISSION_LANE_QUEUE_LENGTH,
+                           ADMISSION_LANE_QUEUE_WAIT,
+                           ADMISSION_PROMOTIONS,
+                           ADMISSION_QUEUE_LENGTH,
+                           ADMISSION_QUEUE_WAIT,
+                           ADMISSION_REJECTIONS)
+
+logger = logging.getLogger("app.admission")
+
+_SERVICE_TIME_WEIGHT = 0.2
+
+
+class Overloaded(Exception):
+    """Запрос отклонён контролем нагрузки.
+
+    Attributes:
+        retry_after (int): через сколько секунд стоит повторить запрос.
+    """
+    def __init__(self, retry_after: float):
+        super().__init__(f"Overloaded, retry after {retry_after:.1f} s")
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class AdmissionController:
+    """Ограничивает число одновременно выполняемых операций этапа.
+
+    Операции сверх max_inflight ждут в очереди FIFO. Решение о приёме
+    принимается по времени ожидания, а не по длине очереди: ожидаемое
+    время оценивается по длине очереди и скользящему среднему времени
+    выполнения операции, и если оно больше max_queue_wait, операция
+    отклоняется сразу. Принятая операция, не дождавшаяся своей очереди
+    за max_queue_wait, тоже отклоняется.
+
+    Attributes:
+        name (str): название этапа для метрик.
+        max_inflight (int): наибольшее число одновременных операций.
+        max_queue_wait (float): допустимое время ожидания в очереди, с.
+        inflight (int): число выполняемых операций.
+    """
+    def __init__(self, name: str, max_inflight: int, max_queue_wait: float):
+        self.name = name
+        self.max_inflight = max_inflight
+        self.max_queue_wait = max_queue_wait
+        self.inflight = 0
+        self.avg_service_time = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def queue_length(self) -> int:
+        return len(self._waiters)
+
+    def _push(self, future: asyncio.Future, lane: Optional[str]) -> None:
+        self._waiters.append(future)
+
+    def _pop(self) -> Optional[asyncio.Future]:
+        return self._waiters.popleft() if self._waiters else None
+
+    def _discard(self, future: asyncio.Future) -> None:
+        if future in self._waiters:
+            self._waiters.remove(future)
+
+    def estimated_wait(self) -> float:
+        """Оценивает время ожидания новой операции в очереди.
+
+        Returns:
+            float. Секунды, 0 — если есть свободное место.
+        """
+        if self.inflight < self.max_inflight and not self.queue_length():
+            return 0.0
+        return ((self.queue_length() + 1) * self.avg_service_time
+                / self.max_inflight)
+
+    def check(self) -> None:
+        """Проверяет, что ожидаемое время ожидания не превышает
+        допустимое, не занимая места.
+
+        Raises:
+            Overloaded: если очередь слишком длинная.
+        """
+        estimated = self.estimated_wait()
+        if estimated > self.max_queue_wait:
+            ADMISSION_REJECTIONS.inc(self.name, "estimated_wait")
+            raise Overloaded(estimated)
+
+    def _update_gauges(self) -> None:
+        ADMISSION_INFLIGHT.set(self.inflight, self.name)
+        ADMISSION_QUEUE_LENGTH.set(self.queue_length(), self.name)
+
+    async def acquire(self, wait: bool = False,
+                      lane: Optional[str] = None) -> None:
+        """Занимает место для операции.
+
+        Args:
+            wait (bool, optional, default=False): ждать своей очереди
+            без ограничения времени и без отклонения.
+            lane (str, optional): очередь операции, используется
+            PriorityAdmissionController.
+
+        Raises:
+            Overloaded: если операция отклонена.
+        """
+        if self.inflight < self.max_inflight and not self.queue_length():
+            self.inflight += 1
+            self._observe_wait(0.0, lane)
+            self._update_gauges()
+            return None
+        if not wait:
+            self.check()
+        future = asyncio.get_running_loop().create_future()
+        self._push(future, lane)
+        self._update_gauges()
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(
+                future, timeout=None if wait else self.max_queue_wait
+            )
+        except asyncio.TimeoutError:
+            ADMISSION_REJECTIONS.inc(self.name, "timeout")
+            raise Overloaded(self.estimated_wait())
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            self._discard(future)
+            self._update_gauges()
+        self._observe_wait(time.monotonic() - started, lane)
+
+    def _observe_wait(self, seconds: float, lane: Optional[str]) -> None:
+        ADMISSION_QUEUE_WAIT.observe(seconds, self.name)
+
+    def release(self, service_time: Optional[float] = None) -> None:
+        """Освобождает место, передавая его первой ожидающей операции.
+
+        Args:
+            service_time (float, optional): длительность завершённой
+            операции для оценки времени ожидания.
+        """
+        if service_time is not None:
+            self.avg_service_time += _SERVICE_TIME_WEIGHT * (
+                service_time - self.avg_service_time
+            )
+        while True:
+            future = self._pop()
+            if future is None:
+                break
+            if not future.done():
+                future.set_result(None)
+                self._update_gauges()
+                return None
+        self.inflight -= 1
+        self._update_gauges()
+
+    @asynccontextmanager
+    async def slot(self, wait: bool = False,
+                   lane: Optional[str] = None) -> AsyncIterator[None]:
+        """Выполняет операцию в занятом месте и учитывает её
+        длительность в оценке времени ожидания.
+
+        Args:
+            wait (bool, optional, default=False): см. acquire().
+            lane (str, optional): см. acquire().
+
+        Raises:
+            Overloaded: если операция отклонена.
+        """
+        await self.acquire(wait=wait, lane=lane)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+
+class PriorityAdmissionController(AdmissionController):
+    """Контроль нагрузки с несколькими очередями (lanes) разного
+    приоритета.
+
+    Освободившееся место получает очередь, выбранная взвешенным
+    циклическим алгоритмом (smooth weighted round-robin) среди
+    непустых очередей: при весах new=6, edited=3, backfill=1 из десяти
+    мест шесть получают новые операции, три — изменённые и одно —
+    фоновые. Чтобы очереди с малым весом не голодали, операция,
+    ожидающая дольше promote_after секунд, получает место вне очереди
+    весов (первой — самая старая).
+
+    Attributes:
+        weights (Dict[str, float]): веса очередей.
+        promote_after (float): время ожидания, после которого операция
+            получает место вне очереди весов, с.
+        default_lane (str): очередь для операций без явно указанной или
+            с неизвестной очередью.
+    """
+    def __init__(self, name: str, max_inflight: int, max_queue_wait: float,
+                 weights: Dict[str, float], promote_after: float,
+                 default_lane: Optional[str] = None):
+        super().__init__(name, max_inflight, max_queue_wait)
+        self.weights = weights
+        self.promote_after = promote_after
+        self.default_lane = default_lane or next(iter(weights))
+        self._lanes: Dict[str, Deque[Tuple[float, asyncio.Future]]] = {
+            lane: deque() for lane in weights
+        }
+        self._credits: Dict[str, float] = {lane: 0.0 for lane in weights}
+
+    def _lane(self, lane: Optional[str]) -> str:
+        return lane if lane in self._lanes else self.default_lane
+
+    def queue_length(self, lane: Optional[str] = None) -> int:
+        if lane is not None:
+            return len(self._lanes[self._lane(lane)])
+        return sum(len(queue) for queue in self._lanes.values())
+
+    def _push(self, future: asyncio.Future, lane: Optional[str]) -> None:
+        self._lanes[self._lane(lane)].append((time.monotonic(), future))
+
+    def _pop(self) -> Optional[asyncio.Future]:
+        active = [lane for lane, queue in self._lanes.items() if queue]
+        if not active:
+            return None
+        oldest = min(active, key=lambda lane: self._lanes[lane][0][0])
+        if time.monotonic() - self._lanes[oldest][0][0] >= self.promote_after:
+            ADMISSION_PROMOTIONS.inc(self.name, oldest)
+            return self._lanes[oldest].popleft()[1]
+        total = 0.0
+        for lane in self._lanes:
+            if lane in active:
+                self._credits[lane] += self.weights[lane]
+                total += self.weights[lane]
+            else:
+                self._credits[lane] = 0.0
+        chosen = max(active, key=self._credits.__getitem__)
+        self._credits[chosen] -= total
+        return self._lanes[chosen].popleft()[1]
+
+    def _discard(self, future: asyncio.Future) -> None:
+        for queue in self._lanes.values():
+            for item in queue:
+                if item[1] is future:
+                    queue.remove(item)
+                    return None
+
+    def estimated_wait(self, lane: Optional[str] = None) -> float:
+        """Оценивает время ожидания новой операции в очереди lane
+        с учётом доли мест, которую очередь получает по весам.
+
+        Args:
+            lane (str, optional): очередь, по умолчанию default_lane.
+
+        Returns:
+            float. Секунды, 0 — если есть свободное место.
+        """
+        lane = self._lane(lane)
+        if self.inflight < self.max_inflight and not self.queue_length():
+            return 0.0
+        total = sum(weight for name, weight in self.weights.items()
+                    if name == lane or self._lanes[name])
+        share = self.weights[lane] / total
+        return ((self.queue_length(lane) + 1) * self.avg_service_time
+                / (self.max_inflight * share))
+
+    def _update_gauges(self) -> None:
+        super()._update_gauges()
+        for lane, queue in self._lanes.items():
+            ADMISSION_LANE_QUEUE_LENGTH.set(len(queue), self.name, lane)
+
+    def _observe_wait(self, seconds: float, lane: Optional[str]) -> None:
+        super()._observe_wait(seconds, lane)
+        ADMISSION_LANE_QUEUE_WAIT.observe(seconds, self.name,
+                                          self._lane(lane))
+
+
+def parse_weights(weights: str) -> Dict[str, float]:
+    """Разбирает веса очередей из строки вида "new=6,edited=3,backfill=1".
+
+    Args:
+        weights (str): строка с весами.
+
+    Raises:
+        ValueError: если вес не положительное число или очередей нет.
+
+    Returns:
+        Dict[str, float]. Вес каждой очереди в порядке перечисления.
+    """
+    result = {}
+    for item in weights.split(","):
+        if "=" not in item:
+            continue
+        name, weight = item.split("=", 1)
+        value = float(weight)
+        if not math.isfinite(value) or value <= 0:
+            raise ValueError(f"Lane {name.strip()} weight must be "
+                             f"a positive number, got {weight.strip()}")
+        result[name.strip()] = value
+    if not result:
+        raise ValueError(f"No lane weights in {weights!r}")
+    return result
+
+
+create_admission = AdmissionController(
+    "complaint_create", CREATE_MAX_INFLIGHT, CREATE_MAX_QUEUE_WAIT
+)
+enrichment_admission = PriorityAdmissionController(
+    "enrichment", ENRICHMENT_MAX_INFLIGHT, ENRICHMENT_MAX_QUEUE_WAIT,
+    weights=parse_weights(ENRICHMENT_LANE_WEIGHTS),
+    promote_after=ENRICHMENT_PROMOTE_AFTER,
+    default_lane="new"
+)
+
+
+def admit(controller: AdmissionController,
+          *backlogs: AdmissionController) -> Callable:
+    """Создаёт зависимость FastAPI, выполняющую обработчик в месте
+    controller и отклоняющую запрос с 503 и Retry-After при перегрузке.
+
+    Args:
+        controller (AdmissionController): ограничение маршрута.
+        backlogs (AdmissionController): этапы, которые запрос нагрузит
+        позже (например, фоновая обработка): при слишком длинной их
+        очереди запрос отклоняется сразу.
+
+    Returns:
+        Callable. Зависимость для Depends().
+    """
+    async def dependency() -> AsyncIterator[None]:
+        try:
+            for backlog in backlogs:
+                backlog.check()
+            await controller.acquire()
+        except Overloaded as e:
+            logger.warning(f"Request rejected by {controller.name} "
+                           f"admission control: {e}")
+            raise HTTPException(
+                status_code=503,
+                detail="Сервис перегружен, повторите позже",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            controller.release(time.monotonic() - started)
+
+    return dependency
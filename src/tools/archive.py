@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from database import async_session_maker
+
+from models.models import ComplaintArchiveDB, ComplaintDB
+from models.schemas import ComplaintStatus
+
+from settings import (ARCHIVE_AFTER_DAYS,
+                      ARCHIVE_BATCH_PAUSE,
+                      ARCHIVE_BATCH_SIZE,
+                      ARCHIVE_INTERVAL,
+                      ARCHIVE_MAX_BATCHES)
+
+from sqlalchemy import delete, insert, select
+
+from tools.metrics import ARCHIVED_COMPLAINTS
+
+logger = logging.getLogger("app.archive")
+
+ARCHIVED_FIELDS = tuple(column.name for column in ComplaintDB.__table__.c)
+
+
+class Archiver:
+    """Переносит закрытые жалобы старше after_days дней из рабочей
+    таблицы complaints в complaints_archive.
+
+    Жалобы переносятся пачками по batch_size: копирование в архив
+    и удаление из рабочей таблицы выполняются в одной транзакции,
+    поэтому прерванный перенос не оставляет дублей и продолжается
+    следующим запуском с того места, где остановился. Пачки выбираются
+    по возрастанию ID (по первичному ключу), между пачками делается
+    пауза pause, чтобы не занимать базу данных надолго. Условия переноса
+    повторяются при копировании и удалении: жалоба, открытая повторно
+    после выбора пачки, остаётся в рабочей таблице. Жалобы с ID, уже
+    занятым в архиве (выданным повторно до перехода complaints
+    на AUTOINCREMENT), пропускаются.
+
+    Attributes:
+        after_days (int): возраст жалобы в днях для переноса,
+            0 — перенос отключён.
+        batch_size (int): размер пачки.
+        pause (float): пауза между пачками, с.
+        interval (float): период полного прохода по таблице, с.
+    """
+    def __init__(self,
+                 after_days: int = ARCHIVE_AFTER_DAYS,
+                 batch_size: int = ARCHIVE_BATCH_SIZE,
+                 pause: float = ARCHIVE_BATCH_PAUSE,
+                 interval: float = ARCHIVE_INTERVAL):
+        self.after_days = after_days
+        self.batch_size = batch_size
+        self.pause = pause
+        self.interval = interval
+        self._last_id = 0
+        self._next_pass = 0.0
+
+    def cutoff(self) -> datetime:
+        return datetime.now(timezone.utc) - timedelta(days=self.after_days)
+
+    async def archive_batch(self, cutoff: datetime,
+                            after_id: int = 0) -> Tuple[int, Optional[int]]:
+        """Переносит в архив одну пачку жалоб.
+
+        Args:
+            cutoff (datetime): переносятся жалобы, созданные раньше.
+            after_id (int, optional, default=0): переносятся жалобы
+            с ID больше указанного.
+
+        Returns:
+            Tuple[int, Optional[int]]. Количество перенесённых жалоб
+            и наибольший ID в пачке (None, если переносить нечего).
+        """
+        archivable = (
+            ComplaintDB.status == ComplaintStatus.CLOSED,
+            ComplaintDB.timestamp < cutoff,
+            ComplaintDB.id.not_in(select(ComplaintArchiveDB.id)),
+        )
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(ComplaintDB.id).where(
+                    ComplaintDB.id > after_id, *archivable
+                ).order_by(ComplaintDB.id).limit(self.batch_size)
+            )
+            ids = result.scalars().all()
+            if not ids:
+                return 0, None
+            await session.execute(
+                insert(ComplaintArchiveDB).from_select(
+                    ARCHIVED_FIELDS,
+                    select(*(getattr(ComplaintDB, field)
+                             for field in ARCHIVED_FIELDS))
+                    .where(ComplaintDB.id.in_(ids), *archivable)
+                )
+            )
+            deleted = await session.execute(
+                delete(ComplaintDB).where(ComplaintDB.id.in_(ids),
+                                          ComplaintDB.status ==
+                                          ComplaintStatus.CLOSED,
+                                          ComplaintDB.timestamp < cutoff)
+            )
+            await session.commit()
+        ARCHIVED_COMPLAINTS.inc(amount=deleted.rowcount)
+        return deleted.rowcount, ids[-1]
+
+    async def run(self, max_batches: Optional[int] = None,
+                  after_id: Optional[int] = None) -> int:
+        """Переносит жалобы в архив, продолжая текущий проход по таблице.
+
+        Args:
+            max_batches (int, optional): наибольшее число пачек за вызов,
+            None — до конца таблицы.
+            after_id (int, optional): начать проход с ID больше
+            указанного вместо сохранённого.
+
+        Returns:
+            int. Количество перенесённых жалоб.
+        """
+        if after_id is not None:
+            self._last_id = after_id
+        cutoff = self.cutoff()
+        moved = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            count, last_id = await self.archive_batch(cutoff, self._last_id)
+            if last_id is None:
+                logger.info(f"Archive pass finished, moved {moved} "
+                            f"complaints in this run")
+                self._last_id = 0
+                self._next_pass = time.monotonic() + self.interval
+                break
+            moved += count
+            batches += 1
+            self._last_id = last_id
+            logger.debug(f"Archived {count} complaints up to id {last_id}")
+            await asyncio.sleep(self.pause)
+        return moved
+
+    async def job(self) -> None:
+        """Задача ведущего процесса: выполняет до ARCHIVE_MAX_BATCHES
+        пачек, если подошло время очередного прохода."""
+        if self.after_days <= 0 or time.monotonic() < self._next_pass:
+            return None
+        await self.run(max_batches=ARCHIVE_MAX_BATCHES)
+
+
+archiver = Archiver()
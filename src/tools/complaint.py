@@ -1,18 +1,130 @@
 import asyncio
 import logging
+import time
+from contextlib import contextmanager
+from typing import (Awaitable, Dict, Iterable, Iterator, List, NamedTuple,
+                    Optional, Set)
 
 from database import async_session_maker
 
-from models.models import ComplaintDB
+from fastapi import BackgroundTasks
 
-from settings import AI_COMPLAINT_CATEGORY_PROMT, AI_COMPLAINT_SENTIMENT_PROMT
+from models.models import ComplaintDB, ip_hash, text_hash
+from models.schemas import ComplaintCategory, ComplaintSentiment
+
+from settings import (AI_COMPLAINT_CATEGORY_PROMT,
+                      AI_COMPLAINT_LABELS_PROMT,
+                      AI_COMPLAINT_SENTIMENT_PROMT,
+                      CLASSIFIER_MODE)
 
 from sqlalchemy import select, update
 
+from tools import events
+from tools.admission import enrichment_admission
 from tools.dadata import get_geo_by_ip
-from tools.yandex_cloud import YandexCloudClassifier
+from tools.local_model import LocalPrediction, local_labeler
+from tools.metrics import (BACKGROUND_TASKS_PENDING,
+                           BACKGROUND_TASK_DURATION,
+                           ENRICHMENT_LATENCY,
+                           ENRICHMENT_STAGES_SKIPPED)
+from tools.serialization import RESPONSE_COLUMNS, rows_to_dicts
+from tools.tracing import span
+from tools.trends import trend_detector
+from tools.yandex_cloud import (YandexCloudClassifier,
+                                YandexCloudMultiLabelClassifier)
+
+logger = logging.getLogger("app.complaint")
+
+# Этапы обработки жалобы: поля, от которых зависит результат этапа,
+# и поле с хэшем входных данных, по которым результат получен.
+STAGES = {
+    "sentiment_and_category": (("text",), "labels_hash"),
+    "geolocation": (("ip_address",), "geo_hash"),
+}
+
+# Метки, которые определяет этап "sentiment_and_category"
+LABEL_FIELDS = ("sentiment", "category")
+
+
+def stage_input_hash(stage: str, complaint: ComplaintDB) -> Optional[str]:
+    """Хэш входных данных этапа обработки жалобы.
+
+    Args:
+        stage (str): этап из STAGES.
+        complaint (ComplaintDB): жалоба.
+
+    Returns:
+        str | None.
+    """
+    if stage == "geolocation":
+        return ip_hash(complaint.ip_address)
+    return complaint.text_hash or text_hash(complaint.text)
+
+
+def dirty_stages(complaint: ComplaintDB,
+                 changed: Iterable[str]) -> List[str]:
+    """Определяет этапы обработки, которые нужно выполнить заново после
+    изменения полей жалобы. Этап выполняется, если изменилось поле,
+    от которого он зависит, и хэш его входных данных отличается от
+    хэша, с которым сохранён результат. Пропущенные этапы учитываются
+    в метрике ENRICHMENT_STAGES_SKIPPED.
+
+    Args:
+        complaint (ComplaintDB): жалоба после изменения.
+        changed (Iterable[str]): изменённые поля.
+
+    Returns:
+        List[str]. Этапы для post_create().
+    """
+    changed = set(changed)
+    stages = []
+    for stage, (inputs, stamp) in STAGES.items():
+        if changed.isdisjoint(inputs):
+            ENRICHMENT_STAGES_SKIPPED.inc(stage, "not_affected")
+        elif getattr(complaint, stamp) == stage_input_hash(stage, complaint):
+            ENRICHMENT_STAGES_SKIPPED.inc(stage, "unchanged")
+        else:
+            stages.append(stage)
+    return stages
+
+
+def complaint_labels_classifier(
+        text: str
+) -> YandexCloudMultiLabelClassifier:
+    """Классификатор, определяющий спам, тональность и категорию жалобы
+    одним запросом (CLASSIFIER_MODE=combined). Метки, полученные при
+    создании жалобы, передаются в фоновую обработку как ClassifiedLabels,
+    поэтому повторного запроса к Yandex Cloud нет.
+
+    Args:
+        text (str): текст жалобы.
+
+    Returns:
+        YandexCloudMultiLabelClassifier.
+    """
+    return YandexCloudMultiLabelClassifier(
+        input_text=text,
+        task_description=AI_COMPLAINT_LABELS_PROMT,
+        labels={
+            "spam": ["спам", "не спам"],
+            "sentiment": [sentiment.value for sentiment in ComplaintSentiment
+                          if sentiment != ComplaintSentiment.UNKNOWN],
+            "category": [category.value for category in ComplaintCategory],
+        },
+        default_value={
+            "spam": "не спам",
+            "sentiment": ComplaintSentiment.UNKNOWN.value,
+            "category": ComplaintCategory.OTHER.value,
+        },
+        action="classify_complaint",
+    )
+
 
-logger = logging.getLogger("app")
+class ClassifiedLabels(NamedTuple):
+    """Метки жалобы, полученные complaint_labels_classifier() при её
+    создании, и метки, для которых возвращено значение по умолчанию."""
+    values: Dict[str, str]
+    fallback_labels: List[str]
 
 
 class ComplaintService:
@@ -20,20 +132,117 @@ class ComplaintService:
 
     Attributes:
         complaint (ComplaintDB): жалоба.
+        labels_model (str | None): кем определены тональность и
+        категория при последнем classify(): "remote", "local" или
+        "fallback" — Yandex Cloud вернул значение по умолчанию хотя бы
+        для одной метки.
+        fallback_labels (Set[str]): метки, для которых при последнем
+        classify() классификатор вернул значение по умолчанию.
+        labels (Dict[str, str]): тональность и категория, записанные
+        update_sentiment_and_category(), кроме значений по умолчанию.
+        location (Dict[str, str] | None): страна и город, записанные
+        update_geolocation().
+        classified (ClassifiedLabels | None): метки, уже полученные
+        при создании жалобы: classify() берёт тональность и категорию
+        из них без запроса к Yandex Cloud.
     """
     complaint: ComplaintDB = None
 
-    def __init__(self, complaint: ComplaintDB):
+    def __init__(self, complaint: ComplaintDB,
+                 classified: Optional[ClassifiedLabels] = None):
         self.complaint = complaint
+        self.classified = classified
+        self.labels_model: Optional[str] = None
+        self.fallback_labels: Set[str] = set()
+        self.labels: Dict[str, str] = {}
+        self.location: Optional[Dict[str, str]] = None
 
     async def update_sentiment_and_category(self) -> None:
         """Взаимодействуя с YandexCloudClassifier определяет
         тональность и категорию жалобы, после чего редактирует
-        запись в базе данных.
+        запись в базе данных. При CLASSIFIER_MODE=combined обе метки
+        определяются одним запросом complaint_labels_classifier().
+
+        Результат записывается с хэшем текста, по которому получен, и
+        только если текст жалобы с тех пор не изменился: результат
+        для устаревшего текста отбрасывается.
 
         Returns:
             None.
         """
+        input_hash = stage_input_hash("sentiment_and_category",
+                                      self.complaint)
+        result = await self.classify()
+        values = {"sentiment": result[0], "category": result[1],
+                  "labels_model": self.labels_model}
+        if not any(isinstance(value, Exception) for value in result):
+            values["labels_hash"] = input_hash
+        with span("db.update_sentiment_and_category"):
+            async with async_session_maker() as db_session:
+                query = update(ComplaintDB).where(
+                    ComplaintDB.id == self.complaint.id,
+                    ComplaintDB.text_hash == input_hash
+                ).values(**values)
+                updated = await db_session.execute(query)
+                await db_session.commit()
+        if not updated.rowcount:
+            ENRICHMENT_STAGES_SKIPPED.inc("sentiment_and_category", "stale")
+            return None
+        self.labels = {field: values[field]
+                       for field in LABEL_FIELDS
+                       if not isinstance(values[field], Exception)
+                       and field not in self.fallback_labels}
+
+    async def classify(
+            self, prediction: Optional[LocalPrediction] = None
+    ) -> list:
+        """Определяет тональность и категорию жалобы, не изменяя
+        запись в базе данных. Запрос к Yandex Cloud не выполняется,
+        если метки уже получены при создании жалобы (classified) или
+        локальная модель в них уверена (см. LocalLabeler). Источник
+        меток сохраняется в labels_model, тональность и категория со
+        значением по умолчанию — в fallback_labels; такие ответы
+        не сравниваются с локальной моделью.
+
+        Args:
+            prediction (LocalPrediction, optional): предсказание
+            локальной модели, если уже получено для пачки жалоб.
+
+        Returns:
+            list. Тональность и категория; при ошибке классификатора
+            на месте значения — исключение.
+        """
+        self.fallback_labels = set()
+        if self.classified is not None:
+            result = self._combined_result(*self.classified)
+        else:
+            if prediction is None:
+                prediction = local_labeler.predict([self.complaint.text])[0]
+            decision = local_labeler.decide(prediction)
+            if decision == "local":
+                self.labels_model = "local"
+                return [prediction.sentiment, prediction.category]
+            if CLASSIFIER_MODE == "combined":
+                classifier = complaint_labels_classifier(self.complaint.text)
+                labels = await classifier.y_cloud_classify_text()
+                result = self._combined_result(labels,
+                                               classifier.fallback_labels)
+            else:
+                result = await self._classify_separately()
+            if prediction is not None and not self.fallback_labels:
+                local_labeler.compare(prediction, decision, result)
+        self.labels_model = "fallback" if self.fallback_labels else "remote"
+        return result
+
+    def _combined_result(self, labels: Dict[str, str],
+                         fallback_labels: Iterable[str]) -> list:
+        """Тональность и категория из ответа
+        complaint_labels_classifier(). Значение по умолчанию для спама
+        не делает их значениями по умолчанию."""
+        self.fallback_labels = set(fallback_labels) & set(LABEL_FIELDS)
+        return [labels[field] for field in LABEL_FIELDS]
+
+    async def _classify_separately(self) -> list:
         ycc_sentiment = YandexCloudClassifier(
             input_text=self.complaint.text,
             task_description=AI_COMPLAINT_SENTIMENT_PROMT,
@@ -53,72 +262,208 @@ class ComplaintService:
             asyncio.create_task(ycc_category.y_cloud_classify_text()),
         ]
         result = await asyncio.gather(*tasks, return_exceptions=True)
+        self.fallback_labels = {
+            field for field, classifier in (("sentiment", ycc_sentiment),
+                                            ("category", ycc_category))
+            if classifier.fell_back
+        }
+        return result
+
+    async def update_geolocation(self) -> None:
+        """
+        Обработка IP адреса запроса жалобы после её сохранения в базу данных.
+        Определяет местоположение через locate() и записывает его
+        в базу данных.
+
+        Returns:
+            None.
+        """
+        result = await self.locate()
+        if result is None:
+            return None
         async with async_session_maker() as db_session:
             query = update(ComplaintDB).where(
                 ComplaintDB.id == self.complaint.id
-            ).values(sentiment=result[0],
-                     category=result[1])
+            ).values(geo_country=result["country"],
+                     geo_city=result["city"],
+                     geo_hash=stage_input_hash("geolocation",
+                                               self.complaint))
             await db_session.execute(query)
             await db_session.commit()
+        self.location = result
 
-    async def update_geolocation(self) -> None:
+    async def locate(self) -> Optional[Dict[str, str]]:
         """
-        Обработка IP адреса запроса жалобы после её сохранения в базу данных.
-        Функция проверяет наличие такого IP адреса в базе данных и в случае
-        отсутствия делает запрос на получение данных
+        Определяет местоположение по IP адресу жалобы, не изменяя
+        запись в базе данных. Функция проверяет наличие такого IP адреса
+        с определённым местоположением в базе данных (по индексу
+        на упакованном адресе) и в случае отсутствия делает запрос
+        на получение данных
 
         Returns:
-            None.
+            Dict[str, str] | None. Страна и город или None, если адреса
+            нет или он некорректен.
         """
         if not self.complaint.ip_address:
             logger.error("No IP address to locate")
             return None
         async with async_session_maker() as db_session:
-            query = select(ComplaintDB).where(
+            query = select(
+                ComplaintDB.geo_country, ComplaintDB.geo_city
+            ).where(
+                ComplaintDB.ip_version == self.complaint.ip_version,
                 ComplaintDB.ip_address == self.complaint.ip_address,
                 ComplaintDB.geo_country.is_not(None),
+                ComplaintDB.geo_country != "UNKNOWN",
                 ComplaintDB.geo_city.is_not(None)
-            )
+            ).limit(1)
             result = await db_session.execute(query)
-            q_complaint = result.scalar_one_or_none()
-            if q_complaint:
-                query = update(ComplaintDB).where(
-                    ComplaintDB.id == self.complaint.id
-                ).values(geo_country=q_complaint.geo_country,
-                         geo_city=q_complaint.geo_city)
-                await db_session.execute(query)
-                await db_session.commit()
-                return None
+            located = result.one_or_none()
+            if located:
+                return {"country": located.geo_country,
+                        "city": located.geo_city}
         try:
-            result = await get_geo_by_ip(self.complaint.ip_address)
-            async with async_session_maker() as db_session:
-                query = update(ComplaintDB).where(
-                    ComplaintDB.id == self.complaint.id
-                ).values(geo_country=result["country"],
-                         geo_city=result["city"])
-                await db_session.execute(query)
-                await db_session.commit()
-                return None
+            with span("dadata.geo_by_ip") as attributes:
+                result = await get_geo_by_ip(self.complaint.ip_address)
+                attributes.update(result)
+            return result
         except ValueError:
             logger.error(f"IP address {self.complaint.ip_address} "
                          f"is incorrect")
         except Exception as e:
             logger.error(f"Failed to locate IP Address "
                          f"{self.complaint.ip_address}: {e}")
+        return None
 
 
-async def post_create(complaint: ComplaintDB):
-    """Обработка жалобы после её сохранения в базу данных.
+async def post_create(complaint: ComplaintDB,
+                      stages: Optional[Iterable[str]] = None,
+                      classified: Optional[ClassifiedLabels] = None):
+    """Обработка жалобы после её сохранения в базу данных. После
+    полной обработки новой жалобы её категория, тональность и город
+    учитываются в trend_detector, кроме значений по умолчанию.
 
     Args:
         complaint (ComplaintDB): экземпляр жалобы для анализа
+        stages (Iterable[str], optional): этапы из STAGES, по умолчанию —
+        все.
+        classified (ClassifiedLabels, optional): метки, полученные при
+        создании жалобы.
+
+    Returns:
+        None.
+    """
+    cs = ComplaintService(complaint, classified)
+    runners = {
+        "sentiment_and_category": cs.update_sentiment_and_category,
+        "geolocation": cs.update_geolocation,
+    }
+    with _stage("post_create"):
+        tasks = [asyncio.create_task(_timed(stage, runners[stage]()))
+                 for stage in (STAGES if stages is None else stages)]
+        await asyncio.gather(*tasks, return_exceptions=True)
+    if stages is None:
+        trend_detector.observe(category=cs.labels.get("category"),
+                               sentiment=cs.labels.get("sentiment"),
+                               city=(cs.location or {}).get("city"))
+
+
+@contextmanager
+def _stage(task: str) -> Iterator[None]:
+    """Учитывает длительность этапа обработки в метриках и
+    трассировке.
+
+    Args:
+        task (str): название этапа.
+    """
+    started = time.perf_counter()
+    try:
+        with span(task):
+            yield
+    finally:
+        BACKGROUND_TASK_DURATION.observe(time.perf_counter() - started, task)
+
+
+async def _timed(task: str, aw: Awaitable) -> None:
+    """Выполняет этап обработки, учитывая его длительность.
+
+    Args:
+        task (str): название этапа.
+        aw (Awaitable): корутина этапа.
+
+    Returns:
+        None.
+    """
+    with _stage(task):
+        await aw
+
+
+async def emit_enriched(complaint_id: int,
+                        stages: Optional[List[str]] = None) -> None:
+    """Оповещает о завершении обработки жалобы событием
+    "complaint.enriched" с её текущими полями.
+
+    Args:
+        complaint_id (int): ID жалобы.
+        stages (List[str], optional): выполненные этапы из STAGES,
+        по умолчанию — все.
+
+    Returns:
+        None.
+    """
+    async with async_session_maker() as db_session:
+        result = await db_session.execute(
+            select(*RESPONSE_COLUMNS).where(ComplaintDB.id == complaint_id)
+        )
+        row = result.one_or_none()
+    if row is None:
+        return None
+    events.emit("complaint.enriched",
+                {**rows_to_dicts([row])[0],
+                 "stages": list(STAGES if stages is None else stages)})
+
+
+async def _run_scheduled_post_create(complaint: ComplaintDB, lane: str,
+                                     scheduled: float,
+                                     stages: Optional[List[str]],
+                                     classified: Optional[ClassifiedLabels]
+                                     ) -> None:
+    try:
+        async with enrichment_admission.slot(wait=True, lane=lane):
+            await post_create(complaint, stages, classified)
+    finally:
+        BACKGROUND_TASKS_PENDING.dec("post_create")
+        ENRICHMENT_LATENCY.observe(time.monotonic() - scheduled, lane)
+    if events.has_subscribers("complaint.enriched"):
+        await emit_enriched(complaint.id, stages)
+
+
+def schedule_post_create(background_tasks: BackgroundTasks,
+                         complaint: ComplaintDB,
+                         lane: str = "new",
+                         stages: Optional[List[str]] = None,
+                         classified: Optional[ClassifiedLabels] = None
+                         ) -> None:
+    """Ставит обработку жалобы в фоновые задачи FastAPI и учитывает
+    её в метрике очереди фоновых задач. Одновременно выполняется не
+    больше ENRICHMENT_MAX_INFLIGHT обработок, остальные ждут в очереди
+    lane; места между очередями распределяются по весам
+    ENRICHMENT_LANE_WEIGHTS. Длину очереди новых жалоб ограничивает
+    приём запросов на создание жалоб.
+
+    Args:
+        background_tasks (BackgroundTasks): фоновые задачи запроса.
+        complaint (ComplaintDB): экземпляр жалобы для анализа.
+        lane (str, optional, default="new"): очередь обработки: "new" —
+        новые жалобы, "edited" — жалобы с изменённым текстом,
+        "backfill" — повторная обработка ранее сохранённых жалоб.
+        stages (List[str], optional): этапы из STAGES, по умолчанию — все.
+        classified (ClassifiedLabels, optional): метки, полученные при
+        создании жалобы одним запросом (CLASSIFIER_MODE=combined).
 
     Returns:
         None.
     """
-    cs = ComplaintService(complaint)
-    tasks = [
-        asyncio.create_task(cs.update_sentiment_and_category()),
-        asyncio.create_task(cs.update_geolocation()),
-    ]
-    await asyncio.gather(*tasks, return_exceptions=True)
+    BACKGROUND_TASKS_PENDING.inc("post_create")
+    background_tasks.add_task(_run_scheduled_post_create, complaint, lane,
+                              time.monotonic(), stages, classified)
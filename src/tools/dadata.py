@@ -1,21 +1,35 @@
 import asyncio
 import logging
+import time
 from typing import Any, Dict
 from uuid import uuid4
 
 import aiohttp
 
 from settings import (DADATA_API_KEY,
+                      DADATA_IPLOCATE_URL,
+                      GEO_CACHE_TTL,
                       HTTP_CONNECTION_RETRIES,
                       HTTP_CONNECTION_RETRY_DELAY,
                       HTTP_CONNECTION_TIMEOUT)
 
-logger = logging.getLogger("app")
+from tools.http import get_session
+from tools.ip import IPAddress, parse_ip
+from tools.metrics import (UPSTREAM_CALLS,
+                           UPSTREAM_FALLBACKS,
+                           UPSTREAM_REQUEST_DURATION,
+                           UPSTREAM_RETRIES)
+from tools.shared_cache import shared_cache
+
+logger = logging.getLogger("app.dadata")
 
 
 async def get_geo_by_ip(ip: str) -> Dict[str, str]:
     """
-    Обрабатывает IP-адрес запроса на сервиса DaData.
+    Обрабатывает IP-адрес запроса на сервиса DaData. Успешные ответы
+    сохраняются в общем кэше воркеров на GEO_CACHE_TTL секунд с ключом
+    по упакованному адресу, поэтому разные записи одного адреса
+    (::ffff:10.0.0.1 и 10.0.0.1) используют одну запись кэша.
 
     Args:
         ip (str): IP адрес для обработки.
@@ -28,30 +42,19 @@ async def get_geo_by_ip(ip: str) -> Dict[str, str]:
         }
     """
 
-    def validate_ip() -> str:
+    def validate_ip() -> IPAddress:
         """
-        Валидирует IP адрес на соответствие всем стандартам.
+        Валидирует IP адрес (IPv4 или IPv6) через модуль ipaddress.
 
         Raises:
             ValueError: Если ip адрес None или не соответствует стандартам.
 
         Returns:
-            str. "localhost" в случае, если IP-адрес 127.0.0.1 или
-            "ok" в случае прохождения валидации
+            IPAddress. Разобранный адрес.
         """
         if ip is None:
             raise ValueError("IP cannot be None")
-        if ip == "127.0.0.1":
-            return "localhost"
-        if len(ip) > 15:
-            raise ValueError("IP should not exceed 15 characters")
-        split_ip = [int(digit) for digit in ip.split(".")]
-        if len(split_ip) != 4:
-            raise ValueError("IP should have 4 digits")
-        for digit in split_ip:
-            if digit < 0 or digit > 255:
-                raise ValueError("IP digit will be between 0 and 255")
-        return "ok"
+        return parse_ip(ip)
 
     def process_error_code(status_code: int) -> Dict[str, bool | str | Any]:
         """
@@ -91,131 +94,166 @@ async def get_geo_by_ip(ip: str) -> Dict[str, str]:
             need_retry = True
 
         logger.error(
-            msg="Request failed",
-            extra=log_params)
+            msg=f"Request failed: {log_params['message']}",
+            extra={"request_id": request_id,
+                   "action": "geo_by_ip",
+                   "status": status_code})
         return {
             "need_retry": need_retry,
             "last_error": log_params["message"],
         }
 
-    if validate_ip() == "localhost":
+    def observe(started: float, outcome: str) -> None:
+        """
+        Учитывает время одной попытки запроса в метриках.
+
+        Args:
+            started (float): время начала попытки (time.perf_counter()).
+            outcome (str): код ответа или тип ошибки.
+
+        Returns:
+            None
+        """
+        UPSTREAM_REQUEST_DURATION.observe(time.perf_counter() - started,
+                                          "dadata", "geo_by_ip", outcome)
+
+    def fallback() -> Dict[str, str]:
+        """
+        Учитывает возврат значений по умолчанию в метриках.
+
+        Returns:
+            {"country": "UNKNOWN", "city": "UNKNOWN"}
+        """
+        UPSTREAM_FALLBACKS.inc("dadata", "geo_by_ip")
+        return {
+            "country": "UNKNOWN",
+            "city": "UNKNOWN",
+        }
+
+    address = validate_ip()
+    if address.is_loopback:
         return {
             "country": "LOCALHOST",
             "city": "LOCALHOST"
         }
+    ip = str(address)
+    cache_key = address.packed.hex()
+    cached = shared_cache.get("geo", cache_key)
+    if cached is not None:
+        return cached
     request_id = str(uuid4())
     last_error: Exception | str | None = None
 
-    async with (aiohttp.ClientSession() as session):
-        for attempt in range(1, HTTP_CONNECTION_RETRIES + 1):
-            try:
-                logger.info(
-                    msg=f"Attempt {attempt}/"
-                        f"{HTTP_CONNECTION_RETRIES}",
+    session = get_session()
+    UPSTREAM_CALLS.inc("dadata", "geo_by_ip")
+    for attempt in range(1, HTTP_CONNECTION_RETRIES + 1):
+        if attempt > 1:
+            UPSTREAM_RETRIES.inc("dadata", "geo_by_ip")
+        started = time.perf_counter()
+        try:
+            logger.info(
+                msg=f"Attempt {attempt}/"
+                    f"{HTTP_CONNECTION_RETRIES}",
+                extra={"request_id": request_id,
+                       "action": "geo_by_ip"}
+            )
+            async with session.post(
+                    url=DADATA_IPLOCATE_URL,
+                    headers={
+                        "Authorization": f'Token {DADATA_API_KEY}',
+                        "Content-Type": "application/json",
+                        "Accept": "application/json",
+                    },
+                    json={
+                        "ip": ip,
+                        "language": "ru"
+                    },
+                    timeout=aiohttp.ClientTimeout(
+                        total=HTTP_CONNECTION_TIMEOUT
+                    )
+            ) as response:
+                data = await response.json()
+                observe(started, str(response.status))
+                logger.debug(
+                    msg="Request succeeded",
                     extra={"request_id": request_id,
-                           "action": "geo_by_ip"}
-                )
-                async with session.post(
-                        url="https://suggestions.dadata.ru/suggestions/"
-                            "api/4_1/rs/iplocate/address",
-                        headers={
-                            "Authorization": f'Token {DADATA_API_KEY}',
-                            "Content-Type": "application/json",
-                            "Accept": "application/json",
-                        },
-                        json={
-                            "ip": ip,
-                            "language": "ru"
-                        },
-                        timeout=aiohttp.ClientTimeout(
-                            total=HTTP_CONNECTION_TIMEOUT
-                        )
-                ) as response:
-                    data = await response.json()
+                           "action": "geo_by_ip",
+                           "status": response.status,
+                           "response_size": len(str(data))})
+
+                if (response.status == 200 and
+                        data.get("location") is not None and
+                        data.get("location").get("data") is not None):
                     logger.debug(
-                        msg="Request succeeded",
+                        msg="The location is defined",
                         extra={"request_id": request_id,
-                               "action": "geo_by_ip",
-                               "status": response.status,
-                               "response_size": len(str(data))})
-
-                    if (response.status == 200 and
-                            data.get("location") is not None and
-                            data.get("location").get("data") is not None):
-                        logger.debug(
-                            msg="The location is defined",
-                            extra={"request_id": request_id,
-                                   "action": "geo_by_ip"}
-                        )
-                        return {
-                            "country": data["location"]["data"]
-                            .get("country", "UNKNOWN"),
-                            "city": data["location"]["data"]
-                            .get("city", "UNKNOWN"),
-                        }
-
-                    err_processing = process_error_code(response.status)
-                    last_error = err_processing["last_error"]
-                    if err_processing["need_retry"]:
-                        if attempt < HTTP_CONNECTION_RETRIES:
-                            await asyncio.sleep(
-                                HTTP_CONNECTION_RETRY_DELAY *
-                                attempt
-                            )
-                        continue
-                    return {
-                        "country": "UNKNOWN",
-                        "city": "UNKNOWN",
+                               "action": "geo_by_ip"}
+                    )
+                    result = {
+                        "country": data["location"]["data"]
+                        .get("country", "UNKNOWN"),
+                        "city": data["location"]["data"]
+                        .get("city", "UNKNOWN"),
                     }
+                    shared_cache.set("geo", cache_key, result,
+                                     GEO_CACHE_TTL)
+                    return result
 
-            except aiohttp.ClientError as e:
-                last_error = e
-                logger.warning(
-                    msg=f"Request failed (attempt {attempt}): {str(e)}",
-                    extra={"request_id": request_id,
-                           "action": "geo_by_ip",
-                           "error_type": type(e).__name__}
-                )
-                if attempt < HTTP_CONNECTION_RETRIES:
-                    await asyncio.sleep(
-                        HTTP_CONNECTION_RETRY_DELAY * attempt
-                    )
-                continue
+                err_processing = process_error_code(response.status)
+                last_error = err_processing["last_error"]
+                if err_processing["need_retry"]:
+                    if attempt < HTTP_CONNECTION_RETRIES:
+                        await asyncio.sleep(
+                            HTTP_CONNECTION_RETRY_DELAY *
+                            attempt
+                        )
+                    continue
+                return fallback()
 
-            except asyncio.TimeoutError:
-                last_error = "Timeout exceeded"
-                logger.warning(
-                    msg=f"Request failed (attempt {attempt}): Timeout",
-                    extra={"request_id": request_id,
-                           "action": "geo_by_ip",
-                           "timeout": HTTP_CONNECTION_RETRY_DELAY * attempt}
+        except aiohttp.ClientError as e:
+            observe(started, type(e).__name__)
+            last_error = e
+            logger.warning(
+                msg=f"Request failed (attempt {attempt}): {str(e)}",
+                extra={"request_id": request_id,
+                       "action": "geo_by_ip",
+                       "error_type": type(e).__name__}
+            )
+            if attempt < HTTP_CONNECTION_RETRIES:
+                await asyncio.sleep(
+                    HTTP_CONNECTION_RETRY_DELAY * attempt
                 )
-                if attempt < HTTP_CONNECTION_RETRIES:
-                    await asyncio.sleep(
-                        HTTP_CONNECTION_RETRY_DELAY * attempt
-                    )
-                continue
+            continue
 
-            except Exception as e:
-                logger.error(
-                    msg="Unexpected error. Returned None",
-                    extra={"request_id": request_id,
-                           "action": "geo_by_ip",
-                           "error": str(e),
-                           "error_type": type(e).__name__,
-                           "traceback": True}
+        except asyncio.TimeoutError:
+            observe(started, "timeout")
+            last_error = "Timeout exceeded"
+            logger.warning(
+                msg=f"Request failed (attempt {attempt}): Timeout",
+                extra={"request_id": request_id,
+                       "action": "geo_by_ip",
+                       "timeout": HTTP_CONNECTION_RETRY_DELAY * attempt}
+            )
+            if attempt < HTTP_CONNECTION_RETRIES:
+                await asyncio.sleep(
+                    HTTP_CONNECTION_RETRY_DELAY * attempt
                 )
-                return {
-                    "country": "UNKNOWN",
-                    "city": "UNKNOWN",
-                }
-        logger.warning(msg=f"Max retries "
-                           f"({HTTP_CONNECTION_RETRIES}) exceeded. "
-                           f"Last error: {str(last_error)}. "
-                           f"Returned None",
-                       extra={"request_id": request_id,
-                              "action": "geo_by_ip"})
-        return {
-            "country": "UNKNOWN",
-            "city": "UNKNOWN",
-        }
+            continue
+
+        except Exception as e:
+            logger.error(
+                msg="Unexpected error. Returned None",
+                extra={"request_id": request_id,
+                       "action": "geo_by_ip",
+                       "error": str(e),
+                       "error_type": type(e).__name__,
+                       "traceback": True}
+            )
+            return fallback()
+    logger.warning(msg=f"Max retries "
+                       f"({HTTP_CONNECTION_RETRIES}) exceeded. "
+                       f"Last error: {str(last_error)}. "
+                       f"Returned None",
+                   extra={"request_id": request_id,
+                          "action": "geo_by_ip"})
+    return fallback()
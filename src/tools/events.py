@@ -0,0 +1,77 @@
+import logging
+from collections import defaultdict
+from typing import Any, Callable, DefaultDict, Dict, List
+
+logger = logging.getLogger("app.events")
+
+EventHandler = Callable[[str, Dict[str, Any]], None]
+
+_handlers: DefaultDict[str, List[EventHandler]] = defaultdict(list)
+
+
+def subscribe(event: str, handler: EventHandler) -> None:
+    """Подписывает обработчик на событие.
+
+    Обработчики вызываются синхронно в потоке event loop, поэтому
+    должны быть быстрыми: долгую работу следует ставить в очередь.
+
+    Args:
+        event (str): название события, например "complaint.updated".
+        handler (EventHandler): функция, принимающая название события
+        и его данные.
+
+    Returns:
+        None.
+    """
+    _handlers[event].append(handler)
+
+
+def unsubscribe(event: str, handler: EventHandler) -> None:
+    """Отписывает обработчик от события.
+
+    Args:
+        event (str): название события.
+        handler (EventHandler): ранее подписанный обработчик.
+
+    Returns:
+        None.
+    """
+    if handler in _handlers[event]:
+        _handlers[event].remove(handler)
+
+
+def has_subscribers(event: str) -> bool:
+    """Есть ли обработчики события. Позволяет не собирать данные
+    события, которые никому не нужны.
+
+    Args:
+        event (str): название события.
+
+    Returns:
+        bool.
+    """
+    return bool(_handlers.get(event))
+
+
+def emit(event: str, payload: Dict[str, Any]) -> None:
+    """Оповещает подписчиков о событии. Ошибки обработчиков
+    логируются и не прерывают оповещение остальных.
+
+    Args:
+        event (str): название события.
+        payload (Dict[str, Any]): данные события.
+
+    Returns:
+        None.
+    """
+    logger.debug(msg=f"Event {event}",
+                 extra={"event": event, "payload": payload})
+    for handler in _handlers.get(event, ()):
+        try:
+            handler(event, payload)
+        except Exception as e:
+            logger.error(
+                msg=f"Event handler failed: {e}",
+                extra={"event": event,
+                       "error_type": type(e).__name__}
+            )
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+from settings import (HEDGE_BUDGET,
+                      HEDGE_MIN_DELAY,
+                      HEDGE_QUANTILE,
+                      HEDGE_WINDOW,
+                      HTTP_CONNECTION_TIMEOUT)
+
+from tools.metrics import UPSTREAM_HEDGES
+
+logger = logging.getLogger("app.hedging")
+
+T = TypeVar("T")
+
+_MIN_SAMPLES = 20
+
+
+class HedgePolicy:
+    """Решает, когда и можно ли отправить дублирующий запрос к внешнему
+    сервису.
+
+    Задержка дубля — квантиль quantile времени успешных запросов
+    за последние window запросов, но не меньше min_delay: дубль
+    отправляется только для запросов, которые уже выбились из обычного
+    времени ответа. Пока замеров меньше _MIN_SAMPLES, дубли не
+    отправляются.
+
+    Число дублей ограничено бюджетом: каждый запрос добавляет budget
+    жетона, дубль расходует один. Так дублей не больше budget от всех
+    запросов, и при общей деградации сервиса нагрузка на него не
+    удваивается.
+
+    Attributes:
+        service (str): внешний сервис для метрик.
+        action (str): действие для метрик.
+        quantile (float): квантиль времени ответа для задержки дубля.
+        budget (float): доля запросов, которые можно дублировать.
+        min_delay (float): наименьшая задержка дубля, с.
+        max_delay (float): наибольшая задержка дубля, с.
+    """
+    def __init__(self,
+                 service: str,
+                 action: str,
+                 quantile: float = HEDGE_QUANTILE,
+                 budget: float = HEDGE_BUDGET,
+                 min_delay: float = HEDGE_MIN_DELAY,
+                 max_delay: float = HTTP_CONNECTION_TIMEOUT / 2,
+                 window: int = HEDGE_WINDOW):
+        self.service = service
+        self.action = action
+        self.quantile = quantile
+        self.budget = budget
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._max_tokens = max(1.0, budget * window)
+        self._tokens = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self._latencies.append(seconds)
+
+    def delay(self) -> Optional[float]:
+        """Задержка перед отправкой дубля.
+
+        Returns:
+            float | None. Задержка в секундах или None, если замеров
+            пока недостаточно.
+        """
+        if len(self._latencies) < _MIN_SAMPLES:
+            return None
+        latencies = sorted(self._latencies)
+        index = min(len(latencies) - 1, int(len(latencies) * self.quantile))
+        return min(self.max_delay, max(self.min_delay, latencies[index]))
+
+    def record_request(self) -> None:
+        self._tokens = min(self._max_tokens, self._tokens + self.budget)
+
+    def try_hedge(self) -> bool:
+        """Расходует жетон бюджета на дубль.
+
+        Returns:
+            bool. True, если дубль можно отправить.
+        """
+        if self._tokens < 1:
+            UPSTREAM_HEDGES.inc(self.service, self.action, "over_budget")
+            return False
+        self._tokens -= 1
+        UPSTREAM_HEDGES.inc(self.service, self.action, "sent")
+        return True
+
+
+_policies: Dict[Tuple[str, str], HedgePolicy] = {}
+
+
+def hedge_policy(service: str, action: str) -> HedgePolicy:
+    """Возвращает политику дублирования для действия. Время ответа
+    у действий разное, поэтому замеры и бюджет у каждого свои.
+
+    Args:
+        service (str): внешний сервис.
+        action (str): действие.
+
+    Returns:
+        HedgePolicy.
+    """
+    key = (service, action)
+    if key not in _policies:
+        _policies[key] = HedgePolicy(service, action)
+    return _policies[key]
+
+
+async def hedged(policy: HedgePolicy,
+                 attempt: Callable[[], Awaitable[T]],
+                 succeeded: Callable[[T], bool]) -> T:
+    """Выполняет запрос attempt() и, если он не завершился за
+    policy.delay() и бюджет позволяет, отправляет дубль. Возвращается
+    первый успешный результат, оставшийся запрос отменяется. Если
+    неуспешны оба, возвращается результат (или исключение) первого.
+
+    Args:
+        policy (HedgePolicy): политика дублирования.
+        attempt (Callable[[], Awaitable[T]]): одна попытка запроса.
+        succeeded (Callable[[T], bool]): успешен ли результат попытки.
+
+    Returns:
+        T. Результат попытки.
+    """
+    policy.record_request()
+    started = {}
+
+    def start() -> asyncio.Task:
+        task = asyncio.ensure_future(attempt())
+        started[task] = time.perf_counter()
+        return task
+
+    primary = start()
+    pending = {primary}
+    try:
+        delay = policy.delay()
+        if delay is not None:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done and policy.try_hedge():
+                pending.add(start())
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None and succeeded(task.result()):
+                    policy.observe(time.perf_counter() - started[task])
+                    if task is not primary:
+                        UPSTREAM_HEDGES.inc(policy.service, policy.action,
+                                            "won")
+                    return task.result()
+        return primary.result()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from typing import Optional
+
+import aiohttp
+
+from settings import (HTTP_CONNECTION_TIMEOUT,
+                      HTTP_KEEPALIVE_TIMEOUT,
+                      HTTP_POOL_SIZE)
+
+logger = logging.getLogger("app.http")
+
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Возвращает общую для процесса сессию aiohttp.
+
+    Сессия держит пул соединений с Yandex Cloud и DaData, поэтому
+    TCP- и TLS-соединения переиспользуются между запросами, а не
+    устанавливаются заново для каждого вызова.
+
+    Returns:
+        aiohttp.ClientSession.
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=HTTP_POOL_SIZE,
+                keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=300,
+            )
+        )
+    return _session
+
+
+async def open_connection(url: str) -> bool:
+    """Заранее устанавливает соединение с хостом и оставляет его
+    в пуле общей сессии. Код ответа не важен.
+
+    Args:
+        url (str): адрес внешнего сервиса.
+
+    Returns:
+        bool. True, если сервер ответил.
+    """
+    try:
+        async with get_session().head(
+                url,
+                timeout=aiohttp.ClientTimeout(total=HTTP_CONNECTION_TIMEOUT)
+        ) as response:
+            await response.read()
+            return True
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning(f"Unable to open connection to {url}: {e}")
+        return False
+
+
+async def close_session() -> None:
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
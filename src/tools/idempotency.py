@@ -0,0 +1,234 @@
+import asyncio
+import base64
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+import orjson
+
+from settings import IDEMPOTENCY_LOCK_TTL, IDEMPOTENCY_TTL
+
+from tools.metrics import IDEMPOTENCY_REQUESTS
+from tools.shared_cache import cache_key, shared_cache
+
+logger = logging.getLogger("app.idempotency")
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+REPLAYED_HEADER = b"idempotent-replayed"
+MAX_KEY_LENGTH = 255
+
+_POLL_INTERVAL = 0.05
+_MAX_POLL_INTERVAL = 0.5
+
+
+def storable(status_code: int) -> bool:
+    """Сохраняется ли ответ для повторов с тем же ключом. Ошибки 5xx
+    и 429 временные: повтор должен выполнить запрос заново.
+
+    Args:
+        status_code (int): код ответа.
+
+    Returns:
+        bool.
+    """
+    return status_code < 500 and status_code != 429
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware, выполняющий запрос с заголовком Idempotency-Key
+    не больше одного раза.
+
+    Ответ на первый запрос с ключом сохраняется в общем кэше воркеров
+    (tools.shared_cache) на ttl секунд, повторы с тем же ключом получают
+    его без проверки на спам, записи в базу данных и фоновой обработки,
+    с заголовком Idempotent-Replayed: true. Повтор, пришедший, пока
+    первый запрос ещё выполняется, ждёт его ответа: в своём воркере —
+    на Future, в другом — опрашивая кэш. Выполнение запроса закреплено
+    за одним воркером блокировкой в кэше на lock_ttl секунд, которая
+    продлевается, пока запрос выполняется: она истекает, только если
+    воркер завершился, не сняв её. Повтор ждёт ответа не дольше
+    lock_ttl, затем получает 409.
+
+    Ключ действует для маршрута и тела запроса: повтор ключа с другим
+    телом отклоняется с 422. Запросы без ключа и к другим маршрутам
+    проходят без изменений.
+
+    Attributes:
+        routes (Dict[Tuple[str, str], str]): метод и путь маршрута
+            и его название для метрик.
+        ttl (float): время хранения ответа, с.
+        lock_ttl (float): наибольшее время выполнения первого запроса, с.
+    """
+    def __init__(self, app,
+                 routes: Dict[Tuple[str, str], str],
+                 ttl: float = IDEMPOTENCY_TTL,
+                 lock_ttl: float = IDEMPOTENCY_LOCK_TTL):
+        self.app = app
+        self.routes = routes
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        route = self.routes.get((scope["method"], scope["path"]))
+        key = dict(scope["headers"]).get(IDEMPOTENCY_HEADER)
+        if route is None or key is None:
+            return await self.app(scope, receive, send)
+        key = key.decode("latin-1").strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            IDEMPOTENCY_REQUESTS.inc(route, "invalid")
+            return await _send_error(
+                send, 400, f"Заголовок Idempotency-Key должен содержать "
+                           f"от 1 до {MAX_KEY_LENGTH} символов"
+            )
+        body, receive = await _buffer_body(receive)
+        fingerprint = cache_key(body.decode("latin-1"))
+        store_key = cache_key(scope["method"], scope["path"], key)
+        deadline = time.monotonic() + self.lock_ttl
+        interval = _POLL_INTERVAL
+        waited = False
+        while True:
+            stored = shared_cache.get("idempotency", store_key)
+            if stored is not None:
+                if stored["fingerprint"] != fingerprint:
+                    IDEMPOTENCY_REQUESTS.inc(route, "mismatch")
+                    return await _send_error(
+                        send, 422, "Ключ Idempotency-Key уже использован "
+                                   "с другим запросом"
+                    )
+                IDEMPOTENCY_REQUESTS.inc(route, "replayed")
+                return await _replay(send, stored)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                IDEMPOTENCY_REQUESTS.inc(route, "conflict")
+                logger.warning(f"Request with idempotency key is still "
+                               f"running after {self.lock_ttl:.0f} s",
+                               extra={"route": route})
+                return await _send_error(
+                    send, 409, "Запрос с этим Idempotency-Key ещё "
+                               "выполняется, повторите позже",
+                    retry_after=math.ceil(self.lock_ttl)
+                )
+            future = self._inflight.get(store_key)
+            if future is not None:
+                waited = True
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), remaining)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            owner = uuid4().hex
+            if not shared_cache.add("idempotency_lock", store_key,
+                                    owner, self.lock_ttl):
+                waited = True
+                await asyncio.sleep(min(interval, remaining))
+                interval = min(interval * 2, _MAX_POLL_INTERVAL)
+                continue
+            break
+        IDEMPOTENCY_REQUESTS.inc(route, "waited" if waited else "new")
+        await self._execute(scope, receive, send, store_key, fingerprint,
+                            owner)
+
+    async def _execute(self, scope, receive, send, store_key: str,
+                       fingerprint: str, owner: str) -> None:
+        """Выполняет запрос и сохраняет ответ, как только отправлено
+        его тело: фоновые задачи Starlette выполняются позже, и повторы
+        не ждут их завершения. До тех пор блокировка owner продлевается
+        каждую треть lock_ttl."""
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[store_key] = future
+        response: Dict[str, Any] = {"fingerprint": fingerprint}
+        chunks: List[bytes] = []
+
+        async def renew_lock() -> None:
+            while True:
+                await asyncio.sleep(self.lock_ttl / 3)
+                shared_cache.extend("idempotency_lock", store_key, owner,
+                                    self.lock_ttl)
+
+        renewal = asyncio.create_task(renew_lock())
+
+        def finish() -> None:
+            if future.done():
+                return None
+            renewal.cancel()
+            if response.get("status") is not None and \
+                    storable(response["status"]):
+                response["body"] = base64.b64encode(
+                    b"".join(chunks)
+                ).decode()
+                shared_cache.set("idempotency", store_key, response, self.ttl)
+            shared_cache.delete("idempotency_lock", store_key)
+            self._inflight.pop(store_key, None)
+            future.set_result(None)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [
+                    [name.decode("latin-1"), value.decode("latin-1")]
+                    for name, value in message.get("headers", [])
+                ]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    finish()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
+
+
+async def _buffer_body(receive) -> Tuple[bytes, Any]:
+    """Читает тело запроса целиком.
+
+    Returns:
+        Tuple[bytes, Any]. Тело и receive, отдающий его приложению.
+    """
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    body = b"".join(chunks)
+    replayed = False
+
+    async def replay_receive():
+        nonlocal replayed
+        if replayed:
+            return await receive()
+        replayed = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return body, replay_receive
+
+
+async def _replay(send, stored: Dict[str, Any]) -> None:
+    headers = [(name.encode("latin-1"), value.encode("latin-1"))
+               for name, value in stored["headers"]]
+    await send({"type": "http.response.start",
+                "status": stored["status"],
+                "headers": headers + [(REPLAYED_HEADER, b"true")]})
+    await send({"type": "http.response.body",
+                "body": base64.b64decode(stored["body"])})
+
+
+async def _send_error(send, status_code: int, detail: str,
+                      retry_after: Optional[int] = None) -> None:
+    body = orjson.dumps({"detail": detail})
+    headers = [(b"content-type", b"application/json"),
+               (b"content-length", str(len(body)).encode())]
+    if retry_after is not None:
+        headers.append((b"retry-after", str(retry_after).encode()))
+    await send({"type": "http.response.start", "status": status_code,
+                "headers": headers})
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,122 @@
+import ipaddress
+from typing import Optional, Tuple, Union
+
+IPAddress = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+
+
+def parse_ip(value: Union[str, bytes, IPAddress]) -> IPAddress:
+    """Разбирает IP-адрес. Адреса IPv4, отображённые в IPv6
+    (::ffff:178.252.97.31), приводятся к IPv4.
+
+    Args:
+        value (str | bytes | IPAddress): адрес в текстовом виде, в виде
+        4 или 16 байт или уже разобранный.
+
+    Raises:
+        ValueError: если значение не является IP-адресом.
+
+    Returns:
+        IPAddress.
+    """
+    if isinstance(value, str):
+        value = value.strip().strip("[]")
+    address = ipaddress.ip_address(value)
+    if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+        return address.ipv4_mapped
+    return address
+
+
+def normalize_ip(value: Optional[str]) -> Optional[str]:
+    """Приводит IP-адрес к каноническому текстовому виду.
+
+    Args:
+        value (str, optional): адрес клиента.
+
+    Returns:
+        str | None. Адрес или None, если значение не является IP-адресом
+        (например, при подключении через unix-сокет).
+    """
+    if not value:
+        return None
+    try:
+        return str(parse_ip(value))
+    except ValueError:
+        return None
+
+
+def pack_ip(value: Union[str, bytes, IPAddress]) -> bytes:
+    """Упаковывает IP-адрес: 4 байта для IPv4, 16 байт для IPv6.
+    Байты идут в сетевом порядке, поэтому упакованные адреса одной
+    версии сравниваются так же, как числа.
+
+    Args:
+        value (str | bytes | IPAddress): адрес.
+
+    Raises:
+        ValueError: если значение не является IP-адресом.
+
+    Returns:
+        bytes.
+    """
+    return parse_ip(value).packed
+
+
+def unpack_ip(packed: bytes) -> str:
+    """Преобразует упакованный адрес в текстовый вид.
+
+    Args:
+        packed (bytes): 4 или 16 байт.
+
+    Returns:
+        str.
+    """
+    return str(ipaddress.ip_address(packed))
+
+
+def ip_version(value: Union[str, bytes, IPAddress, None]) -> Optional[int]:
+    """Определяет версию IP-адреса.
+
+    Args:
+        value (str | bytes | IPAddress, optional): адрес.
+
+    Returns:
+        int | None. 4, 6 или None, если адреса нет.
+    """
+    if value is None:
+        return None
+    return parse_ip(value).version
+
+
+def ip_range(value: str) -> Tuple[int, bytes, bytes]:
+    """Разбирает адрес, подсеть или диапазон адресов для запроса
+    по упакованному адресу (BETWEEN по индексу).
+
+    Поддерживаются адрес (178.252.97.31), подсеть в нотации CIDR
+    (178.252.97.0/24, 2a02:6b8::/32) и диапазон через дефис
+    (178.252.97.10-178.252.97.99).
+
+    Args:
+        value (str): адрес, подсеть или диапазон.
+
+    Raises:
+        ValueError: если значение не разобрано или границы диапазона
+        разных версий.
+
+    Returns:
+        Tuple[int, bytes, bytes]. Версия, первый и последний адрес
+        в упакованном виде.
+    """
+    value = value.strip()
+    if "/" in value:
+        network = ipaddress.ip_network(value, strict=False)
+        return (network.version,
+                network.network_address.packed,
+                network.broadcast_address.packed)
+    first, separator, last = value.partition("-")
+    first_address = parse_ip(first)
+    last_address = parse_ip(last) if separator else first_address
+    if first_address.version != last_address.version:
+        raise ValueError("Range bounds must be of the same IP version")
+    if first_address > last_address:
+        first_address, last_address = last_address, first_address
+    return first_address.version, first_address.packed, last_address.packed
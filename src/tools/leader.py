@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from settings import LEADER_CHECK_INTERVAL, LEADER_LOCK_PATH
+
+try:
+    import fcntl
+except ImportError:  # Windows: воркер всегда один
+    fcntl = None
+
+logger = logging.getLogger("app.leader")
+
+Job = Callable[[], Awaitable[None]]
+
+
+class LeaderElection:
+    """Выбирает среди воркеров uvicorn ведущий процесс, который
+    выполняет фоновые задачи (обновление IAM-токена, очистку кэша)
+    за всех.
+
+    Ведущим становится процесс, захвативший эксклюзивную блокировку
+    файла (flock). Блокировка снимается операционной системой при
+    завершении процесса, и её захватывает следующий воркер при
+    очередной проверке.
+
+    Attributes:
+        path (Path): путь к файлу блокировки.
+        interval (float): период проверки и выполнения задач, с.
+        is_leader (bool): текущий процесс — ведущий.
+    """
+    def __init__(self,
+                 path: str = LEADER_LOCK_PATH,
+                 interval: float = LEADER_CHECK_INTERVAL):
+        self.path = Path(path)
+        self.interval = interval
+        self.is_leader = False
+        self._jobs: List[Tuple[str, Job]] = []
+        self._file = None
+        self._task: Optional[asyncio.Task] = None
+
+    def add_job(self, name: str, job: Job) -> None:
+        """Регистрирует задачу, выполняемую ведущим процессом
+        каждые interval секунд.
+
+        Args:
+            name (str): название задачи для логов.
+            job (Job): корутинная функция без аргументов.
+
+        Returns:
+            None.
+        """
+        self._jobs.append((name, job))
+
+    def _try_acquire(self) -> bool:
+        if self.is_leader:
+            return True
+        if fcntl is None:
+            self.is_leader = True
+            return True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self._file is None:
+            self._file = open(self.path, "a+")
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return False
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write(str(os.getpid()))
+        self._file.flush()
+        self.is_leader = True
+        logger.info(f"Worker {os.getpid()} became leader")
+        return True
+
+    def _release(self) -> None:
+        if self._file is not None:
+            if self.is_leader and fcntl is not None:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self.is_leader = False
+
+    async def _run(self) -> None:
+        while True:
+            if self._try_acquire():
+                for name, job in self._jobs:
+                    try:
+                        await job()
+                    except Exception as e:
+                        logger.error(f"Leader job {name} failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._release()
+
+
+leader = LeaderElection()
@@ -0,0 +1,531 @@
+import asyncio
+import logging
+import math
+import os
+import random
+import re
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from database import async_session_maker
+
+from models.models import ComplaintArchiveDB, ComplaintDB
+from models.schemas import ComplaintCategory, ComplaintSentiment
+
+import numpy as np
+
+import orjson
+
+from settings import (LOCAL_MODEL_AUDIT_RATE,
+                      LOCAL_MODEL_PATH,
+                      LOCAL_MODEL_THRESHOLD)
+
+from sqlalchemy import and_, or_, select
+
+from tools.metrics import LOCAL_MODEL_AGREEMENT, LOCAL_MODEL_DECISIONS
+
+logger = logging.getLogger("app.local_model")
+
+TARGETS = ("sentiment", "category")
+
+Vector = List[Tuple[int, float]]
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Признаки текста: слова и пары соседних слов в нижнем регистре.
+
+    Args:
+        text (str): текст жалобы.
+
+    Returns:
+        List[str].
+    """
+    words = _TOKEN.findall(text.lower())
+    return words + [f"{first} {second}"
+                    for first, second in zip(words, words[1:])]
+
+
+class TfidfVectorizer:
+    """Преобразует тексты в разреженные векторы TF-IDF
+    (логарифмическая частота, нормировка L2).
+
+    Attributes:
+        vocabulary (Dict[str, int]): номер каждого признака.
+        idf (List[float]): IDF признаков.
+    """
+    def __init__(self, vocabulary: Dict[str, int], idf: List[float]):
+        self.vocabulary = vocabulary
+        self.idf = idf
+
+    @classmethod
+    def fit(cls, texts: Sequence[str], min_df: int = 2,
+            max_features: int = 50000) -> "TfidfVectorizer":
+        """Строит словарь по текстам обучающей выборки.
+
+        Args:
+            texts (Sequence[str]): тексты.
+            min_df (int, optional, default=2): признак должен
+            встречаться хотя бы в min_df текстах.
+            max_features (int, optional, default=50000): наибольший
+            размер словаря, остаются самые частые признаки.
+
+        Returns:
+            TfidfVectorizer.
+        """
+        document_frequency: Counter = Counter()
+        for text in texts:
+            document_frequency.update(set(tokenize(text)))
+        terms = [term for term, count in document_frequency.most_common(
+            max_features
+        ) if count >= min_df]
+        total = len(texts)
+        return cls(
+            vocabulary={term: index for index, term in enumerate(terms)},
+            idf=[math.log((1 + total) / (1 + document_frequency[term])) + 1
+                 for term in terms],
+        )
+
+    def transform(self, texts: Sequence[str]) -> List[Vector]:
+        vectors = []
+        for text in texts:
+            counts = Counter(index for index in map(self.vocabulary.get,
+                                                    tokenize(text))
+                             if index is not None)
+            vector = [(index, (1 + math.log(count)) * self.idf[index])
+                      for index, count in counts.items()]
+            norm = math.sqrt(sum(value * value for _, value in vector)) or 1
+            vectors.append([(index, value / norm) for index, value in vector])
+        return vectors
+
+
+class SoftmaxClassifier:
+    """Мультиклассовая логистическая регрессия над разреженными
+    векторами. Веса хранятся матрицей numpy, предсказание для пачки
+    векторов выполняется матричными операциями.
+
+    Attributes:
+        classes (List[str]): классы.
+        weights (numpy.ndarray): веса признаков, по строке на признак
+        и столбцу на класс.
+        bias (numpy.ndarray): смещения классов.
+    """
+    def __init__(self, classes: List[str], weights: List[List[float]],
+                 bias: List[float]):
+        self.classes = classes
+        self.weights = np.asarray(weights, dtype=np.float64).reshape(
+            -1, len(classes)
+        )
+        self.bias = np.asarray(bias, dtype=np.float64)
+
+    @classmethod
+    def fit(cls, vectors: Sequence[Vector], labels: Sequence[str],
+            features: int, epochs: int = 8, learning_rate: float = 0.5,
+            l2: float = 1e-5, seed: int = 42) -> "SoftmaxClassifier":
+        """Обучает модель стохастическим градиентным спуском.
+
+        Args:
+            vectors (Sequence[Vector]): векторы текстов.
+            labels (Sequence[str]): классы текстов.
+            features (int): размер словаря.
+            epochs (int, optional, default=8): число проходов.
+            learning_rate (float, optional, default=0.5): начальный шаг.
+            l2 (float, optional, default=1e-5): L2-регуляризация.
+            seed (int, optional, default=42): порядок примеров.
+
+        Returns:
+            SoftmaxClassifier.
+        """
+        classes = sorted(set(labels))
+        model = cls(classes, np.zeros((features, len(classes))),
+                    np.zeros(len(classes)))
+        targets = [classes.index(label) for label in labels]
+        samples = [_arrays(vector) for vector in vectors]
+        order = list(range(len(vectors)))
+        rnd = random.Random(seed)
+        for epoch in range(epochs):
+            rnd.shuffle(order)
+            rate = learning_rate / (1 + epoch)
+            for position in order:
+                model._step(*samples[position], targets[position], rate, l2)
+        return model
+
+    def _step(self, indices: np.ndarray, values: np.ndarray, target: int,
+              rate: float, l2: float) -> None:
+        """Шаг градиентного спуска на одном примере: обновляются только
+        строки весов признаков текста."""
+        rows = self.weights[indices]
+        scores = self.bias + values @ rows
+        exponents = np.exp(scores - scores.max())
+        gradient = exponents / exponents.sum()
+        gradient[target] -= 1
+        self.bias -= rate * gradient
+        self.weights[indices] = rows - rate * (np.outer(values, gradient) +
+                                               l2 * rows)
+
+    def predict(self, vectors: Sequence[Vector]) -> List[Tuple[str, float]]:
+        """Определяет класс и его вероятность для каждого вектора.
+        Оценки всей пачки считаются одним проходом по ненулевым
+        признакам: строки весов признаков, умноженные на значения,
+        суммируются по отрезкам текстов.
+
+        Args:
+            vectors (Sequence[Vector]): векторы текстов.
+
+        Returns:
+            List[Tuple[str, float]].
+        """
+        if not vectors:
+            return []
+        lengths = np.fromiter(map(len, vectors), dtype=np.intp,
+                              count=len(vectors))
+        indices, values = _arrays([item for vector in vectors
+                                   for item in vector])
+        scores = np.tile(self.bias, (len(vectors), 1))
+        nonempty = lengths > 0
+        if nonempty.any():
+            starts = np.cumsum(lengths) - lengths
+            scores[nonempty] += np.add.reduceat(
+                self.weights[indices] * values[:, None], starts[nonempty]
+            )
+        scores -= scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        scores /= scores.sum(axis=1, keepdims=True)
+        best = scores.argmax(axis=1)
+        return [(self.classes[column], float(scores[row, column]))
+                for row, column in enumerate(best)]
+
+    def rounded(self) -> Dict[str, Any]:
+        """Классы, веса и смещения для сохранения в JSON, веса
+        округлены до 5 знаков."""
+        return {"classes": self.classes,
+                "weights": np.round(self.weights, 5).tolist(),
+                "bias": self.bias.tolist()}
+
+
+def _arrays(vector: Vector) -> Tuple[np.ndarray, np.ndarray]:
+    """Номера и значения признаков разреженного вектора массивами
+    numpy."""
+    return (np.fromiter((index for index, _ in vector), dtype=np.intp,
+                        count=len(vector)),
+            np.fromiter((value for _, value in vector), dtype=np.float64,
+                        count=len(vector)))
+
+
+class LocalPrediction(NamedTuple):
+    """Тональность и категория, определённые локальной моделью,
+    confidence — наименьшая из вероятностей двух меток."""
+    sentiment: str
+    category: str
+    confidence: float
+
+
+class LocalTextClassifier:
+    """Локальная модель тональности и категории жалоб, обученная
+    на метках YandexGPT из базы данных: общий словарь TF-IDF и по
+    логистической регрессии на каждую метку из TARGETS.
+
+    Attributes:
+        vectorizer (TfidfVectorizer): словарь признаков.
+        models (Dict[str, SoftmaxClassifier]): модели меток.
+        meta (Dict[str, Any]): дата обучения, размер выборки и
+        качество на отложенной выборке.
+    """
+    def __init__(self, vectorizer: TfidfVectorizer,
+                 models: Dict[str, SoftmaxClassifier],
+                 meta: Optional[Dict[str, Any]] = None):
+        self.vectorizer = vectorizer
+        self.models = models
+        self.meta = meta or {}
+
+    @classmethod
+    def fit(cls, texts: Sequence[str], labels: Dict[str, Sequence[str]],
+            min_df: int = 2, max_features: int = 50000,
+            epochs: int = 8) -> "LocalTextClassifier":
+        vectorizer = TfidfVectorizer.fit(texts, min_df, max_features)
+        vectors = vectorizer.transform(texts)
+        models = {target: SoftmaxClassifier.fit(vectors, labels[target],
+                                                len(vectorizer.idf), epochs)
+                  for target in TARGETS}
+        return cls(vectorizer, models)
+
+    def predict(self, texts: Sequence[str]) -> List[LocalPrediction]:
+        """Определяет метки сразу для всех текстов.
+
+        Args:
+            texts (Sequence[str]): тексты жалоб.
+
+        Returns:
+            List[LocalPrediction].
+        """
+        vectors = self.vectorizer.transform(texts)
+        sentiments = self.models["sentiment"].predict(vectors)
+        categories = self.models["category"].predict(vectors)
+        return [LocalPrediction(sentiment, category, min(first, second))
+                for (sentiment, first), (category, second)
+                in zip(sentiments, categories)]
+
+    def save(self, path: str) -> None:
+        data = {
+            "meta": self.meta,
+            "vocabulary": self.vectorizer.vocabulary,
+            "idf": self.vectorizer.idf,
+            "models": {target: model.rounded()
+                       for target, model in self.models.items()},
+        }
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix(".tmp")
+        temporary.write_bytes(orjson.dumps(data))
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str) -> "LocalTextClassifier":
+        data = orjson.loads(Path(path).read_bytes())
+        return cls(
+            vectorizer=TfidfVectorizer(data["vocabulary"], data["idf"]),
+            models={target: SoftmaxClassifier(**model)
+                    for target, model in data["models"].items()},
+            meta=data["meta"],
+        )
+
+
+class LocalLabeler:
+    """Определяет тональность и категорию локальной моделью вместо
+    запроса к Yandex Cloud, если модель уверена.
+
+    Модель загружается один раз при прогреве процесса. Если
+    уверенность ниже threshold, метки определяет Yandex Cloud; кроме
+    того, audit_rate уверенных предсказаний тоже проверяется
+    Yandex Cloud. В обоих случаях совпадение меток учитывается
+    в метрике LOCAL_MODEL_AGREEMENT и статистике stats().
+
+    Attributes:
+        path (str): файл модели, пустая строка — модель отключена.
+        threshold (float): порог уверенности.
+        audit_rate (float): доля уверенных предсказаний для проверки.
+        model (LocalTextClassifier | None): загруженная модель.
+    """
+    def __init__(self,
+                 path: str = LOCAL_MODEL_PATH,
+                 threshold: float = LOCAL_MODEL_THRESHOLD,
+                 audit_rate: float = LOCAL_MODEL_AUDIT_RATE):
+        self.path = path
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self.model: Optional[LocalTextClassifier] = None
+        self._agreement: Counter = Counter()
+        self._rnd = random.Random()
+
+    async def load(self) -> None:
+        """Загружает модель из файла path, если он есть (этап
+        прогрева)."""
+        if not self.path or not Path(self.path).exists():
+            logger.info("Local text model is not trained, all texts are "
+                        "classified by Yandex Cloud")
+            return None
+        self.model = await asyncio.to_thread(LocalTextClassifier.load,
+                                             self.path)
+        logger.info(f"Loaded local text model trained at "
+                    f"{self.model.meta.get('trained_at')} on "
+                    f"{self.model.meta.get('samples')} complaints")
+
+    def predict(self, texts: Sequence[str]) -> List[Optional[LocalPrediction]]:
+        """Предсказания модели для всех текстов одним вызовом.
+
+        Args:
+            texts (Sequence[str]): тексты жалоб.
+
+        Returns:
+            List[LocalPrediction | None]. None, если модель
+            не загружена.
+        """
+        if self.model is None:
+            return [None] * len(texts)
+        return self.model.predict(texts)
+
+    def decide(self, prediction: Optional[LocalPrediction]) -> str:
+        """Решает, чем определить метки жалобы.
+
+        Args:
+            prediction (LocalPrediction | None): предсказание модели.
+
+        Returns:
+            str. "local" — использовать предсказание, "uncertain" —
+            модель не уверена, "audit" — уверенное предсказание
+            проверяется Yandex Cloud, "unavailable" — модели нет.
+        """
+        if prediction is None:
+            decision = "unavailable"
+        elif prediction.confidence < self.threshold:
+            decision = "uncertain"
+        elif self._rnd.random() < self.audit_rate:
+            decision = "audit"
+        else:
+            decision = "local"
+        LOCAL_MODEL_DECISIONS.inc(decision)
+        return decision
+
+    def compare(self, prediction: LocalPrediction, decision: str,
+                remote: Sequence[Any]) -> None:
+        """Учитывает совпадение предсказания с метками Yandex Cloud.
+        Значения по умолчанию и ошибки Yandex Cloud не учитываются.
+
+        Args:
+            prediction (LocalPrediction): предсказание модели.
+            decision (str): "uncertain" или "audit".
+            remote (Sequence[Any]): тональность и категория от
+            Yandex Cloud.
+
+        Returns:
+            None.
+        """
+        if remote[0] == ComplaintSentiment.UNKNOWN.value or \
+                any(isinstance(value, Exception) for value in remote):
+            return None
+        for target, local, actual in zip(TARGETS, prediction[:2], remote):
+            result = "agree" if local == actual else "disagree"
+            LOCAL_MODEL_AGREEMENT.inc(target, decision, result)
+            self._agreement[(target, decision, result)] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        agreement = {}
+        for target in TARGETS:
+            for decision in ("audit", "uncertain"):
+                agree = self._agreement[(target, decision, "agree")]
+                total = agree + self._agreement[(target, decision,
+                                                 "disagree")]
+                agreement[f"{target}.{decision}"] = {
+                    "compared": total,
+                    "agreement_rate": round(agree / total, 3)
+                    if total else None,
+                }
+        return {
+            "loaded": self.model is not None,
+            "threshold": self.threshold,
+            "audit_rate": self.audit_rate,
+            "model": self.model.meta if self.model else None,
+            "agreement": agreement,
+        }
+
+
+async def load_training_set(
+        limit: Optional[int] = None
+) -> Tuple[List[str], Dict[str, List[str]]]:
+    """Выбирает из рабочей таблицы и архива жалобы с метками,
+    определёнными Yandex Cloud: тональность не "unknown", метки
+    не получены локальной моделью и не подставлены по умолчанию
+    (labels_model "fallback"). У жалоб, размеченных до появления
+    labels_model, значение по умолчанию не отличить от ответа
+    YandexGPT, поэтому из них категория "другое" не берётся.
+
+    Args:
+        limit (int, optional): наибольшее число жалоб из каждой таблицы.
+
+    Returns:
+        Tuple[List[str], Dict[str, List[str]]]. Тексты и метки.
+    """
+    texts: List[str] = []
+    labels: Dict[str, List[str]] = {target: [] for target in TARGETS}
+    async with async_session_maker() as session:
+        for model in (ComplaintDB, ComplaintArchiveDB):
+            result = await session.stream(
+                select(model.text, model.sentiment, model.category)
+                .where(model.sentiment != ComplaintSentiment.UNKNOWN,
+                       or_(and_(model.labels_model.is_(None),
+                                model.category != ComplaintCategory.OTHER),
+                           model.labels_model == "remote"))
+                .order_by(model.id.desc())
+                .limit(limit)
+            )
+            async for text, sentiment, category in result:
+                texts.append(text)
+                labels["sentiment"].append(sentiment.value)
+                labels["category"].append(category.value)
+    return texts, labels
+
+
+def _evaluate(model: LocalTextClassifier, texts: Sequence[str],
+              labels: Dict[str, Sequence[str]],
+              threshold: float) -> Dict[str, Any]:
+    predictions = model.predict(texts)
+    confident = [index for index, prediction in enumerate(predictions)
+                 if prediction.confidence >= threshold]
+    report: Dict[str, Any] = {
+        "samples": len(texts),
+        "coverage_at_threshold": round(len(confident) / len(texts), 3)
+        if texts else None,
+    }
+    for position, target in enumerate(TARGETS):
+        matches = [prediction[position] == labels[target][index]
+                   for index, prediction in enumerate(predictions)]
+        report[f"{target}_agreement"] = round(sum(matches) / len(matches),
+                                              3) if matches else None
+        report[f"{target}_agreement_at_threshold"] = round(
+            sum(matches[index] for index in confident) / len(confident), 3
+        ) if confident else None
+    return report
+
+
+async def train(path: str = LOCAL_MODEL_PATH,
+                holdout: float = 0.1,
+                epochs: int = 8,
+                min_df: int = 2,
+                max_features: int = 50000,
+                limit: Optional[int] = None,
+                threshold: float = LOCAL_MODEL_THRESHOLD) -> Dict[str, Any]:
+    """Обучает локальную модель на метках из базы данных и сохраняет
+    её в path. Качество оценивается на отложенной доле holdout жалоб
+    как совпадение с метками Yandex Cloud.
+
+    Args:
+        path (str): файл модели.
+        holdout (float, optional, default=0.1): доля жалоб для оценки.
+        epochs (int, optional, default=8): число проходов обучения.
+        min_df (int, optional, default=2): наименьшая частота признака.
+        max_features (int, optional, default=50000): размер словаря.
+        limit (int, optional): наибольшее число жалоб из каждой таблицы.
+        threshold (float): порог уверенности для оценки покрытия.
+
+    Raises:
+        ValueError: если жалоб с метками слишком мало.
+
+    Returns:
+        Dict[str, Any]. Отчёт об обучении.
+    """
+    started = time.perf_counter()
+    texts, labels = await load_training_set(limit)
+    if len(texts) < 20:
+        raise ValueError(f"Only {len(texts)} labeled complaints, "
+                         f"not enough to train a model")
+    order = list(range(len(texts)))
+    random.Random(42).shuffle(order)
+    split = int(len(order) * (1 - holdout))
+
+    def subset(indexes: List[int]) -> Tuple[List[str], Dict[str, List]]:
+        return ([texts[index] for index in indexes],
+                {target: [values[index] for index in indexes]
+                 for target, values in labels.items()})
+
+    train_texts, train_labels = subset(order[:split])
+    test_texts, test_labels = subset(order[split:])
+    model = await asyncio.to_thread(LocalTextClassifier.fit, train_texts,
+                                    train_labels, min_df, max_features,
+                                    epochs)
+    evaluation = _evaluate(model, test_texts, test_labels, threshold)
+    model.meta = {
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+        "samples": len(train_texts),
+        "features": len(model.vectorizer.idf),
+        "holdout": evaluation,
+    }
+    model.save(path)
+    return {**model.meta, "path": str(path),
+            "elapsed_s": round(time.perf_counter() - started, 2)}
+
+
+local_labeler = LocalLabeler()
@@ -0,0 +1,417 @@
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return (str(value).replace("\\", "\\\\")
+            .replace("\n", "\\n")
+            .replace('"', '\\"'))
+
+
+def _format_labels(names: Sequence[str],
+                   values: Sequence[str],
+                   extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"'
+             for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Базовый класс метрики.
+
+    Значения хранятся в словаре по кортежу значений меток. Метрики
+    изменяются только из потока event loop, поэтому блокировки не
+    используются.
+
+    Attributes:
+        name (str): название метрики.
+        documentation (str): описание для # HELP.
+        labelnames (Tuple[str, ...]): названия меток.
+    """
+    kind = "untyped"
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def get(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} {self.kind}"]
+        for labelvalues, value in self._values.items():
+            lines.append(f"{self.name}"
+                         f"{_format_labels(self.labelnames, labelvalues)} "
+                         f"{value}")
+        return lines
+
+
+class Counter(_Metric):
+    """Монотонно возрастающий счётчик."""
+    kind = "counter"
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+
+class Gauge(_Metric):
+    """Значение, которое может как расти, так и уменьшаться."""
+    kind = "gauge"
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        self._values[labelvalues] = value
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def dec(self, *labelvalues: str, amount: float = 1) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0) - amount
+
+
+class Histogram(_Metric):
+    """Гистограмма с фиксированными границами корзин.
+
+    Attributes:
+        buckets (Tuple[float, ...]): верхние границы корзин.
+    """
+    kind = "histogram"
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            self._series[labelvalues] = series
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, *labelvalues: str) -> int:
+        series = self._series.get(labelvalues)
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} {self.kind}"]
+        for labelvalues, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),),
+                                           counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(self.labelnames, labelvalues,
+                                        f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Реестр метрик приложения в памяти процесса.
+
+    Отдаёт все зарегистрированные метрики в текстовом формате
+    Prometheus без внешних коллекторов.
+    """
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str,
+                labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str,
+              labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str,
+                  labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation,
+                                        labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests processed",
+    ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency",
+    ("method", "route")
+)
+UPSTREAM_REQUEST_DURATION = registry.histogram(
+    "upstream_request_duration_seconds",
+    "Latency of single upstream HTTP attempts",
+    ("service", "action", "outcome")
+)
+UPSTREAM_CALLS = registry.counter(
+    "upstream_calls_total",
+    "Upstream calls, each counted once regardless of retries and hedges",
+    ("service", "action")
+)
+UPSTREAM_RETRIES = registry.counter(
+    "upstream_retries_total", "Upstream request retries",
+    ("service", "action")
+)
+UPSTREAM_FALLBACKS = registry.counter(
+    "upstream_fallbacks_total",
+    "Upstream calls that returned the default value",
+    ("service", "action")
+)
+UPSTREAM_HEDGES = registry.counter(
+    "upstream_hedges_total",
+    "Hedged upstream requests by outcome: sent, won or over_budget",
+    ("service", "action", "outcome")
+)
+LOCAL_MODEL_DECISIONS = registry.counter(
+    "local_model_decisions_total",
+    "Sentiment and category classifications by decision: local, "
+    "uncertain, audit or unavailable", ("decision",)
+)
+LOCAL_MODEL_AGREEMENT = registry.counter(
+    "local_model_agreement_total",
+    "Local model labels compared with Yandex Cloud labels",
+    ("label", "decision", "result")
+)
+YC_TOKEN_REFRESHES = registry.counter(
+    "yc_token_refreshes_total", "Yandex Cloud IAM token refreshes",
+    ("outcome",)
+)
+YC_CREDENTIAL_INFLIGHT = registry.gauge(
+    "yc_credential_inflight",
+    "Yandex Cloud requests in flight by credential", ("credential",)
+)
+YC_CREDENTIAL_REQUESTS = registry.counter(
+    "yc_credential_requests_total",
+    "Yandex Cloud requests by credential and outcome",
+    ("credential", "outcome")
+)
+YC_CREDENTIAL_COOLDOWNS = registry.counter(
+    "yc_credential_cooldowns_total",
+    "Yandex Cloud credentials cooled down after 429 responses",
+    ("credential",)
+)
+BACKGROUND_TASKS_PENDING = registry.gauge(
+    "background_tasks_pending",
+    "Scheduled or running post-create tasks", ("task",)
+)
+BACKGROUND_TASK_DURATION = registry.histogram(
+    "background_task_duration_seconds",
+    "Duration of post-create processing stages", ("task",)
+)
+LOG_RECORDS_DROPPED = registry.counter(
+    "log_records_dropped_total",
+    "Log records dropped before reaching handlers", ("reason",)
+)
+TRACE_SPANS_DROPPED = registry.counter(
+    "trace_spans_dropped_total",
+    "Spans not exported because the export queue was full"
+)
+EVENT_LOOP_LAG = registry.histogram(
+    "event_loop_lag_seconds", "Delay of event loop heartbeat wake-ups",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+EVENT_LOOP_STALLS = registry.counter(
+    "event_loop_stalls_total",
+    "Event loop blocks longer than the slow callback threshold"
+)
+SHARED_CACHE_REQUESTS = registry.counter(
+    "shared_cache_requests_total",
+    "Shared cache lookups by namespace and result", ("namespace", "result")
+)
+RATE_LIMIT_DECISIONS = registry.counter(
+    "rate_limit_decisions_total",
+    "Rate limiter decisions by route", ("route", "decision")
+)
+RATE_LIMIT_EVICTIONS = registry.counter(
+    "rate_limit_evictions_total",
+    "Token buckets evicted from the rate limiter LRU"
+)
+IDEMPOTENCY_REQUESTS = registry.counter(
+    "idempotency_requests_total",
+    "Requests with an Idempotency-Key by route and outcome",
+    ("route", "outcome")
+)
+ADMISSION_INFLIGHT = registry.gauge(
+    "admission_inflight", "Operations running under admission control",
+    ("stage",)
+)
+ADMISSION_QUEUE_LENGTH = registry.gauge(
+    "admission_queue_length", "Operations waiting for admission",
+    ("stage",)
+)
+ADMISSION_QUEUE_WAIT = registry.histogram(
+    "admission_queue_wait_seconds", "Time spent waiting for admission",
+    ("stage",)
+)
+ADMISSION_REJECTIONS = registry.counter(
+    "admission_rejections_total",
+    "Operations rejected by admission control", ("stage", "reason")
+)
+ADMISSION_LANE_QUEUE_LENGTH = registry.gauge(
+    "admission_lane_queue_length",
+    "Operations waiting for admission by priority lane", ("stage", "lane")
+)
+ADMISSION_LANE_QUEUE_WAIT = registry.histogram(
+    "admission_lane_queue_wait_seconds",
+    "Time spent waiting for admission by priority lane", ("stage", "lane")
+)
+ADMISSION_PROMOTIONS = registry.counter(
+    "admission_promotions_total",
+    "Operations admitted ahead of lane weights because of their age",
+    ("stage", "lane")
+)
+ENRICHMENT_LATENCY = registry.histogram(
+    "enrichment_latency_seconds",
+    "Time from scheduling to completion of complaint enrichment",
+    ("lane",)
+)
+ENRICHMENT_STAGES_SKIPPED = registry.counter(
+    "enrichment_stages_skipped_total",
+    "Enrichment stages not run because their inputs did not change",
+    ("stage", "reason")
+)
+WEBHOOK_EVENTS_QUEUED = registry.counter(
+    "webhook_events_total",
+    "Events queued for webhook subscribers", ("subscriber",)
+)
+WEBHOOK_DELIVERIES = registry.counter(
+    "webhook_deliveries_total",
+    "Webhook batch deliveries by subscriber and result",
+    ("subscriber", "result")
+)
+WEBHOOK_DELIVERY_DURATION = registry.histogram(
+    "webhook_delivery_duration_seconds",
+    "Duration of webhook batch deliveries", ("subscriber",)
+)
+COMPLAINT_SPIKES = registry.counter(
+    "complaint_spikes_total",
+    "Complaint rate spikes detected by dimension", ("dimension",)
+)
+ARCHIVED_COMPLAINTS = registry.counter(
+    "archived_complaints_total",
+    "Closed complaints moved to the archive table"
+)
+ARCHIVE_READS = registry.counter(
+    "archive_reads_total",
+    "Reads served from the archive table by kind", ("kind",)
+)
+DB_STATEMENT_DURATION = registry.histogram(
+    "db_statement_duration_seconds", "SQL statement execution time",
+    ("operation",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+             0.1, 0.25, 0.5, 1.0)
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware, измеряющий задержку HTTP-запросов по шаблону
+    маршрута (например, /api/v1/complaint/{complaint_id}/).
+
+    Измерение завершается после отправки тела ответа: фоновые задачи
+    Starlette выполняются позже и в задержку запроса не входят.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status_code = 500
+        finished = False
+
+        def finish():
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - started,
+                                          scope["method"], path)
+            HTTP_REQUESTS.inc(scope["method"], path, str(status_code))
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            if (message["type"] == "http.response.body" and
+                    not message.get("more_body", False)):
+                finish()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Подключает измерение времени SQL-выражений к движку SQLAlchemy.
+
+    Args:
+        engine (Engine): синхронный движок (AsyncEngine.sync_engine).
+
+    Returns:
+        None.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters,
+                              context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters,
+                             context, executemany):
+        started = conn.info["query_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper()
+        DB_STATEMENT_DURATION.observe(time.perf_counter() - started,
+                                      operation)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        started = context.connection.info.get("query_started")
+        if started:
+            started.pop()
@@ -0,0 +1,63 @@
+import asyncio
+import logging
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+from database import async_engine
+
+from settings import MIGRATIONS_LOCK_PATH
+
+try:
+    import fcntl
+except ImportError:  # Windows: воркер всегда один
+    fcntl = None
+
+logger = logging.getLogger("app.migrations")
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migration"
+
+
+def _config() -> Config:
+    """Конфигурация alembic без alembic.ini: env.py не вызывает
+    fileConfig и не перенастраивает логирование приложения."""
+    config = Config()
+    config.set_main_option("script_location", str(MIGRATIONS_DIR))
+    return config
+
+
+def _upgrade() -> None:
+    lock_path = Path(MIGRATIONS_LOCK_PATH)
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        command.upgrade(_config(), "head")
+
+
+async def upgrade_if_behind() -> bool:
+    """Применяет миграции, если база данных отстаёт от последней
+    ревизии. Текущая ревизия проверяется одним запросом, поэтому при
+    актуальной базе запуск не замедляется. Воркеры применяют миграции
+    по очереди под файловой блокировкой, повторное применение
+    в alembic ничего не делает.
+
+    Returns:
+        bool. True, если миграции применялись.
+    """
+    head = ScriptDirectory.from_config(_config()).get_current_head()
+    async with async_engine.connect() as connection:
+        current = await connection.run_sync(
+            lambda sync: MigrationContext.configure(
+                sync
+            ).get_current_revision()
+        )
+    if current == head:
+        return False
+    logger.info(f"Database revision {current} is behind {head}, "
+                f"applying migrations")
+    await asyncio.to_thread(_upgrade)
+    return True
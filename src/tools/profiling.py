@@ -0,0 +1,212 @@
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional
+
+from settings import (LOOP_MONITOR_INTERVAL,
+                      LOOP_SLOW_CALLBACK_THRESHOLD,
+                      LOOP_SLOW_EVENTS_KEPT)
+
+from tools.metrics import EVENT_LOOP_LAG, EVENT_LOOP_STALLS
+
+logger = logging.getLogger("app.profiling")
+
+
+class LoopLagMonitor:
+    """Следит за задержкой event loop.
+
+    Корутина-«пульс» засыпает на interval секунд и измеряет, насколько
+    позже она проснулась. Отдельный поток-сторож проверяет время
+    последнего пульса: если loop не отвечает дольше threshold секунд,
+    значит его блокирует синхронный код, и сторож сохраняет стек
+    потока event loop в этот момент.
+
+    Attributes:
+        interval (float): период пульса в секундах.
+        threshold (float): порог зависания в секундах.
+        slow_events (Deque[Dict[str, Any]]): последние зависания
+        со стеками.
+    """
+    def __init__(self,
+                 interval: float = LOOP_MONITOR_INTERVAL,
+                 threshold: float = LOOP_SLOW_CALLBACK_THRESHOLD,
+                 events_kept: int = LOOP_SLOW_EVENTS_KEPT):
+        self.interval = interval
+        self.threshold = threshold
+        self.slow_events: Deque[Dict[str, Any]] = deque(maxlen=events_kept)
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._current_stall: Optional[Dict[str, Any]] = None
+
+    @property
+    def loop_thread_id(self) -> Optional[int]:
+        return self._loop_thread_id
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._pulse())
+        self._watchdog = threading.Thread(target=self._watch,
+                                          name="loop-lag-watchdog",
+                                          daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _pulse(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._heartbeat = now
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            EVENT_LOOP_LAG.observe(lag)
+            stall = self._current_stall
+            if stall is not None:
+                self._current_stall = None
+                stall["duration_ms"] = round(lag * 1000, 1)
+                logger.warning(
+                    msg=f"Event loop was blocked for "
+                        f"{stall['duration_ms']} ms",
+                    extra={"stack": stall["stack"]}
+                )
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.threshold / 2):
+            blocked = time.monotonic() - self._heartbeat - self.interval
+            if blocked < self.threshold or self._current_stall is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else ""
+            stall = {
+                "detected_at": time.time(),
+                "blocked_ms_at_detection": round(blocked * 1000, 1),
+                "duration_ms": None,
+                "stack": stack,
+            }
+            self._current_stall = stall
+            self.slow_events.append(stall)
+            EVENT_LOOP_STALLS.inc()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "last_lag_ms": round(self.last_lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "slow_events": list(self.slow_events),
+        }
+
+
+class ProfilerBusyError(Exception):
+    """Профилирование уже выполняется."""
+
+
+_profile_lock = asyncio.Lock()
+
+
+async def run_cprofile(seconds: float,
+                       sort: str = "cumulative",
+                       limit: int = 50) -> str:
+    """Профилирует поток event loop с помощью cProfile в течение
+    заданного времени, не прерывая обработку запросов.
+
+    Args:
+        seconds (float): длительность профилирования.
+        sort (str, optional, default="cumulative"): ключ сортировки
+        pstats.
+        limit (int, optional, default=50): количество строк отчёта.
+
+    Raises:
+        ProfilerBusyError: если профилирование уже выполняется.
+
+    Returns:
+        str. Отчёт pstats.
+    """
+    if _profile_lock.locked():
+        raise ProfilerBusyError()
+    async with _profile_lock:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+
+def _sample_stacks(thread_id: int,
+                   seconds: float,
+                   interval: float) -> Counter:
+    samples: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        stack: List[str] = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} "
+                         f"({code.co_filename}:{frame.f_lineno})")
+            frame = frame.f_back
+        if stack:
+            samples[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return samples
+
+
+async def run_sampling_profile(seconds: float,
+                               interval: float = 0.005) -> str:
+    """Снимает стеки потока event loop из отдельного потока с заданным
+    интервалом и возвращает их в формате collapsed stacks
+    (совместим с flamegraph.pl и speedscope).
+
+    Args:
+        seconds (float): длительность профилирования.
+        interval (float, optional, default=0.005): интервал снятия
+        стеков в секундах.
+
+    Raises:
+        ProfilerBusyError: если профилирование уже выполняется.
+
+    Returns:
+        str. Строки вида "frame;frame;frame count".
+    """
+    if _profile_lock.locked():
+        raise ProfilerBusyError()
+    async with _profile_lock:
+        samples = await asyncio.get_running_loop().run_in_executor(
+            None, _sample_stacks, threading.get_ident(), seconds, interval
+        )
+    return "\n".join(f"{stack} {count}"
+                     for stack, count in samples.most_common()) + "\n"
+
+
+loop_monitor = LoopLagMonitor()
@@ -0,0 +1,129 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+
+from fastapi import HTTPException, Request
+
+from settings import RATE_LIMITS, RATE_LIMIT_MAX_KEYS
+
+from tools.metrics import RATE_LIMIT_DECISIONS, RATE_LIMIT_EVICTIONS
+
+logger = logging.getLogger("app.rate_limit")
+
+
+class TokenBucketLimiter:
+    """Ограничивает частоту запросов по ключу (IP-адресу) алгоритмом
+    token bucket.
+
+    Корзины хранятся в LRU ограниченного размера: при переполнении
+    вытесняется корзина, к которой дольше всего не обращались, поэтому
+    память не растёт при запросах с большого числа адресов. Состояние
+    хранится в памяти процесса, при нескольких воркерах лимит действует
+    в каждом из них отдельно.
+
+    Attributes:
+        rate (float): пополнение корзины, запросов в секунду.
+        burst (float): ёмкость корзины.
+        max_keys (int): наибольшее число хранимых корзин.
+    """
+    def __init__(self, rate: float, burst: float, max_keys: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, Tuple[float, float]] = OrderedDict()
+
+    def acquire(self, key: str) -> float:
+        """Забирает из корзины один токен.
+
+        Args:
+            key (str): ключ корзины.
+
+        Returns:
+            float. 0, если запрос разрешён, иначе через сколько секунд
+            в корзине появится токен.
+        """
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            tokens -= 1
+            retry_after = 0.0
+        else:
+            retry_after = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+            RATE_LIMIT_EVICTIONS.inc()
+        return retry_after
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+def parse_rate_limits(rules: str) -> Dict[str, Tuple[float, float]]:
+    """Разбирает лимиты маршрутов из строки вида
+    "complaint_create=10/60,complaint_update=100/60:20", где
+    10/60 — 10 запросов за 60 секунд, :20 — ёмкость корзины
+    (по умолчанию равна числу запросов).
+
+    Args:
+        rules (str): строка с лимитами.
+
+    Returns:
+        Dict[str, Tuple[float, float]]. Название маршрута, скорость
+        пополнения в секунду и ёмкость корзины.
+    """
+    result = {}
+    for item in rules.split(","):
+        if "=" not in item:
+            continue
+        name, limit = item.split("=", 1)
+        limit, _, burst = limit.partition(":")
+        count, _, period = limit.partition("/")
+        count = float(count)
+        result[name.strip()] = (count / float(period or 1),
+                                float(burst) if burst else count)
+    return result
+
+
+_limiters: Dict[str, TokenBucketLimiter] = {
+    name: TokenBucketLimiter(rate, burst, RATE_LIMIT_MAX_KEYS)
+    for name, (rate, burst) in parse_rate_limits(RATE_LIMITS).items()
+}
+
+
+def rate_limit(route: str) -> Callable:
+    """Создаёт зависимость FastAPI, ограничивающую частоту запросов
+    к маршруту с одного IP-адреса. Лимит берётся из RATE_LIMITS,
+    если он для маршрута не задан — запросы не ограничиваются.
+
+    Зависимость выполняется до тела обработчика, поэтому отклонённый
+    запрос не обращается к базе данных и внешним сервисам.
+
+    Args:
+        route (str): название маршрута в RATE_LIMITS.
+
+    Returns:
+        Callable. Зависимость для Depends().
+    """
+    async def dependency(request: Request) -> None:
+        limiter = _limiters.get(route)
+        if limiter is None:
+            return None
+        key = request.client.host if request.client else "unknown"
+        retry_after = limiter.acquire(key)
+        if not retry_after:
+            RATE_LIMIT_DECISIONS.inc(route, "allowed")
+            return None
+        RATE_LIMIT_DECISIONS.inc(route, "rejected")
+        logger.info(f"Rate limit exceeded for {key} on {route}",
+                    extra={"route": route, "ip": key})
+        raise HTTPException(
+            status_code=429,
+            detail="Слишком много запросов, повторите позже",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+
+    return dependency
@@ -0,0 +1,391 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from database import async_session_maker
+
+from models.models import ComplaintDB, ip_hash
+from models.schemas import ComplaintCategory, ComplaintSentiment
+
+import orjson
+
+from settings import REENRICH_RATE
+
+from sqlalchemy import and_, func, or_, select, update
+
+from tools.admission import enrichment_admission
+from tools.complaint import ComplaintService
+from tools.local_model import LocalPrediction, local_labeler
+
+logger = logging.getLogger("app.reenrich")
+
+DEFAULT_VALUES = {
+    "sentiment": ComplaintSentiment.UNKNOWN.value,
+    "category": ComplaintCategory.OTHER.value,
+    "geo": "UNKNOWN",
+}
+
+
+def parse_fields(items: List[str]) -> Dict[str, str]:
+    """Разбирает поля для повторной обработки из строк вида "sentiment"
+    или "category=другое".
+
+    Args:
+        items (List[str]): поля, без значения — значение по умолчанию
+        из DEFAULT_VALUES.
+
+    Raises:
+        ValueError: если поле неизвестно.
+
+    Returns:
+        Dict[str, str]. Поле и значение, требующее обработки.
+    """
+    result = {}
+    for item in items:
+        name, _, value = item.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_VALUES:
+            raise ValueError(f"Unknown field {name}, expected one of "
+                             f"{', '.join(DEFAULT_VALUES)}")
+        result[name] = value.strip() or DEFAULT_VALUES[name]
+    return result
+
+
+class ReEnricher:
+    """Повторно обрабатывает жалобы, у которых тональность, категория
+    или местоположение остались значениями по умолчанию (например,
+    после сбоя Yandex Cloud или DaData).
+
+    Жалобы выбираются пачками по возрастанию ID. Локальная модель
+    (tools.local_model) определяет метки сразу для всей пачки, этапы
+    ComplaintService выполняются для жалоб пачки параллельно, не больше
+    concurrency одновременно, в очереди "backfill" enrichment_admission,
+    чтобы не вытеснять обработку новых жалоб; изменения пачки
+    записываются одним запросом. После каждой пачки прогресс
+    сохраняется в файл checkpoint_path, и прерванную обработку можно
+    продолжить с того же места.
+
+    Очередь enrichment_admission общая только для задач одного процесса,
+    поэтому обработка вне сервиса (cli.py reenrich) ещё и ограничена
+    rate жалоб в секунду, чтобы не занимать квоту Yandex Cloud и DaData,
+    нужную новым жалобам. В процессе сервиса её запускает reenrich_job.
+
+    Attributes:
+        fields (Dict[str, str]): поля ("sentiment", "category", "geo")
+            и значения, которые нужно исправить.
+        start_date (datetime, optional): начало периода создания жалоб.
+        end_date (datetime, optional): конец периода создания жалоб.
+        batch_size (int): размер пачки.
+        concurrency (int): наибольшее число одновременно
+            обрабатываемых жалоб.
+        rate (float): наибольшее число жалоб, обработка которых
+            начинается за секунду, 0 — без ограничения.
+        checkpoint_path (Path, optional): файл с прогрессом.
+        progress (Dict[str, Any]): прогресс текущей обработки.
+    """
+    def __init__(self,
+                 fields: Dict[str, str],
+                 start_date: Optional[datetime] = None,
+                 end_date: Optional[datetime] = None,
+                 batch_size: int = 200,
+                 concurrency: int = 10,
+                 checkpoint_path: Optional[str] = None,
+                 rate: float = REENRICH_RATE):
+        self.fields = fields
+        self.start_date = start_date
+        self.end_date = end_date
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.rate = rate
+        self.checkpoint_path = Path(checkpoint_path) \
+            if checkpoint_path else None
+        self.progress: Dict[str, Any] = self._empty_progress()
+        self._next_start = 0.0
+
+    def _empty_progress(self) -> Dict[str, Any]:
+        return {"last_id": 0, "processed": 0,
+                "updated": {field: 0 for field in self.fields}}
+
+    def _field_filter(self, field: str, value: str):
+        if field == "geo":
+            return and_(ComplaintDB.ip_address.is_not(None),
+                        or_(ComplaintDB.geo_country == value,
+                            ComplaintDB.geo_country.is_(None)))
+        column = getattr(ComplaintDB, field)
+        return or_(column == value, column.is_(None))
+
+    def filters(self, after_id: int = 0) -> list:
+        """Условия отбора жалоб, требующих обработки.
+
+        Args:
+            after_id (int, optional, default=0): отбирать жалобы с ID
+            больше указанного.
+
+        Returns:
+            list. Условия для передачи в where().
+        """
+        filters = [ComplaintDB.id > after_id,
+                   or_(*(self._field_filter(field, value)
+                         for field, value in self.fields.items()))]
+        if self.start_date:
+            filters.append(ComplaintDB.timestamp >= self.start_date)
+        if self.end_date:
+            filters.append(ComplaintDB.timestamp <= self.end_date)
+        return filters
+
+    def _signature(self) -> Dict[str, Any]:
+        return {
+            "fields": self.fields,
+            "start_date": self.start_date.isoformat()
+            if self.start_date else None,
+            "end_date": self.end_date.isoformat()
+            if self.end_date else None,
+        }
+
+    def load_checkpoint(self) -> Dict[str, Any]:
+        """Читает прогресс прерванной обработки.
+
+        Raises:
+            ValueError: если прогресс сохранён для других условий.
+
+        Returns:
+            Dict[str, Any]. Последний обработанный ID и счётчики,
+            пустой прогресс, если файла нет.
+        """
+        empty = self._empty_progress()
+        if self.checkpoint_path is None or not self.checkpoint_path.exists():
+            return empty
+        checkpoint = orjson.loads(self.checkpoint_path.read_bytes())
+        if checkpoint.get("signature") != self._signature():
+            raise ValueError(f"Checkpoint {self.checkpoint_path} was saved "
+                             f"for different filters")
+        return {**empty, **checkpoint["progress"]}
+
+    def save_checkpoint(self, progress: Dict[str, Any]) -> None:
+        if self.checkpoint_path is None:
+            return None
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.checkpoint_path.with_suffix(".tmp")
+        temporary.write_bytes(orjson.dumps({"signature": self._signature(),
+                                            "progress": progress}))
+        os.replace(temporary, self.checkpoint_path)
+
+    async def count(self, after_id: int = 0) -> Dict[str, int]:
+        """Считает жалобы, требующие обработки, не изменяя их.
+
+        Args:
+            after_id (int, optional, default=0): считать жалобы с ID
+            больше указанного.
+
+        Returns:
+            Dict[str, int]. Всего и по каждому полю.
+        """
+        base = self.filters(after_id)
+        columns = [func.count(ComplaintDB.id).label("total")]
+        columns += [func.count(ComplaintDB.id).filter(
+            self._field_filter(field, value)
+        ).label(field) for field, value in self.fields.items()]
+        async with async_session_maker() as session:
+            result = await session.execute(select(*columns).where(*base))
+            return dict(result.one()._mapping)
+
+    async def _throttle(self) -> None:
+        """Распределяет начало обработки жалоб равномерно, не больше
+        rate в секунду."""
+        if self.rate <= 0:
+            return None
+        now = time.monotonic()
+        start = max(now, self._next_start)
+        self._next_start = start + 1 / self.rate
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def _enrich(self, complaint: ComplaintDB,
+                      prediction: Optional[LocalPrediction],
+                      semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        """Выполняет нужные этапы ComplaintService для одной жалобы.
+
+        Returns:
+            Dict[str, Any]. Изменённые поля с ID жалобы для записи.
+        """
+        def needs(field: str) -> bool:
+            if field not in self.fields:
+                return False
+            if field == "geo":
+                return complaint.ip_address is not None and \
+                    complaint.geo_country in (None, self.fields["geo"])
+            current = getattr(complaint, field)
+            return current is None or current == self.fields[field]
+
+        service = ComplaintService(complaint)
+        values: Dict[str, Any] = {}
+        await self._throttle()
+        async with semaphore, \
+                enrichment_admission.slot(wait=True, lane="backfill"):
+            if needs("sentiment") or needs("category"):
+                sentiment, category = await service.classify(prediction)
+                if needs("sentiment") and not isinstance(sentiment,
+                                                         Exception):
+                    values["sentiment"] = sentiment
+                if needs("category") and not isinstance(category,
+                                                        Exception):
+                    values["category"] = category
+            if needs("geo"):
+                location = await service.locate()
+                if location is not None:
+                    values["geo_country"] = location["country"]
+                    values["geo_city"] = location["city"]
+        changed = {field: value for field, value in values.items()
+                   if value != getattr(complaint, field)}
+        if "sentiment" in changed or "category" in changed:
+            changed["labels_hash"] = complaint.text_hash
+            changed["labels_model"] = service.labels_model
+        if "geo_country" in changed:
+            changed["geo_hash"] = ip_hash(complaint.ip_address)
+        return {"id": complaint.id, **changed} if changed else {}
+
+    async def run(self, resume: bool = False) -> Dict[str, Any]:
+        """Обрабатывает все жалобы, требующие обработки.
+
+        Args:
+            resume (bool, optional, default=False): продолжить с
+            сохранённого прогресса.
+
+        Returns:
+            Dict[str, Any]. Отчёт: обработано и исправлено жалоб по
+            полям, длительность и скорость обработки.
+        """
+        progress = self.load_checkpoint() if resume else \
+            self._empty_progress()
+        self.progress = progress
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started = time.perf_counter()
+        processed = 0
+        while True:
+            async with async_session_maker() as session:
+                result = await session.execute(
+                    select(ComplaintDB)
+                    .where(*self.filters(progress["last_id"]))
+                    .order_by(ComplaintDB.id)
+                    .limit(self.batch_size)
+                )
+                complaints = result.scalars().all()
+            if not complaints:
+                break
+            predictions = await asyncio.to_thread(
+                local_labeler.predict,
+                [complaint.text for complaint in complaints]
+            )
+            changes = await asyncio.gather(*(
+                self._enrich(complaint, prediction, semaphore)
+                for complaint, prediction in zip(complaints, predictions)
+            ))
+            changes = [change for change in changes if change]
+            if changes:
+                async with async_session_maker() as session:
+                    await session.execute(update(ComplaintDB), changes)
+                    await session.commit()
+            for change in changes:
+                for field in self.fields:
+                    key = "geo_country" if field == "geo" else field
+                    if key in change:
+                        progress["updated"][field] += 1
+            processed += len(complaints)
+            progress["processed"] += len(complaints)
+            progress["last_id"] = complaints[-1].id
+            self.save_checkpoint(progress)
+            elapsed = time.perf_counter() - started
+            logger.info(f"Re-enriched {progress['processed']} complaints "
+                        f"up to id {progress['last_id']}, "
+                        f"{processed / elapsed:.1f} complaints/s")
+        elapsed = time.perf_counter() - started
+        return {
+            **progress,
+            "elapsed_s": round(elapsed, 2),
+            "complaints_per_s": round(processed / elapsed, 1)
+            if elapsed else 0.0,
+        }
+
+
+class ReEnrichJob:
+    """Повторная обработка в фоне процесса сервиса
+    (POST /api/v1/admin/reenrich/). В отличие от cli.py reenrich жалобы
+    делят места enrichment_admission с новыми и изменёнными жалобами
+    в очереди "backfill" по её весу. Одновременно выполняется не больше
+    одной обработки в процессе.
+
+    Attributes:
+        enricher (ReEnricher | None): текущая или последняя обработка.
+        report (Dict[str, Any] | None): отчёт завершённой обработки.
+        error (str | None): ошибка, прервавшая обработку.
+    """
+    def __init__(self):
+        self.enricher: Optional[ReEnricher] = None
+        self.report: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._started_at: Optional[datetime] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, enricher: ReEnricher) -> bool:
+        """Запускает обработку в фоне.
+
+        Args:
+            enricher (ReEnricher): обработка.
+
+        Returns:
+            bool. False, если предыдущая обработка ещё выполняется.
+        """
+        if self.running:
+            return False
+        self.enricher = enricher
+        self.report = None
+        self.error = None
+        self._started_at = datetime.now(timezone.utc)
+        self._task = asyncio.create_task(self._run(enricher))
+        return True
+
+    async def _run(self, enricher: ReEnricher) -> None:
+        logger.info(f"Re-enrichment started for "
+                    f"{', '.join(enricher.fields)}")
+        try:
+            self.report = await enricher.run()
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            logger.exception("Re-enrichment failed")
+            return None
+        logger.info(f"Re-enrichment finished, processed "
+                    f"{self.report['processed']} complaints")
+
+    async def stop(self) -> None:
+        if self.running:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Состояние текущей или последней обработки.
+
+        Returns:
+            Dict[str, Any].
+        """
+        if self.enricher is None:
+            return {"running": False}
+        return {
+            "running": self.running,
+            "started_at": self._started_at.isoformat(),
+            **self.enricher._signature(),
+            "rate": self.enricher.rate,
+            "progress": self.enricher.progress,
+            "report": self.report,
+            "error": self.error,
+        }
+
+
+reenrich_job = ReEnrichJob()
@@ -0,0 +1,55 @@
+from typing import Any, Iterable, Sequence
+
+from fastapi import Response
+
+from models.models import ComplaintArchiveDB, ComplaintDB
+from models.schemas import ComplaintResponse
+
+import orjson
+
+
+RESPONSE_FIELDS = tuple(ComplaintResponse.model_fields)
+RESPONSE_COLUMNS = tuple(getattr(ComplaintDB, field)
+                         for field in RESPONSE_FIELDS)
+ARCHIVE_RESPONSE_COLUMNS = tuple(getattr(ComplaintArchiveDB, field)
+                                 for field in RESPONSE_FIELDS)
+
+
+def rows_to_dicts(rows: Iterable[Sequence[Any]]) -> list[dict[str, Any]]:
+    """Преобразует строки выборки RESPONSE_COLUMNS в словари
+    с ключами из ComplaintResponse.
+
+    Args:
+        rows (Iterable[Sequence[Any]]): строки результата запроса.
+
+    Returns:
+        list[dict[str, Any]]. Список жалоб в виде словарей.
+    """
+    return [dict(zip(RESPONSE_FIELDS, row)) for row in rows]
+
+
+def to_response_dict(complaint: ComplaintDB) -> dict[str, Any]:
+    """Жалоба в виде словаря с ключами из ComplaintResponse, например
+    для данных событий.
+
+    Args:
+        complaint (ComplaintDB): жалоба.
+
+    Returns:
+        dict[str, Any].
+    """
+    return {field: getattr(complaint, field) for field in RESPONSE_FIELDS}
+
+
+class ORJSONResponse(Response):
+    """JSON-ответ, сериализуемый через orjson без валидации pydantic.
+
+    Используется для данных, которые уже соответствуют схеме ответа
+    (выборка RESPONSE_COLUMNS), поэтому повторная валидация через
+    response_model не требуется. Enum и datetime orjson сериализует
+    так же, как и pydantic.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
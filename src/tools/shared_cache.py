@@ -0,0 +1,333 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+import orjson
+
+from settings import (SHARED_CACHE_BUSY_TIMEOUT,
+                      SHARED_CACHE_LOCAL_SIZE,
+                      SHARED_CACHE_PATH)
+
+from tools.metrics import SHARED_CACHE_REQUESTS
+
+logger = logging.getLogger("app.shared_cache")
+
+# Ожидание блокировки файла в фоновом потоке записи, с
+_BACKGROUND_TIMEOUT = 5.0
+
+
+def _busy(error: sqlite3.Error) -> bool:
+    """Файл кэша занят записью другого процесса."""
+    return getattr(error, "sqlite_errorcode", None) in (sqlite3.SQLITE_BUSY,
+                                                        sqlite3.SQLITE_LOCKED)
+
+
+def cache_key(*parts: str) -> str:
+    """Строит ключ кэша фиксированной длины из произвольных строк.
+
+    Args:
+        parts (str): части ключа, например действие, промт и текст.
+
+    Returns:
+        str. SHA-256 от частей ключа.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class SharedCache:
+    """Кэш, общий для всех воркеров uvicorn на одной машине.
+
+    Значения хранятся в отдельном файле SQLite в режиме WAL: чтение
+    не блокируется записью других процессов и занимает десятки
+    микросекунд, поэтому выполняется прямо в потоке event loop.
+    Перед файлом стоит небольшой LRU в памяти процесса — горячие
+    ключи читаются без обращения к SQLite.
+
+    Значения сериализуются в JSON и должны быть неизменяемыми для
+    ключа: локальная копия не инвалидируется до истечения TTL.
+
+    Запись в потоке event loop ждёт занятый другим процессом файл
+    не дольше busy_timeout. Не дождавшиеся запись и удаление, а также
+    все следующие за ними до их завершения, выполняются по порядку
+    в фоновом потоке со своим соединением; add() в этом случае
+    возвращает False. Удаление истёкших записей всегда выполняется
+    в фоновом потоке.
+
+    Attributes:
+        path (Path): путь к файлу кэша.
+        local_size (int): размер LRU в памяти процесса.
+        busy_timeout (float): ожидание занятого файла в потоке event
+            loop, с.
+    """
+    def __init__(self,
+                 path: str = SHARED_CACHE_PATH,
+                 local_size: int = SHARED_CACHE_LOCAL_SIZE,
+                 busy_timeout: float = SHARED_CACHE_BUSY_TIMEOUT):
+        self.path = Path(path)
+        self.local_size = local_size
+        self.busy_timeout = busy_timeout
+        self._local: OrderedDict[Tuple[str, str], Tuple[Any, float]] = \
+            OrderedDict()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._writer_connection: Optional[sqlite3.Connection] = None
+        self._writer_pid: Optional[int] = None
+        self._last_write: Optional[Future] = None
+
+    def _open(self, timeout: float) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=timeout,
+                                     isolation_level=None,
+                                     check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT NOT NULL, "
+            "key TEXT NOT NULL, "
+            "value BLOB NOT NULL, "
+            "expires_at REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        return connection
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+        self._connection = self._open(self.busy_timeout)
+        self._pid = os.getpid()
+        self._local.clear()
+        return self._connection
+
+    def _submit(self, sql: str, parameters: tuple) -> Future:
+        """Выполняет запрос в фоновом потоке записи.
+
+        Returns:
+            Future. Число изменённых строк.
+        """
+        if self._writer is None or self._writer_pid != os.getpid():
+            self._writer = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="shared-cache"
+            )
+            self._writer_connection = None
+            self._writer_pid = os.getpid()
+        self._last_write = self._writer.submit(self._execute_in_writer,
+                                               sql, parameters)
+        return self._last_write
+
+    def _execute_in_writer(self, sql: str, parameters: tuple) -> int:
+        try:
+            if self._writer_connection is None:
+                self._writer_connection = self._open(_BACKGROUND_TIMEOUT)
+            return self._writer_connection.execute(sql, parameters).rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache background write failed: {e}")
+            return 0
+
+    def _write(self, namespace: str, sql: str, parameters: tuple) -> bool:
+        """Выполняет запись в потоке event loop, а если файл занят или
+        предыдущие записи ещё ждут в фоновом потоке — в фоновом потоке.
+
+        Returns:
+            bool. False, если запись не удалась.
+        """
+        if self._last_write is not None and not self._last_write.done():
+            self._submit(sql, parameters)
+            return True
+        try:
+            self._connect().execute(sql, parameters)
+        except sqlite3.Error as e:
+            if not _busy(e):
+                logger.warning(f"Shared cache write failed: {e}")
+                return False
+            SHARED_CACHE_REQUESTS.inc(namespace, "busy")
+            self._submit(sql, parameters)
+        return True
+
+    def _remember(self, item: Tuple[str, str], value: Any,
+                  expires_at: float) -> None:
+        self._local[item] = (value, expires_at)
+        self._local.move_to_end(item)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Возвращает значение из кэша.
+
+        Args:
+            namespace (str): пространство имён, например "classification".
+            key (str): ключ.
+
+        Returns:
+            Any | None. Значение или None, если его нет или истёк TTL.
+        """
+        now = time.time()
+        item = (namespace, key)
+        local = self._local.get(item)
+        if local is not None and local[1] > now:
+            self._local.move_to_end(item)
+            SHARED_CACHE_REQUESTS.inc(namespace, "local_hit")
+            return local[0]
+        try:
+            row = self._connect().execute(
+                "SELECT value, expires_at FROM cache "
+                "WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, key, now)
+            ).fetchone()
+        except sqlite3.Error as e:
+            if _busy(e):
+                SHARED_CACHE_REQUESTS.inc(namespace, "busy")
+                return None
+            logger.warning(f"Shared cache read failed: {e}")
+            SHARED_CACHE_REQUESTS.inc(namespace, "error")
+            return None
+        if row is None:
+            SHARED_CACHE_REQUESTS.inc(namespace, "miss")
+            return None
+        value = orjson.loads(row[0])
+        self._remember(item, value, row[1])
+        SHARED_CACHE_REQUESTS.inc(namespace, "hit")
+        return value
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        """Сохраняет значение в кэш.
+
+        Args:
+            namespace (str): пространство имён.
+            key (str): ключ.
+            value (Any): значение, сериализуемое в JSON.
+            ttl (float): время жизни в секундах.
+
+        Returns:
+            None.
+        """
+        expires_at = time.time() + ttl
+        if self._write(namespace,
+                       "INSERT OR REPLACE INTO cache "
+                       "(namespace, key, value, expires_at) "
+                       "VALUES (?, ?, ?, ?)",
+                       (namespace, key, orjson.dumps(value), expires_at)):
+            self._remember((namespace, key), value, expires_at)
+
+    def add(self, namespace: str, key: str, value: Any, ttl: float) -> bool:
+        """Атомарно сохраняет значение, если ключа нет в файле или его
+        TTL истёк. Подходит для блокировок между воркерами: значение
+        не попадает в LRU процесса, get() для таких ключей не вызывается.
+
+        Args:
+            namespace (str): пространство имён.
+            key (str): ключ.
+            value (Any): значение, сериализуемое в JSON.
+            ttl (float): время жизни в секундах.
+
+        Returns:
+            bool. True, если значение сохранено этим вызовом; False,
+            если ключ занят или файл занят другим процессом дольше
+            busy_timeout (вызов стоит повторить позже). При других
+            ошибках SQLite — True: без общего файла каждый воркер
+            работает сам по себе.
+        """
+        now = time.time()
+        try:
+            cursor = self._connect().execute(
+                "INSERT INTO cache (namespace, key, value, expires_at) "
+                "VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (namespace, key) DO UPDATE SET "
+                "value = excluded.value, expires_at = excluded.expires_at "
+                "WHERE cache.expires_at <= ?",
+                (namespace, key, orjson.dumps(value), now + ttl, now)
+            )
+        except sqlite3.Error as e:
+            if _busy(e):
+                SHARED_CACHE_REQUESTS.inc(namespace, "busy")
+                return False
+            logger.warning(f"Shared cache add failed: {e}")
+            return True
+        return cursor.rowcount > 0
+
+    def extend(self, namespace: str, key: str, value: Any,
+               ttl: float) -> None:
+        """Продлевает время жизни ключа, если в нём всё ещё значение
+        value: блокировка, сохранённая add(), продлевается только
+        тем, кто её получил.
+
+        Args:
+            namespace (str): пространство имён.
+            key (str): ключ.
+            value (Any): значение, с которым ключ сохранён.
+            ttl (float): новое время жизни в секундах.
+
+        Returns:
+            None.
+        """
+        self._write(namespace,
+                    "UPDATE cache SET expires_at = ? "
+                    "WHERE namespace = ? AND key = ? AND value = ?",
+                    (time.time() + ttl, namespace, key, orjson.dumps(value)))
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._local.pop((namespace, key), None)
+        self._write(namespace,
+                    "DELETE FROM cache WHERE namespace = ? AND key = ?",
+                    (namespace, key))
+
+    def preload(self) -> int:
+        """Загружает в LRU процесса записи с наибольшим оставшимся
+        временем жизни, чтобы первые обращения не читали файл.
+
+        Returns:
+            int. Количество загруженных записей.
+        """
+        now = time.time()
+        try:
+            rows = self._connect().execute(
+                "SELECT namespace, key, value, expires_at FROM cache "
+                "WHERE expires_at > ? ORDER BY expires_at DESC LIMIT ?",
+                (now, self.local_size)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache preload failed: {e}")
+            return 0
+        for namespace, key, value, expires_at in reversed(rows):
+            self._remember((namespace, key), orjson.loads(value), expires_at)
+        return len(rows)
+
+    async def purge_expired(self) -> int:
+        """Удаляет из файла записи с истёкшим TTL в фоновом потоке
+        записи.
+
+        Returns:
+            int. Количество удалённых записей.
+        """
+        return await asyncio.wrap_future(self._submit(
+            "DELETE FROM cache WHERE expires_at <= ?", (time.time(),)
+        ))
+
+    def close(self) -> None:
+        """Дожидается фоновых записей и закрывает соединения."""
+        if self._writer is not None and self._writer_pid == os.getpid():
+            self._writer.shutdown(wait=True)
+            if self._writer_connection is not None:
+                self._writer_connection.close()
+        self._writer = None
+        self._writer_connection = None
+        self._last_write = None
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+        self._local.clear()
+
+
+shared_cache = SharedCache()
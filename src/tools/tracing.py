@@ -0,0 +1,275 @@
+import atexit
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import uuid4
+
+from settings import (TRACE_BUFFER_SIZE,
+                      TRACE_EXPORT_FILE,
+                      TRACE_EXPORT_QUEUE_SIZE,
+                      TRACE_MAX_SPANS)
+
+from tools.metrics import TRACE_SPANS_DROPPED
+
+_trace_id: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+_parent_span: ContextVar[Optional[str]] = ContextVar("parent_span",
+                                                     default=None)
+
+
+@dataclass
+class Span:
+    """Завершённый участок трассировки.
+
+    Attributes:
+        trace_id (str): ID трассировки.
+        span_id (str): ID участка.
+        parent_id (str | None): ID родительского участка.
+        name (str): название этапа.
+        start (float): время начала (unix time).
+        duration_ms (float): длительность в миллисекундах.
+        attributes (Dict[str, Any]): дополнительные данные.
+    """
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    start: float
+    duration_ms: float
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+class TraceBuffer:
+    """Кольцевой буфер последних трассировок в памяти процесса.
+
+    При переполнении вытесняются самые старые трассировки.
+    Дополнительно участки могут выгружаться в файл (JSON Lines):
+    они ставятся в ограниченную очередь, а сериализация и запись
+    выполняются в отдельном потоке, как у логов. При переполнении
+    очереди участок не выгружается и учитывается в метриках.
+
+    Attributes:
+        size (int): максимальное количество трассировок.
+        max_spans (int): максимальное количество участков
+        в одной трассировке.
+        export_file (str | None): путь к файлу выгрузки.
+    """
+    def __init__(self,
+                 size: int,
+                 max_spans: int,
+                 export_file: Optional[str] = None,
+                 export_queue_size: int = TRACE_EXPORT_QUEUE_SIZE):
+        self.size = size
+        self.max_spans = max_spans
+        self.export_file = export_file
+        self._traces: OrderedDict[str, List[Span]] = OrderedDict()
+        self._export_queue: queue.Queue = queue.Queue(
+            maxsize=export_queue_size
+        )
+        self._writer: Optional[threading.Thread] = None
+
+    def add(self, span: Span) -> None:
+        spans = self._traces.get(span.trace_id)
+        if spans is None:
+            spans = []
+            self._traces[span.trace_id] = spans
+            if len(self._traces) > self.size:
+                self._traces.popitem(last=False)
+        if len(spans) < self.max_spans:
+            spans.append(span)
+        if self.export_file:
+            self._export(span)
+
+    def _export(self, span: Span) -> None:
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_export,
+                                            name="trace-export",
+                                            daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+        try:
+            self._export_queue.put_nowait(span)
+        except queue.Full:
+            TRACE_SPANS_DROPPED.inc()
+
+    def _write_export(self) -> None:
+        with open(self.export_file, "a", encoding="utf-8") as export:
+            while True:
+                span = self._export_queue.get()
+                if span is None:
+                    break
+                export.write(json.dumps(asdict(span),
+                                        ensure_ascii=False) + "\n")
+                if self._export_queue.empty():
+                    export.flush()
+
+    def close(self) -> None:
+        """Дожидается выгрузки участков из очереди и закрывает файл."""
+        if self._writer is None:
+            return None
+        self._export_queue.put(None)
+        self._writer.join()
+        self._writer = None
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        spans = self._traces.get(trace_id)
+        return self._summary(trace_id, spans) if spans else None
+
+    def slowest(self,
+                min_duration_ms: float = 0,
+                limit: int = 20) -> List[Dict[str, Any]]:
+        summaries = [self._summary(trace_id, spans)
+                     for trace_id, spans in list(self._traces.items())]
+        summaries = [s for s in summaries
+                     if s["duration_ms"] >= min_duration_ms]
+        summaries.sort(key=lambda s: s["duration_ms"], reverse=True)
+        return summaries[:limit]
+
+    @staticmethod
+    def _summary(trace_id: str, spans: List[Span]) -> Dict[str, Any]:
+        start = min(s.start for s in spans)
+        end = max(s.start + s.duration_ms / 1000 for s in spans)
+        return {
+            "trace_id": trace_id,
+            "start": start,
+            "duration_ms": round((end - start) * 1000, 3),
+            "spans": [asdict(s) for s in sorted(spans,
+                                                key=lambda s: s.start)],
+        }
+
+
+trace_buffer = TraceBuffer(size=TRACE_BUFFER_SIZE,
+                           max_spans=TRACE_MAX_SPANS,
+                           export_file=TRACE_EXPORT_FILE)
+
+
+def current_trace_id() -> Optional[str]:
+    """Возвращает ID текущей трассировки или None."""
+    return _trace_id.get()
+
+
+def start_trace(trace_id: Optional[str] = None) -> str:
+    """Начинает трассировку в текущем контексте. Дочерние задачи
+    asyncio и фоновые задачи наследуют её через contextvars.
+
+    Args:
+        trace_id (str, optional): внешний ID (например, из заголовка
+        X-Request-ID). По умолчанию генерируется новый.
+
+    Returns:
+        str. ID трассировки.
+    """
+    trace_id = trace_id or uuid4().hex
+    _trace_id.set(trace_id)
+    _parent_span.set(None)
+    return trace_id
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """Измеряет длительность этапа в рамках текущей трассировки.
+    Вне трассировки ничего не записывает.
+
+    Args:
+        name (str): название этапа.
+        attributes: дополнительные данные участка.
+
+    Yields:
+        Dict[str, Any]. Атрибуты участка, которые можно дополнить
+        внутри блока.
+
+    Example:
+        >> with span("db.insert", table="complaints"):
+        >>     await session.execute(query)
+    """
+    trace_id = _trace_id.get()
+    if trace_id is None:
+        yield attributes
+        return
+    span_id = uuid4().hex[:16]
+    parent_id = _parent_span.get()
+    token = _parent_span.set(span_id)
+    start = time.time()
+    started = time.perf_counter()
+    try:
+        yield attributes
+    except BaseException as e:
+        attributes["error"] = type(e).__name__
+        raise
+    finally:
+        _parent_span.reset(token)
+        trace_buffer.add(Span(
+            trace_id=trace_id,
+            span_id=span_id,
+            parent_id=parent_id,
+            name=name,
+            start=start,
+            duration_ms=round((time.perf_counter() - started) * 1000, 3),
+            attributes=attributes,
+        ))
+
+
+class TracingMiddleware:
+    """ASGI middleware, начинающий трассировку для каждого HTTP-запроса.
+
+    ID берётся из заголовка X-Request-ID или генерируется и
+    возвращается клиенту в заголовке X-Trace-ID. Участок HTTP-запроса
+    завершается после отправки тела ответа, а фоновые задачи
+    продолжают ту же трассировку.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        incoming = headers.get(b"x-request-id", b"").decode("latin-1")
+        trace_id = start_trace(incoming[:64] or None)
+        span_id = uuid4().hex[:16]
+        token = _parent_span.set(span_id)
+        start = time.time()
+        started = time.perf_counter()
+        attributes: Dict[str, Any] = {"method": scope["method"],
+                                      "path": scope["path"]}
+        finished = False
+
+        def finish():
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            route = scope.get("route")
+            trace_buffer.add(Span(
+                trace_id=trace_id,
+                span_id=span_id,
+                parent_id=None,
+                name=f"http {scope['method']} "
+                     f"{route.path if route is not None else scope['path']}",
+                start=start,
+                duration_ms=round((time.perf_counter() - started) * 1000, 3),
+                attributes=attributes,
+            ))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                attributes["status"] = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"x-trace-id", trace_id.encode("latin-1"))
+                ]
+            await send(message)
+            if (message["type"] == "http.response.body" and
+                    not message.get("more_body", False)):
+                finish()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
+            _parent_span.reset(token)
@@ -0,0 +1,261 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from settings import (TRENDS_BASELINE_HALF_LIFE,
+                      TRENDS_BUCKET,
+                      TRENDS_MAX_KEYS,
+                      TRENDS_MIN_COUNT,
+                      TRENDS_SPIKE_FACTOR,
+                      TRENDS_WINDOW)
+
+from tools import events
+from tools.metrics import COMPLAINT_SPIKES
+
+logger = logging.getLogger("app.trends")
+
+DIMENSIONS = ("category", "sentiment", "city")
+
+# Значения, не относящиеся к конкретному городу
+_UNKNOWN_VALUES = {None, "", "UNKNOWN"}
+
+
+class SlidingCounter:
+    """Число жалоб с одним значением за скользящее окно.
+
+    Окно состоит из корзин фиксированной ширины в кольцевом буфере:
+    при переходе в новую корзину вычитаются только вышедшие из окна,
+    поэтому обновление занимает O(1) в среднем. Вышедшие из окна
+    корзины обновляют обычную частоту — экспоненциальное скользящее
+    среднее жалоб на корзину, поэтому всплеск в окне не завышает её.
+
+    Attributes:
+        total (int): жалоб за окно.
+        baseline (float): обычное число жалоб на корзину (EWMA).
+        spike (bool): частота сейчас аномально высокая.
+    """
+    __slots__ = ("buckets", "position", "total", "baseline", "spike")
+
+    def __init__(self, size: int, position: int):
+        self.buckets = [0] * size
+        self.position = position
+        self.total = 0
+        self.baseline = 0.0
+        self.spike = False
+
+    def advance(self, position: int, alpha: float) -> None:
+        """Переходит к корзине position, выводя из окна предыдущие.
+
+        Args:
+            position (int): номер текущей корзины.
+            alpha (float): вес вышедшей из окна корзины в EWMA.
+
+        Returns:
+            None.
+        """
+        steps = position - self.position
+        if steps <= 0:
+            return None
+        size = len(self.buckets)
+        for index in range(self.position + 1,
+                           self.position + 1 + min(steps, size)):
+            expired = self.buckets[index % size]
+            self.baseline += alpha * (expired - self.baseline)
+            self.total -= expired
+            self.buckets[index % size] = 0
+        if steps > size:
+            self.baseline *= (1 - alpha) ** (steps - size)
+        self.position = position
+
+    def add(self) -> None:
+        self.buckets[self.position % len(self.buckets)] += 1
+        self.total += 1
+
+
+class TrendDetector:
+    """Определяет всплески жалоб по категории, тональности и городу
+    в потоке обработанных жалоб.
+
+    Для каждого значения хранится SlidingCounter: число жалоб за окно
+    window секунд из корзин по bucket секунд и обычная частота (EWMA
+    с периодом полураспада half_life). Всплеск — не меньше min_count
+    жалоб за окно и больше обычного в factor раз (см. _is_spike()).
+    Начало и конец всплеска логируются и отправляются событиями
+    "complaint.spike" и "complaint.spike_resolved" (их можно передать
+    в вебхуки, см. tools.webhooks). Всплески не определяются первые
+    2 * window секунд после запуска, пока обычная частота не накоплена
+    хотя бы за одно окно. EWMA начинается с нуля, поэтому в первые
+    периоды полураспада занижена: обычная частота делится на
+    1 - (1 - alpha) ** n, где n — число корзин, вышедших из окна
+    с запуска (см. _expected()).
+
+    Счётчики хранятся в памяти процесса, при нескольких воркерах
+    каждый считает свою часть жалоб. Число значений измерения
+    ограничено max_keys: при переполнении вытесняется значение, жалоб
+    с которым дольше всего не было.
+
+    Attributes:
+        window (float): окно подсчёта, с.
+        bucket (float): ширина корзины, с.
+        factor (float): во сколько раз частота выше обычной при всплеске.
+        min_count (int): наименьшее число жалоб за окно при всплеске.
+        max_keys (int): наибольшее число значений измерения.
+    """
+    def __init__(self,
+                 window: float = TRENDS_WINDOW,
+                 bucket: float = TRENDS_BUCKET,
+                 half_life: float = TRENDS_BASELINE_HALF_LIFE,
+                 factor: float = TRENDS_SPIKE_FACTOR,
+                 min_count: int = TRENDS_MIN_COUNT,
+                 max_keys: int = TRENDS_MAX_KEYS):
+        self.bucket = bucket
+        self.size = max(1, round(window / bucket))
+        self.window = self.size * bucket
+        self.alpha = 1 - 0.5 ** (bucket / half_life)
+        self.factor = factor
+        self.min_count = min_count
+        self.max_keys = max_keys
+        self._counters: Dict[str, OrderedDict[str, SlidingCounter]] = {
+            dimension: OrderedDict() for dimension in DIMENSIONS
+        }
+        self._start_position = self._position()
+
+    @property
+    def warm(self) -> bool:
+        return self._expired(self._position()) >= self.size
+
+    def _expired(self, position: int) -> int:
+        """Число корзин, вышедших из окна с запуска, к корзине
+        position."""
+        return position - self._start_position - self.size + 1
+
+    def _position(self) -> int:
+        return int(time.monotonic() // self.bucket)
+
+    def observe(self, category: Optional[str] = None,
+                sentiment: Optional[str] = None,
+                city: Optional[str] = None) -> None:
+        """Учитывает обработанную жалобу.
+
+        Args:
+            category (str, optional): категория.
+            sentiment (str, optional): тональность.
+            city (str, optional): город, "UNKNOWN" не учитывается.
+            Значения по умолчанию классификатора и геолокации передавать
+            не нужно: это не признак всплеска.
+
+        Returns:
+            None.
+        """
+        position = self._position()
+        for dimension, value in zip(DIMENSIONS,
+                                    (category, sentiment, city)):
+            value = getattr(value, "value", value)
+            if value in _UNKNOWN_VALUES:
+                continue
+            counters = self._counters[dimension]
+            counter = counters.pop(value, None)
+            if counter is None:
+                counter = SlidingCounter(self.size, position)
+            counters[value] = counter
+            if len(counters) > self.max_keys:
+                counters.popitem(last=False)
+            counter.advance(position, self.alpha)
+            counter.add()
+            self._evaluate(dimension, value, counter)
+
+    def _is_spike(self, counter: SlidingCounter) -> bool:
+        """Всплеск начинается при factor и min_count, а завершается,
+        только когда частота опустится ниже середины между обычной
+        и пороговой (или число жалоб — ниже min_count / 2), чтобы
+        состояние не переключалось на каждой жалобе у порога."""
+        factor, min_count = self.factor, self.min_count
+        if counter.spike:
+            factor, min_count = (1 + factor) / 2, min_count / 2
+        expected = self._expected(counter)
+        return self.warm and expected is not None and \
+            counter.total >= min_count and counter.total > expected * factor
+
+    def _expected(self, counter: SlidingCounter) -> Optional[float]:
+        """Обычное число жалоб за окно с поправкой на нулевое начальное
+        значение EWMA. Счётчик, созданный позже запуска, считается
+        получавшим пустые корзины с запуска: пустые корзины не меняют
+        нулевую EWMA, поэтому поправка общая.
+
+        Args:
+            counter (SlidingCounter): счётчик значения.
+
+        Returns:
+            float | None. None, пока с запуска из окна не вышло ни одной
+            корзины.
+        """
+        expired = self._expired(counter.position)
+        if expired <= 0:
+            return None
+        correction = 1 - (1 - self.alpha) ** expired
+        return counter.baseline / correction * self.size
+
+    def _evaluate(self, dimension: str, value: str,
+                  counter: SlidingCounter) -> None:
+        spike = self._is_spike(counter)
+        if spike == counter.spike:
+            return None
+        counter.spike = spike
+        payload = {"dimension": dimension, "value": value,
+                   **self._describe(counter)}
+        if spike:
+            COMPLAINT_SPIKES.inc(dimension)
+            logger.warning(f"Complaint spike: {dimension}={value}, "
+                           f"{counter.total} complaints in "
+                           f"{self.window:.0f} s, "
+                           f"{payload['ratio'] or math.inf:.1f}x baseline",
+                           extra=payload)
+            events.emit("complaint.spike", payload)
+        else:
+            logger.info(f"Complaint spike resolved: {dimension}={value}",
+                        extra=payload)
+            events.emit("complaint.spike_resolved", payload)
+
+    def _describe(self, counter: SlidingCounter) -> Dict[str, Any]:
+        minutes = self.window / 60
+        expected = self._expected(counter)
+        return {
+            "count": counter.total,
+            "rate_per_min": round(counter.total / minutes, 3),
+            "baseline_per_min": round(expected / minutes, 3)
+            if expected is not None else None,
+            "ratio": round(counter.total / expected, 2)
+            if expected else None,
+        }
+
+    def snapshot(self, limit: int = 20) -> Dict[str, Any]:
+        """Текущая частота жалоб по значениям измерений. Обновляет
+        счётчики до текущего времени, поэтому закончившиеся всплески
+        завершаются и без новых жалоб.
+
+        Args:
+            limit (int, optional, default=20): наибольшее число значений
+            измерения, по убыванию числа жалоб за окно.
+
+        Returns:
+            Dict[str, Any]. Окно, готовность и значения по измерениям.
+        """
+        position = self._position()
+        result: Dict[str, Any] = {"window_s": self.window, "warm": self.warm}
+        for dimension, counters in self._counters.items():
+            items: List[Dict[str, Any]] = []
+            for value, counter in list(counters.items()):
+                counter.advance(position, self.alpha)
+                self._evaluate(dimension, value, counter)
+                if counter.total or counter.spike:
+                    items.append({"value": value,
+                                  **self._describe(counter),
+                                  "spike": counter.spike})
+            items.sort(key=lambda item: item["count"], reverse=True)
+            result[dimension] = items[:limit]
+        return result
+
+
+trend_detector = TrendDetector()
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("app.warmup")
+
+Stage = Callable[[], Awaitable[Any]]
+
+
+class WarmUp:
+    """Прогрев процесса после запуска: получение IAM-токена, открытие
+    соединений, выполнение основных запросов к базе данных и т.д.
+
+    Этапы выполняются параллельно в фоне, пока приложение уже
+    принимает запросы. Ошибка этапа не мешает готовности: сервис
+    работает и без прогрева, только первые запросы медленнее.
+
+    Attributes:
+        ready (bool): прогрев завершён.
+        timings (Dict[str, float]): длительность этапов, мс.
+    """
+    def __init__(self):
+        self.ready = False
+        self.timings: Dict[str, float] = {}
+        self.failed: List[str] = []
+        self._stages: List[Tuple[str, Stage]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add_stage(self, name: str, stage: Stage) -> None:
+        """Регистрирует этап прогрева.
+
+        Args:
+            name (str): название этапа для логов и /health/ready.
+            stage (Stage): корутинная функция без аргументов.
+
+        Returns:
+            None.
+        """
+        self._stages.append((name, stage))
+
+    async def _run_stage(self, name: str, stage: Stage) -> None:
+        started = time.perf_counter()
+        try:
+            await stage()
+        except Exception as e:
+            self.failed.append(name)
+            logger.warning(f"Warm-up stage {name} failed: {e}")
+        self.timings[name] = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"Warm-up stage {name} took {self.timings[name]} ms",
+                    extra={"stage": name,
+                           "duration_ms": self.timings[name]})
+
+    async def run(self) -> None:
+        started = time.perf_counter()
+        await asyncio.gather(*(self._run_stage(name, stage)
+                               for name, stage in self._stages))
+        self.timings["total"] = round((time.perf_counter() - started)
+                                      * 1000, 1)
+        self.ready = True
+        logger.info(f"Warm-up finished in {self.timings['total']} ms",
+                    extra={"timings": self.timings})
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "status": "ready" if self.ready else "warming_up",
+            "timings_ms": self.timings,
+            "failed": self.failed,
+        }
+
+
+warm_up = WarmUp()
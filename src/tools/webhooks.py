@@ -0,0 +1,446 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+from uuid import uuid4
+
+import aiohttp
+
+from database import async_session_maker
+
+from models.models import WebhookBatchDB
+
+import orjson
+
+from settings import (WEBHOOK_BATCH_SIZE,
+                      WEBHOOK_BATCH_WINDOW,
+                      WEBHOOK_CONCURRENCY,
+                      WEBHOOK_EVENTS,
+                      WEBHOOK_MAX_RETRY_DELAY,
+                      WEBHOOK_RETRY_DELAY,
+                      WEBHOOK_SUBSCRIBERS,
+                      WEBHOOK_TIMEOUT)
+
+from sqlalchemy import delete, func, insert, select, update
+
+from tools import events
+from tools.http import get_session
+from tools.metrics import (WEBHOOK_DELIVERIES,
+                           WEBHOOK_DELIVERY_DURATION,
+                           WEBHOOK_EVENTS_QUEUED)
+
+logger = logging.getLogger("app.webhooks")
+
+_REDELIVER_LIMIT = 100
+
+
+def parse_subscribers(subscribers: str,
+                      concurrency: str = "") -> List["WebhookSubscriber"]:
+    """Разбирает подписчиков вебхуков из строк вида
+    "n8n=http://n8n:5678/webhook/complaints,crm=https://..." и
+    "n8n=4,crm=1" (число одновременных доставок, по умолчанию 1).
+
+    Args:
+        subscribers (str): значение WEBHOOK_SUBSCRIBERS.
+        concurrency (str, optional): значение WEBHOOK_CONCURRENCY.
+
+    Raises:
+        ValueError: если у подписчика нет имени или адреса.
+
+    Returns:
+        List[WebhookSubscriber].
+    """
+    limits = {}
+    for item in concurrency.split(","):
+        name, _, limit = item.partition("=")
+        if name.strip() and limit.strip():
+            limits[name.strip()] = int(limit)
+    result = []
+    for item in subscribers.split(","):
+        if not item.strip():
+            continue
+        name, _, url = item.strip().partition("=")
+        if not name or not url:
+            raise ValueError(f"Invalid webhook subscriber, expected "
+                             f"name=url, got {item!r}")
+        result.append(WebhookSubscriber(name, url, limits.get(name, 1)))
+    return result
+
+
+class WebhookSubscriber:
+    """Получатель событий, например вебхук n8n.
+
+    Attributes:
+        name (str): имя для метрик и хранения пачек.
+        url (str): адрес, на который отправляются пачки.
+        concurrency (int): наибольшее число одновременных доставок.
+    """
+    def __init__(self, name: str, url: str, concurrency: int = 1):
+        self.name = name
+        self.url = url
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.buffer: List[Dict[str, Any]] = []
+        self.first_buffered = 0.0
+        self.pending = 0
+
+    @property
+    def max_pending(self) -> int:
+        return self.concurrency * 2
+
+
+class WebhookDispatcher:
+    """Отправляет события жалоб подписчикам пачками.
+
+    События из tools.events накапливаются в памяти отдельно для каждого
+    подписчика. Пачка отправляется, когда в ней batch_size событий или
+    с первого события прошло window секунд. Перед отправкой пачка
+    записывается в таблицу webhook_outbox и удаляется после ответа 2xx,
+    поэтому при сбое подписчика или перезапуске сервиса события
+    не теряются (кроме ещё не записанных, не больше window секунд).
+    Доставка выполняется через общий пул соединений tools.http, не
+    больше concurrency запросов к подписчику одновременно.
+
+    Недоставленные пачки ведущий процесс отправляет повторно
+    (redeliver()) с экспоненциальной задержкой от retry_delay до
+    max_retry_delay. Доставка «хотя бы один раз»: пачка может прийти
+    повторно, подписчик отличает повторы по заголовку Idempotency-Key
+    с ID пачки.
+
+    Attributes:
+        subscribers (Dict[str, WebhookSubscriber]): подписчики по имени.
+        events (List[str]): отправляемые события.
+        batch_size (int): наибольшее число событий в пачке.
+        window (float): наибольшее время накопления пачки, с.
+        timeout (float): таймаут доставки пачки, с.
+        retry_delay (float): задержка первой повторной доставки, с.
+        max_retry_delay (float): наибольшая задержка повторной
+            доставки, с.
+    """
+    def __init__(self,
+                 subscribers: Iterable[WebhookSubscriber],
+                 events: Iterable[str],
+                 batch_size: int = WEBHOOK_BATCH_SIZE,
+                 window: float = WEBHOOK_BATCH_WINDOW,
+                 timeout: float = WEBHOOK_TIMEOUT,
+                 retry_delay: float = WEBHOOK_RETRY_DELAY,
+                 max_retry_delay: float = WEBHOOK_MAX_RETRY_DELAY):
+        self.subscribers = {subscriber.name: subscriber
+                            for subscriber in subscribers}
+        self.events = [event.strip() for event in events if event.strip()]
+        self.batch_size = batch_size
+        self.window = window
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._deliveries: Set[asyncio.Task] = set()
+
+    @classmethod
+    def from_settings(cls) -> "WebhookDispatcher":
+        return cls(parse_subscribers(WEBHOOK_SUBSCRIBERS, WEBHOOK_CONCURRENCY),
+                   WEBHOOK_EVENTS.split(","))
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.subscribers)
+
+    @property
+    def lease(self) -> timedelta:
+        """Время, на которое пачка закрепляется за отправляющим её
+        процессом: ожидание места у подписчика и сама доставка."""
+        return timedelta(seconds=self.timeout * 4)
+
+    def retry_at(self, attempts: int) -> datetime:
+        """Время следующей доставки пачки после attempts неудачных."""
+        delay = min(self.max_retry_delay, self.retry_delay * 2 ** attempts)
+        return datetime.now(timezone.utc) + timedelta(seconds=delay)
+
+    def start(self) -> None:
+        if not self.configured or self._task is not None:
+            return None
+        for event in self.events:
+            events.subscribe(event, self.handle)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Отписывается от событий, записывает накопленные пачки и
+        ждёт начатые доставки не дольше timeout. Недоставленные пачки
+        остаются в webhook_outbox."""
+        if self._task is None:
+            return None
+        for event in self.events:
+            events.unsubscribe(event, self.handle)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush()
+        if self._deliveries:
+            await asyncio.wait(self._deliveries, timeout=self.timeout)
+
+    def handle(self, event: str, payload: Dict[str, Any]) -> None:
+        """Обработчик событий tools.events: добавляет событие в пачки
+        подписчиков."""
+        item = {"event": event, "payload": payload,
+                "emitted_at": datetime.now(timezone.utc)}
+        for subscriber in self.subscribers.values():
+            if not subscriber.buffer:
+                subscriber.first_buffered = time.monotonic()
+                self._wake.set()
+            subscriber.buffer.append(item)
+            WEBHOOK_EVENTS_QUEUED.inc(subscriber.name)
+            if len(subscriber.buffer) >= self.batch_size:
+                self._wake.set()
+
+    def _next_flush_in(self) -> Optional[float]:
+        deadlines = [subscriber.first_buffered + self.window
+                     for subscriber in self.subscribers.values()
+                     if subscriber.buffer]
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - time.monotonic())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(),
+                                       self._next_flush_in())
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush(due_only=True)
+            except Exception as e:
+                logger.error(f"Webhook batch flush failed: {e}",
+                             extra={"error_type": type(e).__name__})
+                await asyncio.sleep(self.window)
+
+    async def flush(self, due_only: bool = False) -> None:
+        """Записывает накопленные пачки в webhook_outbox и начинает их
+        доставку. События удаляются из буфера только после записи
+        пачки: если запись не удалась, они остаются в буфере до
+        следующего flush().
+
+        Args:
+            due_only (bool, optional, default=False): только полные
+            пачки и пачки, накопленные дольше window.
+
+        Returns:
+            None.
+        """
+        for subscriber in self.subscribers.values():
+            while subscriber.buffer:
+                full = len(subscriber.buffer) >= self.batch_size
+                expired = time.monotonic() - subscriber.first_buffered \
+                    >= self.window
+                if due_only and not (full or expired):
+                    break
+                items = subscriber.buffer[:self.batch_size]
+                await self._enqueue(subscriber, items)
+                # Пока пачка записывалась, handle() мог только дописать
+                # события в конец буфера
+                del subscriber.buffer[:len(items)]
+                if subscriber.buffer:
+                    subscriber.first_buffered = time.monotonic()
+
+    async def _enqueue(self, subscriber: WebhookSubscriber,
+                       items: List[Dict[str, Any]]) -> None:
+        batch_id = uuid4().hex
+        body = orjson.dumps({"batch_id": batch_id,
+                             "subscriber": subscriber.name,
+                             "events": items},
+                            option=orjson.OPT_UTC_Z)
+        deliver = subscriber.pending < subscriber.max_pending
+        now = datetime.now(timezone.utc)
+        async with async_session_maker() as session:
+            result = await session.execute(
+                insert(WebhookBatchDB).values(
+                    subscriber=subscriber.name,
+                    batch_id=batch_id,
+                    body=body,
+                    events=len(items),
+                    next_attempt_at=now + self.lease if deliver else now
+                ).returning(WebhookBatchDB.id)
+            )
+            row_id = result.scalar_one()
+            await session.commit()
+        if not deliver:
+            WEBHOOK_DELIVERIES.inc(subscriber.name, "deferred")
+            return None
+        task = asyncio.create_task(
+            self._deliver(subscriber, row_id, batch_id, body, 0)
+        )
+        self._deliveries.add(task)
+        task.add_done_callback(self._deliveries.discard)
+
+    async def _deliver(self, subscriber: WebhookSubscriber, row_id: int,
+                       batch_id: str, body: bytes, attempts: int) -> bool:
+        """Отправляет пачку подписчику и удаляет её из webhook_outbox
+        или откладывает повторную доставку.
+
+        Returns:
+            bool. True, если пачка доставлена.
+        """
+        subscriber.pending += 1
+        error = None
+        try:
+            async with subscriber.semaphore:
+                started = time.perf_counter()
+                try:
+                    async with get_session().post(
+                            subscriber.url,
+                            data=body,
+                            headers={"Content-Type": "application/json",
+                                     "Idempotency-Key": batch_id},
+                            timeout=aiohttp.ClientTimeout(total=self.timeout)
+                    ) as response:
+                        await response.read()
+                        if response.status >= 300:
+                            error = f"HTTP {response.status}"
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = f"{type(e).__name__}: {e}"
+                WEBHOOK_DELIVERY_DURATION.observe(
+                    time.perf_counter() - started, subscriber.name
+                )
+        finally:
+            subscriber.pending -= 1
+        async with async_session_maker() as session:
+            if error is None:
+                await session.execute(
+                    delete(WebhookBatchDB).where(WebhookBatchDB.id == row_id)
+                )
+            else:
+                await session.execute(
+                    update(WebhookBatchDB).where(
+                        WebhookBatchDB.id == row_id
+                    ).values(attempts=attempts + 1,
+                             last_error=error[:200],
+                             next_attempt_at=self.retry_at(attempts))
+                )
+            await session.commit()
+        if error is None:
+            WEBHOOK_DELIVERIES.inc(subscriber.name, "delivered")
+            return True
+        WEBHOOK_DELIVERIES.inc(subscriber.name, "failed")
+        logger.warning(f"Webhook batch {batch_id} delivery to "
+                       f"{subscriber.name} failed: {error}",
+                       extra={"subscriber": subscriber.name,
+                              "attempts": attempts + 1})
+        return False
+
+    async def redeliver(self) -> None:
+        """Задача ведущего процесса: повторно отправляет пачки, время
+        доставки которых подошло. Каждому подписчику за проход берётся
+        не больше concurrency самых старых пачек, доставки выполняются
+        фоновыми задачами, поэтому медленный подписчик не задерживает
+        другие задачи ведущего. Подписчик, у которого уже max_pending
+        доставок, пропускается до следующего прохода."""
+        if not self.configured:
+            return None
+        names = [name for name, subscriber in self.subscribers.items()
+                 if subscriber.pending < subscriber.max_pending]
+        if not names:
+            return None
+        now = datetime.now(timezone.utc)
+        batches = defaultdict(list)
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(WebhookBatchDB.id,
+                       WebhookBatchDB.subscriber,
+                       WebhookBatchDB.batch_id,
+                       WebhookBatchDB.body,
+                       WebhookBatchDB.attempts)
+                .where(WebhookBatchDB.next_attempt_at <= now,
+                       WebhookBatchDB.subscriber.in_(names))
+                .order_by(WebhookBatchDB.id)
+                .limit(_REDELIVER_LIMIT)
+            )
+            for row in result.all():
+                rows = batches[row.subscriber]
+                if len(rows) < self.subscribers[row.subscriber].concurrency:
+                    rows.append(row)
+            if not batches:
+                return None
+            await session.execute(
+                update(WebhookBatchDB).where(
+                    WebhookBatchDB.id.in_([row.id
+                                           for rows in batches.values()
+                                           for row in rows])
+                ).values(next_attempt_at=now + self.lease)
+            )
+            await session.commit()
+        logger.info(f"Redelivering {sum(map(len, batches.values()))} "
+                    f"webhook batches")
+        for name, rows in batches.items():
+            task = asyncio.create_task(
+                self._redeliver_to(self.subscribers[name], rows)
+            )
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+
+    async def _redeliver_to(self, subscriber: WebhookSubscriber,
+                            rows: list) -> None:
+        """Отправляет подписчику сначала самую старую пачку, остальные —
+        только если она доставлена, чтобы недоступный подписчик
+        не получал запросы на таймаут каждой пачки."""
+        first, rest = rows[0], rows[1:]
+        if await self._deliver(subscriber, first.id, first.batch_id,
+                               first.body, first.attempts):
+            await asyncio.gather(*(
+                self._deliver(subscriber, row.id, row.batch_id,
+                              row.body, row.attempts)
+                for row in rest
+            ))
+        elif rest:
+            async with async_session_maker() as session:
+                await session.execute(
+                    update(WebhookBatchDB).where(
+                        WebhookBatchDB.id.in_([row.id for row in rest])
+                    ).values(next_attempt_at=self.retry_at(first.attempts))
+                )
+                await session.commit()
+
+    async def stats(self) -> Dict[str, Any]:
+        """Накопленные и недоставленные события по подписчикам.
+
+        Returns:
+            Dict[str, Any].
+        """
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(WebhookBatchDB.subscriber,
+                       func.count(WebhookBatchDB.id),
+                       func.sum(WebhookBatchDB.events),
+                       func.max(WebhookBatchDB.attempts),
+                       func.min(WebhookBatchDB.created_at))
+                .group_by(WebhookBatchDB.subscriber)
+            )
+            outbox = {row[0]: row[1:] for row in result.all()}
+        stats = {}
+        for name in {*self.subscribers, *outbox}:
+            subscriber = self.subscribers.get(name)
+            batches, queued, attempts, oldest = outbox.get(
+                name, (0, 0, 0, None)
+            )
+            stats[name] = {
+                "configured": subscriber is not None,
+                "concurrency": subscriber.concurrency if subscriber else 0,
+                "buffered_events": len(subscriber.buffer)
+                if subscriber else 0,
+                "deliveries_in_flight": subscriber.pending
+                if subscriber else 0,
+                "outbox_batches": batches,
+                "outbox_events": queued or 0,
+                "max_attempts": attempts or 0,
+                "oldest_batch_at": oldest,
+            }
+        return stats
+
+
+webhooks = WebhookDispatcher.from_settings()
@@ -1,21 +1,47 @@
 import asyncio
 import logging
-from datetime import datetime, timedelta
-from typing import Any, List
-from typing import Optional
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List
+from typing import Optional, Tuple
 from uuid import uuid4
 
 import aiohttp
 
+import orjson
+
 from pydantic import BaseModel
 
-from settings import (HTTP_CONNECTION_RETRIES,
+from settings import (CLASSIFICATION_CACHE_TTL,
+                      HEDGE_ENABLED,
+                      HTTP_CONNECTION_RETRIES,
                       HTTP_CONNECTION_RETRY_DELAY,
                       HTTP_CONNECTION_TIMEOUT,
                       YA_CLOUD_CATALOG_ID,
-                      YA_CLOUD_OAUTH_TOKEN)
-
-logger = logging.getLogger("app")
+                      YA_CLOUD_CLASSIFY_URL,
+                      YA_CLOUD_COMPLETION_URL,
+                      YA_CLOUD_CREDENTIALS,
+                      YA_CLOUD_IAM_URL,
+                      YA_CLOUD_OAUTH_TOKEN,
+                      YC_CREDENTIAL_COOLDOWN,
+                      YC_TOKEN_EXPIRY_MARGIN,
+                      YC_TOKEN_REFRESH_AHEAD)
+
+from tools.hedging import hedge_policy, hedged
+from tools.http import get_session
+from tools.metrics import (UPSTREAM_CALLS,
+                           UPSTREAM_FALLBACKS,
+                           UPSTREAM_REQUEST_DURATION,
+                           UPSTREAM_RETRIES,
+                           YC_CREDENTIAL_COOLDOWNS,
+                           YC_CREDENTIAL_INFLIGHT,
+                           YC_CREDENTIAL_REQUESTS,
+                           YC_TOKEN_REFRESHES)
+from tools.shared_cache import cache_key, shared_cache
+from tools.tracing import span
+
+logger = logging.getLogger("app.yandex_cloud")
 
 
 class YCIAMToken(BaseModel):
@@ -27,14 +53,45 @@ class YCTokenManager:
     """Управляет OAuth-токенами для API Yandex Cloud.
 
     Автоматически обновляет токены при истечении срока действия.
-    Использует asyncio.Lock для потокобезопасности.
+    Токен хранится в общем кэше, поэтому все воркеры используют один
+    токен: его заранее обновляет ведущий процесс (refresh_if_expiring),
+    остальные обновляют его сами, только если в кэше нет действующего.
+    Использует asyncio.Lock, чтобы параллельные запросы процесса не
+    обновляли токен одновременно.
 
     Attributes:
-        _token (str | None): Текущий IAM-токен (кешируется).
+        oauth_token (str | None): OAuth-токен, по которому выдаётся
+        IAM-токен.
+        _token (YCIAMToken | None): Текущий IAM-токен (кешируется).
         _lock (asyncio.Lock): Блокировка для избежания race condition.
     """
-    def __init__(self):
+    cache_namespace = "yc_iam_token"
+
+    def __init__(self, oauth_token: Optional[str] = YA_CLOUD_OAUTH_TOKEN):
+        self.oauth_token = oauth_token
+        self._cache_key = cache_key(oauth_token or "")
         self._token: Optional[YCIAMToken] = None
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _seconds_left(token: YCIAMToken) -> float:
+        return (token.expires_at - datetime.now(timezone.utc)).total_seconds()
+
+    def _valid_token(self) -> Optional[str]:
+        """Возвращает действующий токен из памяти процесса или общего
+        кэша.
+
+        Returns:
+            str | None. IAM Token или None, если действующего нет.
+        """
+        if (self._token is None or
+                self._seconds_left(self._token) <= YC_TOKEN_EXPIRY_MARGIN):
+            cached = shared_cache.get(self.cache_namespace, self._cache_key)
+            self._token = YCIAMToken(**cached) if cached else None
+        if (self._token is not None and
+                self._seconds_left(self._token) > YC_TOKEN_EXPIRY_MARGIN):
+            return self._token.token
+        return None
 
     async def get_token(self) -> str | None:
         """Получает IAM Token из кэша или делает его обновление при
@@ -44,21 +101,46 @@ class YCTokenManager:
             str | None. Строку с IAM Token в случае его удачного
             получения или None в случае ошибки
         """
-        logger.info("Requested Yandex Cloud IAM Token")
-        if (self._token is None or
-                self._token.expires_at + timedelta(minutes=1) >
-                datetime.now()):
+        logger.debug("Requested Yandex Cloud IAM Token")
+        token = self._valid_token()
+        if token is not None:
+            return token
+        async with self._lock:
+            token = self._valid_token()
+            if token is not None:
+                return token
             try:
                 await self._refresh_token()
+                YC_TOKEN_REFRESHES.inc("success")
                 return self._token.token if self._token else None
             except Exception as e:
+                YC_TOKEN_REFRESHES.inc("failure")
                 logger.info(f"Failed to refresh Yandex Cloud IAM Token: {e}")
                 return None
-        return self._token.token if self._token else None
+
+    async def refresh_if_expiring(self) -> None:
+        """Заранее обновляет токен, если до истечения срока действия
+        осталось меньше YC_TOKEN_REFRESH_AHEAD секунд. Выполняется
+        ведущим процессом.
+
+        Returns:
+            None.
+        """
+        self._valid_token()
+        if (self._token is not None and
+                self._seconds_left(self._token) > YC_TOKEN_REFRESH_AHEAD):
+            return None
+        async with self._lock:
+            try:
+                await self._refresh_token()
+                YC_TOKEN_REFRESHES.inc("success")
+            except Exception as e:
+                YC_TOKEN_REFRESHES.inc("failure")
+                logger.info(f"Failed to refresh Yandex Cloud IAM Token: {e}")
 
     async def _refresh_token(self) -> None:
         """Получает IAM Token на основе OAuth токена и обновляет его
-        в атрибутах класса
+        в атрибутах класса и в общем кэше.
 
         Raises:
             Exception: Если код ответа сервера не 200.
@@ -66,24 +148,215 @@ class YCTokenManager:
         Returns:
             None.
         """
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                    url="https://iam.api.cloud.yandex.net/iam/v1/tokens",
-                    json={
-                        "yandexPassportOauthToken": YA_CLOUD_OAUTH_TOKEN
-                    }
-            ) as response:
-                data = await response.json()
-
-                if response.status != 200:
-                    raise Exception(f"Token refresh failed: {data}")
-
-                exp_at = data["expiresAt"][:26] + 'Z'
-                exp_at = datetime.strptime(exp_at, "%Y-%m-%dT%H:%M:%S.%fZ")
-                self._token = YCIAMToken(
-                    token=data["iamToken"],
-                    expires_at=exp_at
-                )
+        session = get_session()
+        async with session.post(
+                url=YA_CLOUD_IAM_URL,
+                json={
+                    "yandexPassportOauthToken": self.oauth_token
+                }
+        ) as response:
+            data = await response.json()
+
+            if response.status != 200:
+                raise Exception(f"Token refresh failed: {data}")
+
+            exp_at = data["expiresAt"][:26] + 'Z'
+            exp_at = datetime.strptime(
+                exp_at, "%Y-%m-%dT%H:%M:%S.%fZ"
+            ).replace(tzinfo=timezone.utc)
+            self._token = YCIAMToken(
+                token=data["iamToken"],
+                expires_at=exp_at
+            )
+            shared_cache.set(self.cache_namespace, self._cache_key,
+                             self._token.model_dump(mode="json"),
+                             ttl=self._seconds_left(self._token))
+
+    def expires_in(self) -> Optional[float]:
+        """Сколько секунд осталось до истечения текущего токена.
+
+        Returns:
+            float | None. None, если токена нет.
+        """
+        self._valid_token()
+        return self._seconds_left(self._token) if self._token else None
+
+
+def parse_credentials(value: str) -> List[Tuple[str, str]]:
+    """Разбирает пул учётных данных Yandex Cloud из строки вида
+    "oauth_token:catalog_id,oauth_token:catalog_id".
+
+    Args:
+        value (str): значение YA_CLOUD_CREDENTIALS.
+
+    Raises:
+        ValueError: если в элементе нет OAuth-токена или каталога.
+
+    Returns:
+        List[Tuple[str, str]]. Пары OAuth-токен и ID каталога.
+    """
+    credentials = []
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        oauth_token, _, catalog_id = item.strip().partition(":")
+        if not oauth_token or not catalog_id:
+            raise ValueError(f"Invalid Yandex Cloud credential, expected "
+                             f"oauth_token:catalog_id, got {item!r}")
+        credentials.append((oauth_token, catalog_id))
+    return credentials
+
+
+class YCCredential:
+    """Учётные данные Yandex Cloud: OAuth-токен со своим IAM-токеном
+    и каталог, лимиты запросов которого используются.
+
+    Attributes:
+        name (str): имя для метрик и статистики — ID каталога.
+        catalog_id (str | None): ID каталога.
+        tokens (YCTokenManager): IAM-токен учётных данных.
+        inflight (int): число выполняемых запросов.
+        cooldown_until (float): до какого момента (time.monotonic())
+        учётные данные не выбираются после ответа 429.
+        requests (int): число выполненных запросов.
+        throttled (int): число ответов 429.
+    """
+    def __init__(self, name: str, oauth_token: Optional[str],
+                 catalog_id: Optional[str]):
+        self.name = name
+        self.catalog_id = catalog_id
+        self.tokens = YCTokenManager(oauth_token)
+        self.inflight = 0
+        self.cooldown_until = 0.0
+        self.requests = 0
+        self.throttled = 0
+
+    def cooldown_left(self) -> float:
+        return max(0.0, self.cooldown_until - time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        expires_in = self.tokens.expires_in()
+        return {
+            "name": self.name,
+            "catalog_id": self.catalog_id,
+            "inflight": self.inflight,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "cooldown_s": round(self.cooldown_left(), 1),
+            "token_expires_in_s": round(expires_in)
+            if expires_in is not None else None,
+        }
+
+
+class YCCredentialPool:
+    """Распределяет запросы к Yandex Cloud между несколькими учётными
+    данными и каталогами, чтобы суммировать их лимиты.
+
+    Запрос получает учётные данные с наименьшим числом выполняемых
+    запросов, при равенстве — с наименьшим числом запросов всего.
+    Учётные данные, получившие ответ 429, не выбираются cooldown секунд
+    (или столько, сколько указано в Retry-After); если остывают все,
+    выбираются те, что освободятся раньше.
+
+    Attributes:
+        credentials (List[YCCredential]): учётные данные.
+        cooldown (float): время остывания после ответа 429, с.
+    """
+    def __init__(self, credentials: List[YCCredential],
+                 cooldown: float = YC_CREDENTIAL_COOLDOWN):
+        self.credentials = credentials
+        self.cooldown = cooldown
+
+    @classmethod
+    def from_settings(cls) -> "YCCredentialPool":
+        """Пул из YA_CLOUD_CREDENTIALS, а если он не задан — из
+        YA_CLOUD_OAUTH_TOKEN и YA_CLOUD_CATALOG_ID.
+
+        Returns:
+            YCCredentialPool.
+        """
+        pairs = parse_credentials(YA_CLOUD_CREDENTIALS) or \
+            [(YA_CLOUD_OAUTH_TOKEN, YA_CLOUD_CATALOG_ID)]
+        credentials = []
+        for oauth_token, catalog_id in pairs:
+            name = catalog_id or "default"
+            if any(credential.name == name for credential in credentials):
+                name = f"{name}-{len(credentials) + 1}"
+            credentials.append(YCCredential(name, oauth_token, catalog_id))
+        return cls(credentials)
+
+    @property
+    def configured(self) -> bool:
+        return any(credential.tokens.oauth_token
+                   for credential in self.credentials)
+
+    def pick(self) -> YCCredential:
+        return min(self.credentials,
+                   key=lambda credential: (credential.cooldown_left(),
+                                           credential.inflight,
+                                           credential.requests))
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[YCCredential]:
+        """Выбирает учётные данные на время запроса.
+
+        Yields:
+            YCCredential.
+        """
+        credential = self.pick()
+        credential.inflight += 1
+        YC_CREDENTIAL_INFLIGHT.set(credential.inflight, credential.name)
+        try:
+            yield credential
+        finally:
+            credential.inflight -= 1
+            YC_CREDENTIAL_INFLIGHT.set(credential.inflight, credential.name)
+
+    def record(self, credential: YCCredential, outcome: str,
+               retry_after: Optional[str] = None) -> None:
+        """Учитывает результат запроса. После ответа 429 учётные данные
+        остывают.
+
+        Args:
+            credential (YCCredential): учётные данные запроса.
+            outcome (str): код ответа или тип ошибки.
+            retry_after (str, optional): заголовок Retry-After ответа.
+
+        Returns:
+            None.
+        """
+        credential.requests += 1
+        YC_CREDENTIAL_REQUESTS.inc(credential.name, outcome)
+        if outcome != "429":
+            return None
+        try:
+            cooldown = float(retry_after)
+        except (TypeError, ValueError):
+            cooldown = self.cooldown
+        credential.throttled += 1
+        credential.cooldown_until = time.monotonic() + cooldown
+        YC_CREDENTIAL_COOLDOWNS.inc(credential.name)
+        logger.warning(f"Yandex Cloud credential {credential.name} "
+                       f"throttled, cooling down for {cooldown:.1f} s")
+
+    async def get_tokens(self) -> None:
+        """Получает IAM-токены всех учётных данных (прогрев)."""
+        await asyncio.gather(*(credential.tokens.get_token()
+                               for credential in self.credentials))
+
+    async def refresh_if_expiring(self) -> None:
+        """Заранее обновляет истекающие IAM-токены всех учётных данных.
+        Выполняется ведущим процессом."""
+        await asyncio.gather(*(credential.tokens.refresh_if_expiring()
+                               for credential in self.credentials))
+
+    def available(self) -> bool:
+        """Есть ли учётные данные, которые не остывают после 429."""
+        return any(not credential.cooldown_left()
+                   for credential in self.credentials)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [credential.stats() for credential in self.credentials]
 
 
 class YandexCloudClassifier:
@@ -102,6 +375,7 @@ class YandexCloudClassifier:
         last_error (Exception | str | None): последняя ошибка для
         логов
         data (dict[str, Any] | None): JSON, полученный в сервера
+        fell_back (bool): возвращено значение по умолчанию
     """
     input_text: str
     task_description: str
@@ -111,6 +385,7 @@ class YandexCloudClassifier:
     request_id: str
     last_error: Exception | str | None
     data: dict[str, Any] | None
+    fell_back: bool
 
     def __init__(self,
                  input_text: str,
@@ -143,6 +418,7 @@ class YandexCloudClassifier:
         self.request_id = str(uuid4())
         self.last_error: Exception | str | None = None
         self.data = None
+        self.fell_back = False
 
     def _log(self,
              message: str,
@@ -173,6 +449,56 @@ class YandexCloudClassifier:
         )
         return None
 
+    def _observe(self, started: float, outcome: str) -> None:
+        """
+        Учитывает время одной попытки запроса в метриках.
+
+        Args:
+            started (float): время начала попытки (time.perf_counter()).
+            outcome (str): код ответа или тип ошибки.
+
+        Returns:
+            None
+        """
+        UPSTREAM_REQUEST_DURATION.observe(time.perf_counter() - started,
+                                          "yandex_cloud",
+                                          self.action,
+                                          outcome)
+
+    def _fallback(self) -> str:
+        """
+        Учитывает возврат значения по умолчанию в метриках.
+
+        Returns:
+            str. Значение по умолчанию
+        """
+        UPSTREAM_FALLBACKS.inc("yandex_cloud", self.action)
+        self.fell_back = True
+        return self.default_value
+
+    def _request_url(self) -> str:
+        return YA_CLOUD_CLASSIFY_URL
+
+    def _request_body(self, catalog_id: Optional[str]) -> dict[str, Any]:
+        """
+        Формирует тело запроса к YandexCloudAPI.
+
+        Args:
+            catalog_id (str | None): ID каталога учётных данных запроса.
+
+        Returns:
+            dict[str, Any]. JSON запроса.
+        """
+        return {
+            "modelUri": f"cls://{catalog_id}/yandexgpt-lite/latest",
+            "taskDescription": self.task_description,
+            "labels": self.choices,
+            "text": self.input_text
+        }
+
+    def _has_result(self) -> bool:
+        return bool(self.data.get("predictions"))
+
     def _process_success(self) -> str:
         """
         Обрабатывает ответ YandexCloudAPI.
@@ -194,14 +520,16 @@ class YandexCloudClassifier:
             self._log(f"Classifying failed. "
                       f"Returned '{self.default_value}'",
                       logging.DEBUG)
-            return self.default_value
+            return self._fallback()
 
-    def _process_error(self, status_code: int) -> bool:
+    def _process_error(self, status_code: int,
+                       credential: "YCCredential") -> bool:
         """
         Обрабатывает неуспешные коды ошибок от YandexCloudAPI.
 
         Args:
             status_code (int): код, который вернул YandexCloudAPI.
+            credential (YCCredential): учётные данные запроса.
 
         Returns:
             Bool. True если необходимо выполнить ещё одну попытку
@@ -225,7 +553,7 @@ class YandexCloudClassifier:
         elif status_code == 403:
             if log_params.get("message") is None:
                 log_params["message"] = (f"Access to catalog id "
-                                         f"{YA_CLOUD_CATALOG_ID} "
+                                         f"{credential.catalog_id} "
                                          f"forbidden")
         elif status_code == 404:
             log_params["level"] = logging.CRITICAL
@@ -242,7 +570,101 @@ class YandexCloudClassifier:
         self.last_error = log_params["message"]
         return need_retry
 
-    async def y_cloud_classify_text(self) -> str:
+    async def y_cloud_classify_text(self) -> Any:
+        """
+        Классифицирует текст на одну из категорий, записывая этап
+        в текущую трассировку. Результаты для одинаковых текста, промта
+        и вариантов берутся из общего кэша воркеров, значения по
+        умолчанию не кэшируются.
+
+        Returns:
+            Any. Одно из значений, перечисленных в choices или default,
+            для YandexCloudMultiLabelClassifier — словарь значений меток
+        """
+        with span(f"yandex_cloud.{self.action}") as attributes:
+            key = cache_key(self.action, self.task_description,
+                            *self.choices, self.input_text)
+            result = shared_cache.get("classification", key)
+            attributes["cached"] = result is not None
+            if result is None:
+                result = await self._classify_text()
+                if not self.fell_back:
+                    shared_cache.set("classification", key, result,
+                                     ttl=CLASSIFICATION_CACHE_TTL)
+            attributes["result"] = result
+            return result
+
+    async def _post(
+            self
+    ) -> Optional[Tuple["YCCredential", int, dict[str, Any]]]:
+        """
+        Выполняет одну попытку HTTP-запроса к YandexCloudAPI
+        с учётными данными из пула yc_credentials и учитывает её
+        в метриках. Учётные данные возвращаются с ответом, а не
+        сохраняются в объекте: при дублировании запроса попытки
+        выполняются одновременно с разными учётными данными.
+
+        Returns:
+            Tuple[YCCredential, int, dict[str, Any]] | None. Учётные
+            данные, код ответа и JSON ответа или None, если не удалось
+            получить IAM Token
+        """
+        async with yc_credentials.acquire() as credential:
+            yc_iam_token = await credential.tokens.get_token()
+            if yc_iam_token is None:
+                return None
+            started = time.perf_counter()
+            try:
+                async with get_session().post(
+                        url=self._request_url(),
+                        headers={
+                            "Authorization": f'Bearer '
+                                             f'{yc_iam_token}',
+                            "Content-Type": "application/json"
+                        },
+                        json=self._request_body(credential.catalog_id),
+                        timeout=aiohttp.ClientTimeout(
+                            total=HTTP_CONNECTION_TIMEOUT
+                        )
+                ) as response:
+                    data = await response.json()
+            except aiohttp.ClientError as e:
+                self._observe(started, type(e).__name__)
+                yc_credentials.record(credential, type(e).__name__)
+                raise
+            except asyncio.TimeoutError:
+                self._observe(started, "timeout")
+                yc_credentials.record(credential, "timeout")
+                raise
+            except asyncio.CancelledError:
+                self._observe(started, "cancelled")
+                raise
+            self._observe(started, str(response.status))
+            yc_credentials.record(credential, str(response.status),
+                                  response.headers.get("Retry-After"))
+            return credential, response.status, data
+
+    async def _send(
+            self
+    ) -> Optional[Tuple["YCCredential", int, dict[str, Any]]]:
+        """
+        Отправляет запрос к YandexCloudAPI. При HEDGE_ENABLED запрос,
+        не получивший ответа за обычное для действия время, дублируется
+        (см. tools.hedging), дубль получает свои учётные данные из пула.
+
+        Returns:
+            Tuple[YCCredential, int, dict[str, Any]] | None. Учётные
+            данные, код ответа и JSON ответа успевшей попытки или None,
+            если не удалось получить IAM Token
+        """
+        if not HEDGE_ENABLED:
+            return await self._post()
+        return await hedged(hedge_policy("yandex_cloud", self.action),
+                            self._post,
+                            lambda result: result is not None and
+                            result[1] == 200)
+
+    async def _classify_text(self) -> str:
         """
         Выполняет HTTP-запрос к серверу YandexCloud с целью
         классификации текста на одну из категорий.
@@ -250,92 +672,206 @@ class YandexCloudClassifier:
         Returns:
             str. Одно из значений, перечисленных в choices или default
         """
-        async with (aiohttp.ClientSession() as session):
-            for attempt in range(1, HTTP_CONNECTION_RETRIES + 1):
-                try:
-                    self._log(f"Attempt {attempt}/"
-                              f"{HTTP_CONNECTION_RETRIES}")
-                    yc_iam_token = await yc_token_manager.get_token()
-                    if yc_iam_token is None:
-                        continue
-                    async with session.post(
-                            url="https://llm.api.cloud.yandex.net/"
-                                "foundationModels/v1/"
-                                "fewShotTextClassification",
-                            headers={
-                                "Authorization": f'Bearer '
-                                                 f'{yc_iam_token}',
-                                "Content-Type": "application/json"
-                            },
-                            json={
-                                "modelUri": f"cls://"
-                                            f"{YA_CLOUD_CATALOG_ID}/"
-                                            f"yandexgpt-lite/latest",
-                                "taskDescription": self.task_description,
-                                "labels": self.choices,
-                                "text": self.input_text
-                            },
-                            timeout=aiohttp.ClientTimeout(
-                                total=HTTP_CONNECTION_TIMEOUT
-                            )
-                    ) as response:
-                        self.data = await response.json()
-                        self._log("Request succeeded",
-                                  logging.DEBUG,
-                                  status=response.status,
-                                  response_size=len(str(self.data)))
-                        if (response.status == 200 and
-                                self.data.get("predictions") is not None and
-                                self.data["predictions"]):
-                            return self._process_success()
-                        if self._process_error(response.status):
-                            if attempt < HTTP_CONNECTION_RETRIES:
-                                await asyncio.sleep(
-                                    HTTP_CONNECTION_RETRY_DELAY *
-                                    attempt
-                                )
-                            continue
-                        return self.default_value
-
-                except aiohttp.ClientError as e:
-                    self.last_error = e
-                    self._log(f"Request failed "
-                              f"(attempt {attempt}): {str(e)}",
-                              logging.WARNING,
-                              error_type=type(e).__name__)
-                    if attempt < HTTP_CONNECTION_RETRIES:
-                        await asyncio.sleep(
-                            HTTP_CONNECTION_RETRY_DELAY * attempt
-                        )
+        UPSTREAM_CALLS.inc("yandex_cloud", self.action)
+        for attempt in range(1, HTTP_CONNECTION_RETRIES + 1):
+            try:
+                self._log(f"Attempt {attempt}/"
+                          f"{HTTP_CONNECTION_RETRIES}")
+                if attempt > 1:
+                    UPSTREAM_RETRIES.inc("yandex_cloud", self.action)
+                result = await self._send()
+                if result is None:
                     continue
-
-                except asyncio.TimeoutError:
-                    self.last_error = "Timeout exceeded"
-                    self._log("Timeout exceeded",
-                              logging.ERROR,
-                              timeout=HTTP_CONNECTION_RETRY_DELAY * attempt)
-                    if attempt < HTTP_CONNECTION_RETRIES:
+                credential, status, self.data = result
+                self._log("Request succeeded",
+                          logging.DEBUG,
+                          status=status,
+                          credential=credential.name,
+                          response_size=len(str(self.data)))
+                if status == 200 and self._has_result():
+                    return self._process_success()
+                if self._process_error(status, credential):
+                    # После 429 повтор уходит на другие учётные данные
+                    # пула без паузы, если они не остывают
+                    switch_credential = (status == 429 and
+                                         yc_credentials.available())
+                    if attempt < HTTP_CONNECTION_RETRIES and \
+                            not switch_credential:
                         await asyncio.sleep(
-                            HTTP_CONNECTION_RETRY_DELAY * attempt
+                            HTTP_CONNECTION_RETRY_DELAY *
+                            attempt
                         )
                     continue
-
-                except Exception as e:
-                    self._log(
-                        message="Unexpected error. Returned default value",
-                        level=logging.ERROR,
-                        error=str(e),
-                        error_type=type(e).__name__,
-                        traceback=True
+                return self._fallback()
+
+            except aiohttp.ClientError as e:
+                self.last_error = e
+                self._log(f"Request failed "
+                          f"(attempt {attempt}): {str(e)}",
+                          logging.WARNING,
+                          error_type=type(e).__name__)
+                if attempt < HTTP_CONNECTION_RETRIES:
+                    await asyncio.sleep(
+                        HTTP_CONNECTION_RETRY_DELAY * attempt
                     )
-                    return self.default_value
+                continue
+
+            except asyncio.TimeoutError:
+                self.last_error = "Timeout exceeded"
+                self._log("Timeout exceeded",
+                          logging.ERROR,
+                          timeout=HTTP_CONNECTION_RETRY_DELAY * attempt)
+                if attempt < HTTP_CONNECTION_RETRIES:
+                    await asyncio.sleep(
+                        HTTP_CONNECTION_RETRY_DELAY * attempt
+                    )
+                continue
+
+            except Exception as e:
+                self._log(
+                    message="Unexpected error. Returned default value",
+                    level=logging.ERROR,
+                    error=str(e),
+                    error_type=type(e).__name__,
+                    traceback=True
+                )
+                return self._fallback()
+
+        self._log(f"Max retries "
+                  f"({HTTP_CONNECTION_RETRIES}) exceeded. "
+                  f"Last error: {str(self.last_error)}. "
+                  f"Returned default value",
+                  logging.WARNING)
+        return self._fallback()
+
+
+class YandexCloudMultiLabelClassifier(YandexCloudClassifier):
+    """Определяет несколько меток текста одним запросом к модели
+    генерации YandexGPT со структурированным ответом (JSON Schema)
+    вместо отдельного запроса fewShotTextClassification на каждую.
+
+    Ответ модели разбирается строго: это должен быть JSON-объект,
+    значение каждой метки — одно из допустимых. Для метки с
+    отсутствующим или недопустимым значением возвращается её значение
+    по умолчанию, остальные метки сохраняются.
+
+    Attributes:
+        labels (Dict[str, List[str]]): допустимые значения каждой
+        метки.
+        default_value (Dict[str, str]): значения меток по умолчанию.
+        fallback_labels (List[str]): метки, для которых возвращено
+        значение по умолчанию.
+    """
+    labels: Dict[str, List[str]]
+    default_value: Dict[str, str]
+    fallback_labels: List[str]
+
+    def __init__(self,
+                 input_text: str,
+                 task_description: str,
+                 labels: Dict[str, List[str]],
+                 default_value: Dict[str, str],
+                 action: str = "yc_multi_label_classification",
+                 ):
+        """Инициирует класс для последующей обработки.
+
+        Args:
+            input_text (str): текст, который необходимо
+            классифицировать.
+            task_description (str): промт, описывающий задачу.
+            labels (Dict[str, List[str]]): допустимые значения каждой
+            метки.
+            default_value (Dict[str, str]): значения меток по
+            умолчанию.
+            action (str, optional,
+            default="yc_multi_label_classification"): какое действие
+            выполняется для логирования
+        """
+        super().__init__(
+            input_text=input_text,
+            task_description=task_description,
+            choices=[f"{name}={'|'.join(values)}"
+                     for name, values in labels.items()],
+            default_value=default_value,
+            action=action,
+        )
+        self.labels = labels
+        self.fallback_labels = []
+
+    def _fallback(self) -> Dict[str, str]:
+        UPSTREAM_FALLBACKS.inc("yandex_cloud", self.action)
+        self.fell_back = True
+        self.fallback_labels = list(self.labels)
+        return dict(self.default_value)
+
+    def _request_url(self) -> str:
+        return YA_CLOUD_COMPLETION_URL
+
+    def _request_body(self, catalog_id: Optional[str]) -> dict[str, Any]:
+        return {
+            "modelUri": f"gpt://{catalog_id}/yandexgpt-lite/latest",
+            "completionOptions": {
+                "stream": False,
+                "temperature": 0,
+                "maxTokens": "100"
+            },
+            "messages": [
+                {"role": "system", "text": self.task_description},
+                {"role": "user", "text": self.input_text},
+            ],
+            "jsonSchema": {"schema": {
+                "type": "object",
+                "properties": {name: {"type": "string", "enum": values}
+                               for name, values in self.labels.items()},
+                "required": list(self.labels),
+                "additionalProperties": False,
+            }},
+        }
+
+    def _has_result(self) -> bool:
+        return bool((self.data.get("result") or {}).get("alternatives"))
+
+    def _process_success(self) -> Dict[str, str]:
+        """
+        Разбирает JSON-объект из ответа модели и проверяет значения
+        меток.
 
-            self._log(f"Max retries "
-                      f"({HTTP_CONNECTION_RETRIES}) exceeded. "
-                      f"Last error: {str(self.last_error)}. "
-                      f"Returned default value",
+        Returns:
+            Dict[str, str]. Значения всех меток, недопустимые заменены
+            значениями по умолчанию.
+        """
+        text = self.data["result"]["alternatives"][0]["message"]["text"]
+        text = text.strip().removeprefix("```json").strip("`").strip()
+        try:
+            values = orjson.loads(text)
+        except orjson.JSONDecodeError:
+            values = None
+        if not isinstance(values, dict):
+            self._log("Classifying failed: response is not a JSON object. "
+                      "Returned default values",
+                      logging.WARNING,
+                      response_text=text[:200])
+            return self._fallback()
+        result = {}
+        invalid = []
+        for name, choices in self.labels.items():
+            value = values.get(name)
+            if isinstance(value, str) and value.strip().lower() in choices:
+                result[name] = value.strip().lower()
+            else:
+                result[name] = self.default_value[name]
+                invalid.append(name)
+        if invalid:
+            self._log(f"Classifying partially failed, default values for "
+                      f"{', '.join(invalid)}",
                       logging.WARNING)
-            return self.default_value
+            UPSTREAM_FALLBACKS.inc("yandex_cloud", self.action)
+            self.fell_back = True
+            self.fallback_labels = invalid
+        else:
+            self._log(f"Classifying succeeded. Returned {result}",
+                      logging.DEBUG)
+        return result
 
 
-yc_token_manager = YCTokenManager()
+yc_credentials = YCCredentialPool.from_settings()
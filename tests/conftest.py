@@ -0,0 +1,58 @@
+"""Общие фикстуры тестов.
+
+Модули приложения читают настройки при импорте, поэтому окружение
+(временный каталог с базой данных и адреса заглушек внешних сервисов
+из benchmarks.stubs) задаётся до их импорта. Запуск из корня
+репозитория: ``python -m pytest``.
+"""
+import os
+import socket
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks._common import prepare_environment  # noqa: E402
+from benchmarks.stubs import (StubState,  # noqa: E402
+                              start_stub_server,
+                              upstream_env)
+
+import pytest_asyncio  # noqa: E402
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+STUB_PORT = _free_port()
+
+prepare_environment()
+os.environ.update(upstream_env(f"http://127.0.0.1:{STUB_PORT}"))
+os.environ.update({"HTTP_CONNECTION_RETRIES": "2",
+                   "HTTP_CONNECTION_RETRY_DELAY": "0",
+                   "HEDGE_ENABLED": "false",
+                   "LOG_LEVEL": "WARNING"})
+
+
+@pytest_asyncio.fixture
+async def stubs():
+    """Заглушки внешних сервисов без задержек и сбоев.
+
+    Yields:
+        StubState. Настройки и счётчики заглушек.
+    """
+    from tools.http import close_session
+
+    state = StubState()
+    for config in state.configs.values():
+        config.update({"latency_ms": 1, "latency_sigma": 0})
+    runner, _ = await start_stub_server(state, port=STUB_PORT)
+    try:
+        yield state
+    finally:
+        await close_session()
+        await runner.cleanup()
@@ -0,0 +1,64 @@
+"""Создание жалобы при CLASSIFIER_MODE=combined: спам, тональность
+и категория определяются одним запросом к заглушке completion."""
+import json
+from uuid import uuid4
+
+from benchmarks._common import InProcessClient, create_schema
+
+from database import async_session_maker
+
+from models.models import ComplaintDB
+
+import pytest
+
+import routers.complaint
+
+import tools.complaint
+
+
+@pytest.fixture
+async def client(stubs, monkeypatch):
+    from app import app
+
+    monkeypatch.setattr(routers.complaint, "CLASSIFIER_MODE", "combined")
+    monkeypatch.setattr(tools.complaint, "CLASSIFIER_MODE", "combined")
+    await create_schema()
+    return InProcessClient(app)
+
+
+async def create(client: InProcessClient, output: dict, stubs):
+    stubs.configs["completion"].update({
+        "output_text": json.dumps(output, ensure_ascii=False)
+    })
+    status, body = await client.request(
+        "POST", "/api/v1/complaint/",
+        json={"text": f"Не проходит оплата картой {uuid4().hex}"}
+    )
+    assert status == 201, body
+    await client.drain()
+    async with async_session_maker() as session:
+        return await session.get(ComplaintDB, json.loads(body)["id"])
+
+
+@pytest.mark.parametrize("output", [
+    {"spam": "не спам", "sentiment": "negative", "category": "оплата"},
+    # Частичный fallback не кэшируется: без передачи меток фоновая
+    # обработка повторила бы запрос
+    {"spam": "возможно", "sentiment": "negative", "category": "оплата"},
+])
+async def test_one_upstream_call_per_complaint(client, stubs, output):
+    complaint = await create(client, output, stubs)
+
+    assert stubs.counters["completion"]["200"] == 1
+    assert complaint.sentiment.value == "negative"
+    assert complaint.category.value == "оплата"
+    assert complaint.labels_model == "remote"
+
+
+async def test_label_fallback_marked(client, stubs):
+    complaint = await create(client, {"spam": "не спам",
+                                      "sentiment": "negative"}, stubs)
+
+    assert stubs.counters["completion"]["200"] == 1
+    assert complaint.category.value == "другое"
+    assert complaint.labels_model == "fallback"
@@ -0,0 +1,72 @@
+"""Повторы запроса с Idempotency-Key в разных воркерах: два экземпляра
+IdempotencyMiddleware с общим кэшем."""
+import asyncio
+from uuid import uuid4
+
+from tools.idempotency import IdempotencyMiddleware
+
+ROUTE = ("POST", "/api/v1/complaint/")
+
+
+class SlowApp:
+    """Приложение, отвечающее 201 через delay секунд."""
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        await receive()
+        await asyncio.sleep(self.delay)
+        await send({"type": "http.response.start", "status": 201,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b'{"id": 1}'})
+
+
+async def request(worker: IdempotencyMiddleware, key: str):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b'{"text": "x"}',
+                "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": ROUTE[0], "path": ROUTE[1],
+             "headers": [(b"idempotency-key", key.encode())]}
+    await worker(scope, receive, send)
+    return messages[0]["status"], dict(messages[0]["headers"])
+
+
+def workers(app: SlowApp, lock_ttl: float):
+    return [IdempotencyMiddleware(app, {ROUTE: "create"}, lock_ttl=lock_ttl)
+            for _ in range(2)]
+
+
+async def test_lock_renewed_while_original_runs():
+    app = SlowApp(delay=1.2)
+    first_worker, second_worker = workers(app, lock_ttl=0.3)
+    key = uuid4().hex
+
+    original = asyncio.create_task(request(first_worker, key))
+    # Повтор приходит в другой воркер позже начального lock_ttl
+    await asyncio.sleep(0.6)
+    status, _ = await request(second_worker, key)
+
+    assert status == 409
+    assert (await original)[0] == 201
+    assert app.calls == 1
+
+
+async def test_retry_in_other_worker_replays_response():
+    app = SlowApp(delay=0.5)
+    first_worker, second_worker = workers(app, lock_ttl=0.2)
+    key = uuid4().hex
+
+    await request(first_worker, key)
+    status, headers = await request(second_worker, key)
+
+    assert status == 201
+    assert headers[b"idempotent-replayed"] == b"true"
+    assert app.calls == 1
@@ -0,0 +1,172 @@
+"""Разбор ответов YandexCloudMultiLabelClassifier на заглушке completion
+из benchmarks.stubs."""
+import json
+from uuid import uuid4
+
+import pytest
+
+from tools.complaint import complaint_labels_classifier
+from tools.metrics import UPSTREAM_FALLBACKS
+
+DEFAULTS = {"spam": "не спам", "sentiment": "unknown", "category": "другое"}
+
+
+def classifier(text: str = "Не проходит оплата картой"):
+    # Уникальный текст: результаты классификации кэшируются по тексту
+    return complaint_labels_classifier(f"{text} {uuid4().hex}")
+
+
+def output(**labels: str) -> str:
+    return json.dumps(labels, ensure_ascii=False)
+
+
+def fallbacks() -> float:
+    return UPSTREAM_FALLBACKS.get("yandex_cloud", "classify_complaint")
+
+
+async def test_valid_output(stubs):
+    ycc = classifier()
+
+    result = await ycc.y_cloud_classify_text()
+
+    assert set(result) == set(ycc.labels)
+    for name, value in result.items():
+        assert value in ycc.labels[name]
+    assert result["spam"] == "не спам"
+    assert not ycc.fell_back
+    assert ycc.fallback_labels == []
+
+
+async def test_spam_detected(stubs):
+    ycc = classifier("Реклама: лучшие кредиты")
+
+    result = await ycc.y_cloud_classify_text()
+
+    assert result["spam"] == "спам"
+
+
+async def test_valid_output_normalized(stubs):
+    stubs.configs["completion"].update({"output_text": "```json\n" + output(
+        spam="Не спам", sentiment=" negative ", category="ОПЛАТА"
+    ) + "\n```"})
+    ycc = classifier()
+
+    result = await ycc.y_cloud_classify_text()
+
+    assert result == {"spam": "не спам", "sentiment": "negative",
+                      "category": "оплата"}
+    assert not ycc.fell_back
+
+
+@pytest.mark.parametrize("text", [
+    "Не могу определить категорию",
+    '{"spam": "не спам", "sentiment": ',
+    '["не спам", "negative", "оплата"]',
+    "   ",
+])
+async def test_not_json_object_falls_back(stubs, text):
+    stubs.configs["completion"].update({"output_text": text})
+    ycc = classifier()
+    before = fallbacks()
+
+    result = await ycc.y_cloud_classify_text()
+
+    assert result == DEFAULTS
+    assert ycc.fell_back
+    assert ycc.fallback_labels == list(DEFAULTS)
+    assert fallbacks() == before + 1
+
+
+async def test_missing_label_falls_back_alone(stubs):
+    stubs.configs["completion"].update({"output_text": output(
+        spam="не спам", sentiment="negative"
+    )})
+    ycc = classifier()
+
+    result = await ycc.y_cloud_classify_text()
+
+    assert result == {"spam": "не спам", "sentiment": "negative",
+                      "category": "другое"}
+    assert ycc.fell_back
+    assert ycc.fallback_labels == ["category"]
+
+
+@pytest.mark.parametrize("value", ["злой", "", None, 1, ["negative"]])
+async def test_invalid_label_value_falls_back_alone(stubs, value):
+    stubs.configs["completion"].update({"output_text": json.dumps(
+        {"spam": "не спам", "sentiment": value, "category": "оплата"},
+        ensure_ascii=False
+    )})
+    ycc = classifier()
+
+    result = await ycc.y_cloud_classify_text()
+
+    assert result == {"spam": "не спам", "sentiment": "unknown",
+                      "category": "оплата"}
+    assert ycc.fallback_labels == ["sentiment"]
+
+
+async def test_extra_labels_ignored(stubs):
+    stubs.configs["completion"].update({"output_text": output(
+        spam="не спам", sentiment="neutral", category="техническая",
+        urgency="high"
+    )})
+    ycc = classifier()
+
+    result = await ycc.y_cloud_classify_text()
+
+    assert result == {"spam": "не спам", "sentiment": "neutral",
+                      "category": "техническая"}
+    assert not ycc.fell_back
+
+
+async def test_stub_invalid_output_per_label_fallback(stubs):
+    stubs.configs["completion"].update({"invalid_output_rate": 1})
+    ycc = classifier()
+    before = fallbacks()
+
+    result = await ycc.y_cloud_classify_text()
+
+    assert len(ycc.fallback_labels) == 1
+    name = ycc.fallback_labels[0]
+    assert result[name] == DEFAULTS[name]
+    for other in set(result) - {name}:
+        assert result[other] in ycc.labels[other]
+    assert fallbacks() == before + 1
+
+
+async def test_server_errors_fall_back(stubs):
+    stubs.configs["completion"].update({"error_rate": 1})
+    ycc = classifier()
+
+    result = await ycc.y_cloud_classify_text()
+
+    assert result == DEFAULTS
+    assert ycc.fallback_labels == list(DEFAULTS)
+    assert stubs.counters["completion"]["500"] == 2
+
+
+async def test_fallback_not_cached(stubs):
+    text = f"Повторная жалоба {uuid4().hex}"
+    stubs.configs["completion"].update({"output_text": output(
+        spam="не спам", sentiment="negative"
+    )})
+    await complaint_labels_classifier(text).y_cloud_classify_text()
+    stubs.configs["completion"].update({"output_text": ""})
+
+    ycc = complaint_labels_classifier(text)
+    result = await ycc.y_cloud_classify_text()
+
+    assert result["category"] in ycc.labels["category"]
+    assert not ycc.fell_back
+    assert stubs.counters["completion"]["200"] == 2
+
+
+async def test_valid_result_cached(stubs):
+    text = f"Кэшируемая жалоба {uuid4().hex}"
+    first = await complaint_labels_classifier(text).y_cloud_classify_text()
+
+    second = await complaint_labels_classifier(text).y_cloud_classify_text()
+
+    assert second == first
+    assert stubs.counters["completion"]["200"] == 1